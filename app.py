@@ -1,7 +1,25 @@
-from flask import Flask, render_template, request, redirect, flash, url_for, session
+from flask import (Blueprint, Flask, Response, render_template, request, redirect, flash, url_for, session, g,
+                   abort, current_app, has_app_context, has_request_context, jsonify, stream_with_context,
+                   before_render_template, template_rendered)
 import os
+import bisect
+import csv
+import hashlib
+import heapq
+import io
+import json
+import queue
+import re
 import sqlite3
-from datetime import datetime
+import sys
+import threading
+import time
+import zlib
+from array import array
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote
 import logging
 import click
 
@@ -9,8 +27,8 @@ import click
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-app.secret_key = os.environ.get('SECRET_KEY', 'dev-key-please-change-in-production')
+# Every page, hook and CLI command; create_app() registers them on an app
+bp = Blueprint('lottery', __name__, cli_group=None)
 
 # Admin passcode (in production, this should be in environment variables)
 ADMIN_PASSCODE = os.environ.get('ADMIN_PASSCODE', '2222')
@@ -26,17 +44,17 @@ def require_admin():
         @wraps(f)
         def decorated_function(*args, **kwargs):
             if not check_admin_access():
-                return redirect(url_for('admin_login', next=request.url))
+                return redirect(url_for('lottery.admin_login', next=request.url))
             return f(*args, **kwargs)
         return decorated_function
     return decorator
 
-@app.route('/admin-login', methods=['GET', 'POST'])
+@bp.route('/admin-login', methods=['GET', 'POST'])
 def admin_login():
     """Admin login page"""
     if request.method == 'POST':
         passcode = request.form.get('passcode', '')
-        next_url = request.form.get('next', url_for('create_report'))
+        next_url = request.form.get('next', url_for('lottery.create_report'))
         
         if passcode == ADMIN_PASSCODE:
             session['admin_authenticated'] = True
@@ -45,54 +63,804 @@ def admin_login():
         else:
             flash('Invalid passcode. Please try again.', 'error')
     
-    next_url = request.args.get('next', url_for('create_report'))
+    next_url = request.args.get('next', url_for('lottery.create_report'))
     return render_template('admin_login.html', next=next_url)
 
-@app.route('/admin-logout')
+@bp.route('/admin-logout')
 def admin_logout():
     """Admin logout"""
     session.pop('admin_authenticated', None)
     flash('Admin access removed.', 'info')
-    return redirect(url_for('enter_stock'))
-
-def get_db_connection():
-    # Ensure instance folder exists
-    os.makedirs(app.instance_path, exist_ok=True)
-    # Use instance folder for database
-    db_path = os.path.join(app.instance_path, 'stock_data.db')
-    conn = sqlite3.connect(db_path)
+    return redirect(url_for('lottery.enter_stock'))
+
+# SQLite tuning applied once to every pooled connection
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-16000',      # ~16 MB page cache
+    'PRAGMA mmap_size=268435456',    # 256 MB memory-mapped reads
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA busy_timeout=5000',
+)
+
+# Idle connections kept per store in each worker process
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 4))
+
+# Most writes the writer thread groups into one commit
+WRITE_BATCH_MAX = 64
+
+# Seconds a request waits for its queued write to commit
+WRITE_QUEUE_TIMEOUT = 30
+
+# Each store's data lives in its own SQLite file. The store named "default"
+# uses the DATABASE path; the others live in a stores/ folder beside it.
+DEFAULT_STORE = 'default'
+STORE_ID_PATTERN = re.compile(r'^[a-z0-9][a-z0-9_-]{0,31}$')
+
+_db_pools = {}
+_db_pool_pid = os.getpid()
+_db_pools_lock = threading.Lock()
+
+def get_stores():
+    """Return the ids of all configured stores."""
+    return current_app.config['STORES']
+
+def get_current_store():
+    """Return the store the current request or CLI command works on."""
+    if has_app_context() and 'store' in g:
+        return g.store
+    if has_request_context():
+        store = session.get('store')
+        if store is not None and store not in get_stores():
+            session.pop('store')
+            store = None
+    else:
+        store = os.environ.get('STORE')
+        if store is not None and store not in get_stores():
+            raise click.ClickException(f'Unknown store {store}')
+    if store is None:
+        store = get_stores()[0]
+    if has_app_context():
+        g.store = store
+    return store
+
+@bp.before_app_request
+def select_store():
+    """Route the request to a store shard from the URL, remembering the choice."""
+    store = request.args.get('store')
+    if store is None:
+        return
+    if store not in get_stores():
+        abort(404)
+    session['store'] = store
+    g.store = store
+
+@bp.app_context_processor
+def inject_stores():
+    return {'stores': get_stores(), 'current_store': get_current_store()}
+
+def get_db_path(store=None):
+    """Return a store's SQLite file, or a shared in-memory URI when DATABASE is ``:memory:``."""
+    store = store or get_current_store()
+    database = current_app.config['DATABASE']
+    if database == ':memory:':
+        return f"file:/lottery-{current_app.extensions['lottery_memory_id']}-{store}?vfs=memdb"
+    if store == DEFAULT_STORE:
+        return database
+    return os.path.join(os.path.dirname(database), 'stores', f'{store}.db')
+
+class InstrumentedConnection(sqlite3.Connection):
+    """SQLite connection that reports every statement's run time to the current request."""
+
+    def execute(self, sql, *args):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, *args)
+        finally:
+            record_sql(sql, time.perf_counter() - started, args[0] if args else ())
+
+    def executemany(self, sql, *args):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, *args)
+        finally:
+            record_sql(sql, time.perf_counter() - started)
+
+    def executescript(self, sql):
+        started = time.perf_counter()
+        try:
+            return super().executescript(sql)
+        finally:
+            record_sql(sql, time.perf_counter() - started)
+
+    def commit(self):
+        started = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            record_sql('COMMIT', time.perf_counter() - started)
+
+def _connect(db_path, readonly=False):
+    """Open a tuned connection to a database path or in-memory URI."""
+    if db_path.startswith('file:'):
+        conn = sqlite3.connect(db_path + ('&mode=ro' if readonly else ''), uri=True,
+                               check_same_thread=False, factory=InstrumentedConnection)
+    elif readonly:
+        conn = sqlite3.connect(f'file:{quote(db_path)}?mode=ro', uri=True, check_same_thread=False,
+                               factory=InstrumentedConnection)
+    else:
+        conn = sqlite3.connect(db_path, check_same_thread=False, factory=InstrumentedConnection)
+    conn.db_path = db_path
+    conn.readonly = readonly
     conn.row_factory = sqlite3.Row
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
     return conn
 
+def open_db_connection(store=None, readonly=False):
+    """Open a new tuned SQLite connection to a store (the caller owns it)."""
+    db_path = get_db_path(store)
+    if db_path not in _prepared_databases:
+        prepare_database(db_path)
+    return _connect(db_path, readonly)
+
+# Databases this process has already set up (see prepare_database), the
+# thread setting each one up, and the connections keeping its in-memory
+# databases alive
+_prepared_databases = set()
+_preparing_databases = {}
+_prepared_databases_lock = threading.RLock()
+_memory_databases = {}
+
+def prepare_database(db_path):
+    """Create a database's folder and check or apply its migrations once per process."""
+    with _prepared_databases_lock:
+        # The migrating thread holds the lock, so only its own nested
+        # connections get past here before the migrations have finished
+        if db_path in _prepared_databases or _preparing_databases.get(db_path) == threading.get_ident():
+            return
+        _preparing_databases[db_path] = threading.get_ident()
+        try:
+            _prepare_database(db_path)
+            _prepared_databases.add(db_path)
+        finally:
+            del _preparing_databases[db_path]
+
+def _prepare_database(db_path):
+    if db_path.startswith('file:'):
+        if db_path not in _memory_databases:
+            _memory_databases[db_path] = sqlite3.connect(db_path, uri=True, check_same_thread=False)
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    latest = MIGRATIONS[-1][0]
+    conn = sqlite3.connect(db_path, uri=db_path.startswith('file:'))
+    try:
+        version = conn.execute('SELECT MAX(version) FROM schema_migrations').fetchone()[0] or 0
+    except sqlite3.OperationalError:
+        version = 0
+    finally:
+        conn.close()
+    if version >= latest:
+        return
+    if db_path.startswith('file:') or current_app.config['AUTO_MIGRATE']:
+        conn = _connect(db_path)
+        try:
+            upgrade_database(conn)
+        finally:
+            conn.close()
+        invalidate_holder_layouts(db_path)
+    elif has_request_context():
+        logger.warning(f"Database {db_path} is at schema version {version} of {latest}; "
+                       f"run `flask db-upgrade`")
+
+def _get_db_pool(db_path, readonly=False):
+    """Return this worker's idle-connection pool for a database."""
+    global _db_pools, _db_pool_pid
+    with _db_pools_lock:
+        # Connections must never be shared across forked workers
+        if _db_pool_pid != os.getpid():
+            _db_pools = {}
+            _db_pool_pid = os.getpid()
+        if (db_path, readonly) not in _db_pools:
+            _db_pools[db_path, readonly] = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+        return _db_pools[db_path, readonly]
+
+def _acquire_db_connection(store, readonly=False):
+    """Take an idle connection from the store's pool or open a new one."""
+    try:
+        return _get_db_pool(get_db_path(store), readonly).get_nowait()
+    except queue.Empty:
+        return open_db_connection(store, readonly)
+
+def _release_db_connection(conn):
+    """Return a connection to its database's pool, closing it if the pool is full."""
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+        if _db_pool_pid == os.getpid():
+            _get_db_pool(conn.db_path, conn.readonly).put_nowait(conn)
+            return
+    except (sqlite3.Error, queue.Full):
+        pass
+    conn.close()
+
+def get_db_connection(store=None):
+    """Return the pooled connection for the current request or app context; do not close it."""
+    store = store or get_current_store()
+    dbs = g.setdefault('dbs', {})
+    if store not in dbs:
+        dbs[store] = _acquire_db_connection(store, current_app.config['WRITE_QUEUE'] and has_request_context())
+    return dbs[store]
+
+def release_request_db(exception=None):
+    """Hand the request's connections back to their pools."""
+    for conn in g.pop('dbs', {}).values():
+        _release_db_connection(conn)
+
+class StoreWriter:
+    """Background thread that applies one store's queued writes in group commits."""
+
+    def __init__(self, app, store):
+        self.app = app
+        self.store = store
+        self.jobs = queue.Queue()
+        self.conn = open_db_connection(store)
+        self.thread = threading.Thread(target=self._run, name=f'db-writer-{store}', daemon=True)
+        self.thread.start()
+
+    def submit(self, fn):
+        future = Future()
+        self.jobs.put((fn, future))
+        return future
+
+    def _next_batch(self):
+        # Whatever queued up while the previous batch committed joins this one
+        batch = [self.jobs.get()]
+        while len(batch) < WRITE_BATCH_MAX:
+            try:
+                batch.append(self.jobs.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            # Jobs call helpers that use get_db_connection(); point them at this connection
+            with self.app.app_context():
+                g.store = self.store
+                g.dbs = {self.store: self.conn}
+                try:
+                    self._apply(batch)
+                finally:
+                    g.pop('dbs', None)
+
+    def _apply(self, batch):
+        outcomes = []
+        try:
+            self.conn.execute('BEGIN IMMEDIATE')
+            for fn, future in batch:
+                self.conn.execute('SAVEPOINT write_job')
+                try:
+                    outcomes.append((future, fn(self.conn), None))
+                except Exception as e:
+                    self.conn.execute('ROLLBACK TO write_job')
+                    outcomes.append((future, None, e))
+                self.conn.execute('RELEASE write_job')
+            self.conn.commit()
+        except Exception as e:
+            logger.error(f"Write batch for store {self.store} failed: {str(e)}")
+            if self.conn.in_transaction:
+                self.conn.rollback()
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+_writers = {}
+_writers_pid = os.getpid()
+
+def _get_store_writer(store):
+    """Return this worker's writer thread for a store, starting it on first use."""
+    global _writers, _writers_pid
+    db_path = get_db_path(store)
+    with _db_pools_lock:
+        if _writers_pid != os.getpid():
+            _writers = {}
+            _writers_pid = os.getpid()
+        if db_path not in _writers:
+            _writers[db_path] = StoreWriter(current_app._get_current_object(), store)
+        return _writers[db_path]
+
+def run_write(fn, store=None):
+    """Run ``fn(conn)`` in a write transaction on a store and return its result; ``fn`` must not commit."""
+    store = store or get_current_store()
+
+    def write(conn):
+        result = fn(conn)
+        checkpoint_journal_if_due(conn)
+        return result
+
+    if not current_app.config['WRITE_QUEUE']:
+        conn = get_db_connection(store)
+        try:
+            result = write(conn)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return result
+    try:
+        return _get_store_writer(store).submit(write).result(timeout=WRITE_QUEUE_TIMEOUT)
+    except FutureTimeout:
+        raise sqlite3.OperationalError('Timed out waiting for the write queue')
+
+# Requests slower than this many milliseconds are logged with their SQL (0 disables)
+SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', 0))
+
+# Statements listed per slow request, slowest first
+SLOW_REQUEST_MAX_STATEMENTS = 10
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 1000)
+
+class Histogram:
+    """Cumulative histogram per endpoint, rendered in the Prometheus text format."""
+
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(endpoint)
+            if series is None:
+                series = self._series[endpoint] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((endpoint, list(counts), total) for endpoint, (counts, total) in self._series.items())
+        for endpoint, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{endpoint="{endpoint}"}} {total:.6f}')
+            lines.append(f'{self.name}_count{{endpoint="{endpoint}"}} {cumulative}')
+        return lines
+
+REQUEST_HISTOGRAMS = {
+    'latency': Histogram('lottery_request_duration_seconds', 'Total request latency.', LATENCY_BUCKETS),
+    'sql': Histogram('lottery_request_sql_seconds', 'Time spent running SQL per request.', LATENCY_BUCKETS),
+    'render': Histogram('lottery_request_render_seconds', 'Time spent rendering templates per request.',
+                        LATENCY_BUCKETS),
+    'queries': Histogram('lottery_request_queries', 'SQL statements issued per request.', QUERY_COUNT_BUCKETS),
+}
+
+# Set to a dict by ``flask audit-queries`` to collect each distinct statement
+# (with the first parameters seen) for EXPLAIN QUERY PLAN
+_sql_capture = None
+
+def record_sql(sql, seconds, params=None):
+    """Add one statement to the current request's measurements, if any."""
+    if _sql_capture is not None and params is not None:
+        _sql_capture.setdefault(sql, params)
+    if not has_app_context():
+        return
+    metrics = g.get('request_metrics')
+    if metrics is not None:
+        metrics['queries'] += 1
+        metrics['sql_seconds'] += seconds
+        if SLOW_REQUEST_MS:
+            metrics['statements'].append((seconds, sql))
+
+@bp.before_app_request
+def start_request_metrics():
+    g.request_metrics = {'started': time.perf_counter(), 'queries': 0, 'sql_seconds': 0.0,
+                         'render_seconds': 0.0, 'statements': []}
+
+def start_template_timer(sender, template, context, **extra):
+    if 'request_metrics' in g:
+        g.setdefault('template_starts', []).append(time.perf_counter())
+
+def stop_template_timer(sender, template, context, **extra):
+    starts = g.get('template_starts')
+    if starts:
+        g.request_metrics['render_seconds'] += time.perf_counter() - starts.pop()
+
+@bp.after_app_request
+def finish_request_metrics(response):
+    """Record the request in the histograms and log it if it was slow."""
+    metrics = g.pop('request_metrics', None)
+    if metrics is None:
+        return response
+    elapsed = time.perf_counter() - metrics['started']
+    endpoint = request.endpoint or 'unmatched'
+    REQUEST_HISTOGRAMS['latency'].observe(endpoint, elapsed)
+    REQUEST_HISTOGRAMS['sql'].observe(endpoint, metrics['sql_seconds'])
+    REQUEST_HISTOGRAMS['render'].observe(endpoint, metrics['render_seconds'])
+    REQUEST_HISTOGRAMS['queries'].observe(endpoint, metrics['queries'])
+
+    if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+        statements = sorted(metrics['statements'], key=lambda item: item[0], reverse=True)
+        lines = [f"Slow request {request.method} {request.full_path.rstrip('?')}: {elapsed * 1000:.1f} ms, "
+                 f"{metrics['queries']} queries, {metrics['sql_seconds'] * 1000:.1f} ms SQL, "
+                 f"{metrics['render_seconds'] * 1000:.1f} ms rendering"]
+        for seconds, sql in statements[:SLOW_REQUEST_MAX_STATEMENTS]:
+            lines.append(f"  {seconds * 1000:8.2f} ms  {' '.join(sql.split())}")
+        logger.warning('\n'.join(lines))
+    return response
+
+@bp.route('/metrics')
+def metrics():
+    """Per-endpoint request histograms for this worker process (Prometheus text format)."""
+    lines = []
+    for histogram in REQUEST_HISTOGRAMS.values():
+        lines.extend(histogram.render())
+    lines.append('# HELP lottery_page_cache_bytes Rendered pages held in the page cache.')
+    lines.append('# TYPE lottery_page_cache_bytes gauge')
+    lines.append(f'lottery_page_cache_bytes {page_cache.size}')
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
 def get_daily_grand_total(date):
     """Calculate the grand total for a given date including both holder tickets and extra tickets."""
     conn = get_db_connection()
-    try:
-        # Calculate total from holder tickets
-        holder_total = conn.execute('''
-            SELECT SUM(stock_number * ticket_value) as total
-            FROM lottery_stock 
-            WHERE date = ?
-        ''', (date,)).fetchone()['total'] or 0
-        
-        # Calculate total from extra tickets
-        extra_total = conn.execute('''
-            SELECT SUM(stock_number * ticket_price) as total
-            FROM extra_tickets 
+    return conn.execute('''
+        SELECT SUM(total_value) as total
+        FROM daily_totals
+        WHERE date = ?
+    ''', (date,)).fetchone()['total'] or 0
+
+# Tables feeding daily_totals: (table, source label, ticket value column)
+DAILY_TOTALS_SOURCES = (
+    ('lottery_stock', 'holder', 'ticket_value'),
+    ('extra_tickets', 'extra', 'ticket_price'),
+)
+
+def daily_totals_trigger_sql():
+    """Build the triggers that keep daily_totals in step with its source tables."""
+    statements = []
+    for table, source, value_col in DAILY_TOTALS_SOURCES:
+        # An archived day's holders are counted through its snapshot, so moving
+        # its rows into or out of lottery_stock leaves the totals alone
+        insert_when = delete_when = ''
+        if table == 'lottery_stock':
+            insert_when = 'WHEN NOT EXISTS (SELECT 1 FROM stock_snapshots WHERE date = NEW.date)'
+            delete_when = 'WHEN NOT EXISTS (SELECT 1 FROM stock_snapshots WHERE date = OLD.date)'
+        add_new = f'''
+            INSERT INTO daily_totals (date, source, ticket_value, entry_count, total_tickets, total_value)
+            VALUES (NEW.date, '{source}', NEW.{value_col}, 1, NEW.stock_number, NEW.stock_number * NEW.{value_col})
+            ON CONFLICT(date, source, ticket_value) DO UPDATE SET
+                entry_count = entry_count + 1,
+                total_tickets = total_tickets + excluded.total_tickets,
+                total_value = total_value + excluded.total_value;
+        '''
+        remove_old = f'''
+            UPDATE daily_totals SET
+                entry_count = entry_count - 1,
+                total_tickets = total_tickets - OLD.stock_number,
+                total_value = total_value - OLD.stock_number * OLD.{value_col}
+            WHERE date = OLD.date AND source = '{source}' AND ticket_value = OLD.{value_col};
+            DELETE FROM daily_totals
+            WHERE date = OLD.date AND source = '{source}' AND ticket_value = OLD.{value_col}
+              AND entry_count <= 0;
+        '''
+        statements.append(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_totals_insert
+            AFTER INSERT ON {table} {insert_when}
+            BEGIN {add_new} END
+        ''')
+        statements.append(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_totals_delete
+            AFTER DELETE ON {table} {delete_when}
+            BEGIN {remove_old} END
+        ''')
+        statements.append(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_totals_update
+            AFTER UPDATE OF date, stock_number, {value_col} ON {table}
+            BEGIN {remove_old} {add_new} END
+        ''')
+    # A change to a date's totals makes that day's report (today_closing) and
+    # the next day's report (yesterday_closing) stale
+    for event, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+        statements.append(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_daily_totals_stale_{event.lower()}
+            AFTER {event} ON daily_totals
+            BEGIN
+                UPDATE daily_reports SET stale = 1
+                WHERE date IN ({row}.date, date({row}.date, '+1 day')) AND stale = 0;
+            END
+        ''')
+    # Bump data versions so cached pages for the affected dates are not reused.
+    # Stock changes affect that date and the next day's report; report
+    # changes affect the report date; date list changes affect every page
+    # with a date selector.
+    bump_version = '''
+        INSERT INTO data_versions (date, version) VALUES ({date}, 1)
+        ON CONFLICT(date) DO UPDATE SET version = version + 1;
+    '''
+    version_triggers = [
+        ('daily_totals', 'INSERT', ['NEW.date', "date(NEW.date, '+1 day')"]),
+        ('daily_totals', 'UPDATE', ['NEW.date', "date(NEW.date, '+1 day')"]),
+        ('daily_totals', 'DELETE', ['OLD.date', "date(OLD.date, '+1 day')"]),
+        ('daily_reports', 'INSERT', ['NEW.date']),
+        ('daily_reports', 'UPDATE', ['NEW.date', 'OLD.date']),
+        ('daily_reports', 'DELETE', ['OLD.date']),
+        ('stock_dates', 'INSERT', [repr(ALL_DATES_VERSION_KEY)]),
+        ('stock_dates', 'DELETE', [repr(ALL_DATES_VERSION_KEY)]),
+    ]
+    for table, event, dates in version_triggers:
+        statements.append(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{event.lower()}
+            AFTER {event} ON {table}
+            BEGIN {''.join(bump_version.format(date=date) for date in dates)} END
+        ''')
+    # stock_dates lists every date with at least one daily_totals row
+    statements.append('''
+        CREATE TRIGGER IF NOT EXISTS trg_daily_totals_dates_insert
+        AFTER INSERT ON daily_totals
+        BEGIN
+            INSERT OR IGNORE INTO stock_dates (date) VALUES (NEW.date);
+        END
+    ''')
+    statements.append('''
+        CREATE TRIGGER IF NOT EXISTS trg_daily_totals_dates_delete
+        AFTER DELETE ON daily_totals
+        BEGIN
+            DELETE FROM stock_dates
+            WHERE date = OLD.date
+              AND NOT EXISTS (SELECT 1 FROM daily_totals WHERE date = OLD.date);
+        END
+    ''')
+    return statements
+
+def ensure_columns(conn, table, columns):
+    """Add any of ``columns`` (name -> definition) missing from an existing table."""
+    existing = {row['name'] for row in conn.execute(f'PRAGMA table_info({table})')}
+    for name, definition in columns.items():
+        if name not in existing:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {name} {definition}')
+
+def rebuild_daily_totals(conn):
+    """Recompute daily_totals from scratch; the caller commits."""
+    conn.execute('DELETE FROM daily_totals')
+    for table, source, value_col in DAILY_TOTALS_SOURCES:
+        conn.execute(f'''
+            INSERT INTO daily_totals (date, source, ticket_value, entry_count, total_tickets, total_value)
+            SELECT date, '{source}', {value_col}, COUNT(*), SUM(stock_number), SUM(stock_number * {value_col})
+            FROM {table}
+            GROUP BY date, {value_col}
+        ''')
+    # Archived days (databases created before migration 4 have none)
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stock_snapshots'").fetchone():
+        for snapshot in conn.execute('SELECT date, layout_version, counts FROM stock_snapshots').fetchall():
+            totals = {}
+            for _, stock_number, ticket_value in iter_snapshot_holders(snapshot):
+                count, tickets = totals.get(ticket_value, (0, 0))
+                totals[ticket_value] = (count + 1, tickets + stock_number)
+            conn.executemany('''
+                INSERT INTO daily_totals (date, source, ticket_value, entry_count, total_tickets, total_value)
+                VALUES (?, 'holder', ?, ?, ?, ?)
+            ''', [(snapshot['date'], value, count, tickets, tickets * value)
+                  for value, (count, tickets) in totals.items()])
+    rebuild_stock_dates(conn)
+    return conn.execute('SELECT COUNT(*) FROM daily_totals').fetchone()[0]
+
+def rebuild_stock_dates(conn):
+    """Resync the stock_dates index from daily_totals; the caller commits."""
+    conn.execute('DELETE FROM stock_dates')
+    conn.execute('INSERT INTO stock_dates (date) SELECT DISTINCT date FROM daily_totals')
+
+# daily_reports columns summed into report_rollups
+ROLLUP_FIELDS = ('total_lottery_sale', 'lottery_deposit_amount', 'machine_sold',
+                 'tickets_cashed', 'online_cashed')
+
+# Rollup periods and the SQL for the first day of the period holding {date}.
+# Weeks start on Monday.
+ROLLUP_PERIODS = {
+    'week': "date({date}, '-6 days', 'weekday 1')",
+    'month': "strftime('%Y-%m-01', {date})",
+    'year': "strftime('%Y-01-01', {date})",
+}
+
+def report_rollup_trigger_sql():
+    """Build the triggers that keep report_rollups in step with daily_reports."""
+    add_new = ''.join(f'''
+        INSERT INTO report_rollups (period, period_start, report_count, {', '.join(ROLLUP_FIELDS)})
+        VALUES ('{period}', {start.format(date='NEW.date')}, 1,
+                {', '.join(f'COALESCE(NEW.{field}, 0)' for field in ROLLUP_FIELDS)})
+        ON CONFLICT(period, period_start) DO UPDATE SET
+            report_count = report_count + 1,
+            {', '.join(f'{field} = {field} + excluded.{field}' for field in ROLLUP_FIELDS)};
+    ''' for period, start in ROLLUP_PERIODS.items())
+    remove_old = ''.join(f'''
+        UPDATE report_rollups SET
+            report_count = report_count - 1,
+            {', '.join(f'{field} = {field} - COALESCE(OLD.{field}, 0)' for field in ROLLUP_FIELDS)}
+        WHERE period = '{period}' AND period_start = {start.format(date='OLD.date')};
+        DELETE FROM report_rollups
+        WHERE period = '{period}' AND period_start = {start.format(date='OLD.date')}
+          AND report_count <= 0;
+    ''' for period, start in ROLLUP_PERIODS.items())
+    return [
+        f'''
+            CREATE TRIGGER IF NOT EXISTS trg_daily_reports_rollup_insert
+            AFTER INSERT ON daily_reports
+            BEGIN {add_new} END
+        ''',
+        f'''
+            CREATE TRIGGER IF NOT EXISTS trg_daily_reports_rollup_delete
+            AFTER DELETE ON daily_reports
+            BEGIN {remove_old} END
+        ''',
+        f'''
+            CREATE TRIGGER IF NOT EXISTS trg_daily_reports_rollup_update
+            AFTER UPDATE OF date, {', '.join(ROLLUP_FIELDS)} ON daily_reports
+            BEGIN {remove_old} {add_new} END
+        ''',
+    ]
+
+def rebuild_report_rollups(conn):
+    """Recompute report_rollups from daily_reports; the caller commits."""
+    conn.execute('DELETE FROM report_rollups')
+    for period, start in ROLLUP_PERIODS.items():
+        conn.execute(f'''
+            INSERT INTO report_rollups (period, period_start, report_count, {', '.join(ROLLUP_FIELDS)})
+            SELECT '{period}', {start.format(date='date')}, COUNT(*),
+                   {', '.join(f'COALESCE(SUM({field}), 0)' for field in ROLLUP_FIELDS)}
+            FROM daily_reports
+            GROUP BY 2
+        ''')
+    return conn.execute('SELECT COUNT(*) FROM report_rollups').fetchone()[0]
+
+class DailySummary:
+    """Everything the report pages show for one date, loaded in at most two queries."""
+
+    def __init__(self, date, totals, extra_totals, entries=(), extra_tickets=()):
+        self.date = date
+        self.totals = totals
+        self.extra_totals = extra_totals
+        self.entries = entries
+        self.extra_tickets = extra_tickets
+        self.holder_total = sum(row['total_value'] for row in totals)
+        self.extra_total = sum(row['total_value'] for row in extra_totals)
+        self.grand_total = self.holder_total + self.extra_total
+
+    @property
+    def has_data(self):
+        """True if any holder or extra ticket was recorded for the date."""
+        return bool(self.totals or self.extra_totals)
+
+    @classmethod
+    def load(cls, date, with_entries=True):
+        """Load the summary for a date, optionally including the raw stock rows."""
+        conn = get_db_connection()
+        totals, extra_totals = [], []
+        for row in conn.execute('''
+            SELECT source, ticket_value, total_tickets, total_value
+            FROM daily_totals
             WHERE date = ?
-        ''', (date,)).fetchone()['total'] or 0
-        
-        return holder_total + extra_total
-    finally:
-        conn.close()
+            ORDER BY ticket_value DESC
+        ''', (date,)):
+            (totals if row['source'] == 'holder' else extra_totals).append(row)
 
-def init_database():
-    """Initialize the database with required tables and indexes."""
-    # Ensure instance folder exists
-    os.makedirs(app.instance_path, exist_ok=True)
-    # Use instance folder for database
-    db_path = os.path.join(app.instance_path, 'stock_data.db')
-    conn = sqlite3.connect(db_path)
+        entries, extra_tickets = [], []
+        if with_entries:
+            for row in conn.execute('''
+                SELECT 'holder' as source, id, date, holder_number, stock_number,
+                       ticket_value, NULL as ticket_price
+                FROM lottery_stock
+                WHERE date = ?
+                UNION ALL
+                SELECT 'extra', id, date, NULL, stock_number, ticket_price, ticket_price
+                FROM extra_tickets
+                WHERE date = ?
+                ORDER BY holder_number, ticket_price DESC, id
+            ''', (date, date)):
+                (entries if row['source'] == 'holder' else extra_tickets).append(row)
+            if totals and not entries:
+                entries = load_snapshot_entries(conn, date)
+
+        return cls(date, totals, extra_totals, entries, extra_tickets)
+
+def baseline_trigger_sql():
+    """Migration 1's daily_totals, stale-report, data version and stock_dates triggers."""
+    statements = []
+    for table, source, value_col in (('lottery_stock', 'holder', 'ticket_value'),
+                                     ('extra_tickets', 'extra', 'ticket_price')):
+        add_new = f'''
+            INSERT INTO daily_totals (date, source, ticket_value, entry_count, total_tickets, total_value)
+            VALUES (NEW.date, '{source}', NEW.{value_col}, 1, NEW.stock_number, NEW.stock_number * NEW.{value_col})
+            ON CONFLICT(date, source, ticket_value) DO UPDATE SET
+                entry_count = entry_count + 1,
+                total_tickets = total_tickets + excluded.total_tickets,
+                total_value = total_value + excluded.total_value;
+        '''
+        remove_old = f'''
+            UPDATE daily_totals SET
+                entry_count = entry_count - 1,
+                total_tickets = total_tickets - OLD.stock_number,
+                total_value = total_value - OLD.stock_number * OLD.{value_col}
+            WHERE date = OLD.date AND source = '{source}' AND ticket_value = OLD.{value_col};
+            DELETE FROM daily_totals
+            WHERE date = OLD.date AND source = '{source}' AND ticket_value = OLD.{value_col}
+              AND entry_count <= 0;
+        '''
+        statements.append(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_totals_insert
+            AFTER INSERT ON {table}
+            BEGIN {add_new} END
+        ''')
+        statements.append(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_totals_delete
+            AFTER DELETE ON {table}
+            BEGIN {remove_old} END
+        ''')
+        statements.append(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_totals_update
+            AFTER UPDATE OF date, stock_number, {value_col} ON {table}
+            BEGIN {remove_old} {add_new} END
+        ''')
+    for event, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+        statements.append(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_daily_totals_stale_{event.lower()}
+            AFTER {event} ON daily_totals
+            BEGIN
+                UPDATE daily_reports SET stale = 1
+                WHERE date IN ({row}.date, date({row}.date, '+1 day')) AND stale = 0;
+            END
+        ''')
+    bump_version = '''
+        INSERT INTO data_versions (date, version) VALUES ({date}, 1)
+        ON CONFLICT(date) DO UPDATE SET version = version + 1;
+    '''
+    version_triggers = [
+        ('daily_totals', 'INSERT', ['NEW.date', "date(NEW.date, '+1 day')"]),
+        ('daily_totals', 'UPDATE', ['NEW.date', "date(NEW.date, '+1 day')"]),
+        ('daily_totals', 'DELETE', ['OLD.date', "date(OLD.date, '+1 day')"]),
+        ('daily_reports', 'INSERT', ['NEW.date']),
+        ('daily_reports', 'UPDATE', ['NEW.date', 'OLD.date']),
+        ('daily_reports', 'DELETE', ['OLD.date']),
+        ('stock_dates', 'INSERT', ["''"]),
+        ('stock_dates', 'DELETE', ["''"]),
+    ]
+    for table, event, dates in version_triggers:
+        statements.append(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{event.lower()}
+            AFTER {event} ON {table}
+            BEGIN {''.join(bump_version.format(date=date) for date in dates)} END
+        ''')
+    statements.append('''
+        CREATE TRIGGER IF NOT EXISTS trg_daily_totals_dates_insert
+        AFTER INSERT ON daily_totals
+        BEGIN
+            INSERT OR IGNORE INTO stock_dates (date) VALUES (NEW.date);
+        END
+    ''')
+    statements.append('''
+        CREATE TRIGGER IF NOT EXISTS trg_daily_totals_dates_delete
+        AFTER DELETE ON daily_totals
+        BEGIN
+            DELETE FROM stock_dates
+            WHERE date = OLD.date
+              AND NOT EXISTS (SELECT 1 FROM daily_totals WHERE date = OLD.date);
+        END
+    ''')
+    return statements
+
+def migrate_baseline(conn):
+    """Migration 1: the schema as it stood before numbered migrations (idempotent)."""
     c = conn.cursor()
     
     # Create a table for lottery stock entries
@@ -140,10 +908,85 @@ def init_database():
             net_total_scratch REAL NOT NULL DEFAULT 0,
             total_lottery_sale REAL NOT NULL DEFAULT 0,
             lottery_deposit_amount REAL NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            stale INTEGER NOT NULL DEFAULT 0,
+            today_closing_overridden INTEGER NOT NULL DEFAULT 0,
+            yesterday_closing_overridden INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    
+    # Columns added after the first release
+    ensure_columns(conn, 'daily_reports', {
+        'stale': 'INTEGER NOT NULL DEFAULT 0',
+        'today_closing_overridden': 'INTEGER NOT NULL DEFAULT 0',
+        'yesterday_closing_overridden': 'INTEGER NOT NULL DEFAULT 0',
+    })
+    
+    # Materialized per-date, per-ticket-value totals kept in sync by triggers
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS daily_totals (
+            date TEXT NOT NULL,
+            source TEXT NOT NULL CHECK(source IN ('holder', 'extra')),
+            ticket_value INTEGER NOT NULL,
+            entry_count INTEGER NOT NULL DEFAULT 0,
+            total_tickets INTEGER NOT NULL DEFAULT 0,
+            total_value INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (date, source, ticket_value)
+        ) WITHOUT ROWID
+    ''')
+    
+    # Versioned holder layouts (ticket value and display order by holder)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS holder_layouts (
+            version INTEGER PRIMARY KEY AUTOINCREMENT,
+            effective_date TEXT UNIQUE NOT NULL,
+            layout TEXT NOT NULL,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
     
+    # Seed version 1 with the built-in layout, in effect for all past dates
+    if c.execute('SELECT 1 FROM holder_layouts LIMIT 1').fetchone() is None:
+        c.execute('''
+            INSERT INTO holder_layouts (effective_date, layout) VALUES (?, ?)
+        ''', ('0001-01-01', json.dumps({'values': holder_ticket_values,
+                                           'sequence': holder_sequence})))
+    
+    # Per-date data versions used to invalidate cached pages
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            date TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    
+    # Every date that has holder or extra ticket data, for the reports date selector
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS stock_dates (
+            date TEXT PRIMARY KEY
+        ) WITHOUT ROWID
+    ''')
+    
+    for statement in baseline_trigger_sql():
+        c.execute(statement)
+    
+    # Backfill totals for databases created before daily_totals existed
+    if c.execute('SELECT 1 FROM daily_totals LIMIT 1').fetchone() is None:
+        c.execute('''
+            INSERT INTO daily_totals (date, source, ticket_value, entry_count, total_tickets, total_value)
+            SELECT date, 'holder', ticket_value, COUNT(*), SUM(stock_number), SUM(stock_number * ticket_value)
+            FROM lottery_stock
+            GROUP BY date, ticket_value
+        ''')
+        c.execute('''
+            INSERT INTO daily_totals (date, source, ticket_value, entry_count, total_tickets, total_value)
+            SELECT date, 'extra', ticket_price, COUNT(*), SUM(stock_number), SUM(stock_number * ticket_price)
+            FROM extra_tickets
+            GROUP BY date, ticket_price
+        ''')
+    if c.execute('SELECT 1 FROM stock_dates LIMIT 1').fetchone() is None:
+        c.execute('INSERT OR IGNORE INTO stock_dates (date) SELECT DISTINCT date FROM daily_totals')
+    
     # Create indexes for faster date-based queries
     c.execute('''
         CREATE INDEX IF NOT EXISTS idx_lottery_stock_date 
@@ -155,16 +998,256 @@ def init_database():
         ON daily_reports(date)
     ''')
     
-    conn.commit()
-    conn.close()
+    # Indexes for the amount filters on the lottery reports listing
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS idx_daily_reports_deposit
+        ON daily_reports(lottery_deposit_amount, date)
+    ''')
+    
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS idx_daily_reports_sale
+        ON daily_reports(total_lottery_sale, date)
+    ''')
+
+def migrate_extra_tickets_date_index(conn):
+    """Migration 2: index extra_tickets by date for the per-day pages."""
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_extra_tickets_date
+        ON extra_tickets(date, ticket_price)
+    ''')
+
+def migrate_stale_reports_index(conn):
+    """Migration 3: partial index so finding stale reports doesn't scan every report."""
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_daily_reports_stale
+        ON daily_reports(date) WHERE stale = 1
+    ''')
+
+def migrate_stock_snapshots(conn):
+    """Migration 4: packed per-day snapshots for archived lottery_stock days."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS stock_snapshots (
+            date TEXT PRIMARY KEY,
+            layout_version INTEGER NOT NULL,
+            counts BLOB NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    # Recreate the lottery_stock totals triggers with their snapshot guard
+    conn.execute('DROP TRIGGER IF EXISTS trg_lottery_stock_totals_insert')
+    conn.execute('DROP TRIGGER IF EXISTS trg_lottery_stock_totals_delete')
+    for statement in daily_totals_trigger_sql():
+        conn.execute(statement)
+
+def migrate_change_journal(conn):
+    """Migration 5: append-only change journal with per-day checkpoints."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS change_journal (
+            id INTEGER PRIMARY KEY,
+            changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
+            date TEXT NOT NULL,
+            source TEXT NOT NULL CHECK(source IN ('holder', 'extra', 'report')),
+            op TEXT NOT NULL CHECK(op IN ('set', 'delete')),
+            item TEXT,
+            data TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_change_journal_date
+        ON change_journal(date, changed_at)
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS journal_checkpoints (
+            date TEXT NOT NULL,
+            journal_id INTEGER NOT NULL,
+            taken_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
+            state TEXT NOT NULL,
+            PRIMARY KEY (date, journal_id)
+        ) WITHOUT ROWID
+    ''')
+    for statement in journal_trigger_sql(conn):
+        conn.execute(statement)
+    # History starts now: checkpoint every existing day at journal id 0
+    for (date,) in conn.execute('''
+        SELECT date FROM stock_dates UNION SELECT date FROM daily_reports
+    ''').fetchall():
+        conn.execute('''
+            INSERT OR IGNORE INTO journal_checkpoints (date, journal_id, state) VALUES (?, 0, ?)
+        ''', (date, json.dumps(capture_day_state(conn, date))))
+
+def migrate_report_rollups(conn):
+    """Migration 6: weekly, monthly and yearly report totals kept by triggers."""
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS report_rollups (
+            period TEXT NOT NULL CHECK(period IN ('week', 'month', 'year')),
+            period_start TEXT NOT NULL,
+            report_count INTEGER NOT NULL,
+            {', '.join(f'{field} REAL NOT NULL' for field in ROLLUP_FIELDS)},
+            PRIMARY KEY (period, period_start)
+        ) WITHOUT ROWID
+    ''')
+    for statement in report_rollup_trigger_sql():
+        conn.execute(statement)
+    rebuild_report_rollups(conn)
+
+def migrate_import_progress(conn):
+    """Migration 7: bulk import positions, committed with each batch."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS import_progress (
+            path TEXT PRIMARY KEY,
+            rows_done INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+
+def migrate_journal_utc(conn):
+    """Migration 8: record journal and checkpoint times in UTC instead of local time."""
+    conn.create_function('local_to_utc', 1, lambda value: value and format_journal_time(local_to_utc(
+        datetime.strptime(value, '%Y-%m-%d %H:%M:%S.%f'))))
+    for table, _, _, _ in JOURNAL_SOURCES:
+        for event in ('insert', 'update', 'delete'):
+            conn.execute(f'DROP TRIGGER IF EXISTS trg_{table}_journal_{event}')
+    conn.execute('''
+        CREATE TABLE change_journal_utc (
+            id INTEGER PRIMARY KEY,
+            changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+            date TEXT NOT NULL,
+            source TEXT NOT NULL CHECK(source IN ('holder', 'extra', 'report')),
+            op TEXT NOT NULL CHECK(op IN ('set', 'delete')),
+            item TEXT,
+            data TEXT
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO change_journal_utc (id, changed_at, date, source, op, item, data)
+        SELECT id, local_to_utc(changed_at), date, source, op, item, data FROM change_journal
+    ''')
+    conn.execute('''
+        CREATE TABLE journal_checkpoints_utc (
+            date TEXT NOT NULL,
+            journal_id INTEGER NOT NULL,
+            taken_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+            state TEXT NOT NULL,
+            PRIMARY KEY (date, journal_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        INSERT INTO journal_checkpoints_utc (date, journal_id, taken_at, state)
+        SELECT date, journal_id, local_to_utc(taken_at), state FROM journal_checkpoints
+    ''')
+    conn.execute('DROP TABLE change_journal')
+    conn.execute('DROP TABLE journal_checkpoints')
+    conn.execute('ALTER TABLE change_journal_utc RENAME TO change_journal')
+    conn.execute('ALTER TABLE journal_checkpoints_utc RENAME TO journal_checkpoints')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_change_journal_date
+        ON change_journal(date, changed_at)
+    ''')
+    for statement in journal_trigger_sql(conn):
+        conn.execute(statement)
+
+# Numbered schema migrations, applied in order by upgrade_database().
+# Never edit or renumber a migration that has shipped; add a new one.
+MIGRATIONS = (
+    (1, 'baseline schema', migrate_baseline),
+    (2, 'index extra_tickets by date', migrate_extra_tickets_date_index),
+    (3, 'partial index on stale reports', migrate_stale_reports_index),
+    (4, 'stock snapshots for archived days', migrate_stock_snapshots),
+    (5, 'change journal', migrate_change_journal),
+    (6, 'report rollups', migrate_report_rollups),
+    (7, 'bulk import progress', migrate_import_progress),
+    (8, 'UTC journal timestamps', migrate_journal_utc),
+)
+
+def get_schema_version(conn):
+    """Return the highest applied migration number (0 for a new database)."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_migrations').fetchone()[0]
+
+def upgrade_database(conn, target=None):
+    """Apply pending migrations up to ``target`` (default: latest) and return them."""
+    latest = MIGRATIONS[-1][0] if target is None else target
+    if get_schema_version(conn) >= latest:
+        return []
+    applied = []
+    for version, name, migrate in MIGRATIONS:
+        if version > latest:
+            break
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if conn.execute('SELECT 1 FROM schema_migrations WHERE version = ?', (version,)).fetchone() is None:
+                migrate(conn)
+                conn.execute('INSERT INTO schema_migrations (version, name) VALUES (?, ?)', (version, name))
+                applied.append((version, name))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return applied
+
+def init_database():
+    """Initialize the database with required tables and indexes."""
+    conn = get_db_connection()
+    upgrade_database(conn)
+    invalidate_holder_layouts()
     click.echo('Database initialized and tables created successfully.')
 
-@app.cli.command('init-db')
-def init_db_command():
+@bp.cli.command('init-db')
+@click.option('--store', 'stores', multiple=True,
+              help='Store shard to initialize (repeatable; default: every configured store).')
+def init_db_command(stores):
     """Clear existing data and create new tables."""
-    init_database()
+    for store in stores or get_stores():
+        if store not in get_stores():
+            raise click.ClickException(f'Unknown store {store}')
+        g.store = store
+        if len(get_stores()) > 1:
+            click.echo(f'[{store}] {get_db_path(store)}')
+        init_database()
+    g.pop('store', None)
 
-# Real-world ticket value mapping by holder number
+@bp.cli.command('db-upgrade')
+@click.option('--store', 'stores', multiple=True,
+              help='Store shard to upgrade (repeatable; default: every configured store).')
+@click.option('--target', type=int, help='Stop after this migration number.')
+def db_upgrade_command(stores, target):
+    """Apply pending schema migrations."""
+    for store in stores or get_stores():
+        if store not in get_stores():
+            raise click.ClickException(f'Unknown store {store}')
+        g.store = store
+        conn = get_db_connection()
+        applied = upgrade_database(conn, target)
+        invalidate_holder_layouts()
+        for version, name in applied:
+            click.echo(f'[{store}] Applied migration {version}: {name}')
+        click.echo(f'[{store}] Schema version {get_schema_version(conn)}')
+    g.pop('store', None)
+
+@bp.cli.command('rebuild-totals')
+def rebuild_totals_command():
+    """Rebuild the daily_totals table from lottery_stock and extra_tickets."""
+    conn = get_db_connection()
+    count = rebuild_daily_totals(conn)
+    conn.commit()
+    click.echo(f'Rebuilt daily_totals with {count} rows.')
+
+@bp.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Rebuild the report_rollups table from daily_reports."""
+    conn = get_db_connection()
+    count = rebuild_report_rollups(conn)
+    conn.commit()
+    click.echo(f'Rebuilt report_rollups with {count} rows.')
+
+# Number of physical holders (matches the lottery_stock CHECK constraint)
+HOLDER_COUNT = 56
+
+# Default layout (version 1): real-world ticket value mapping by holder number
 holder_ticket_values = {}
 # Holders 1-4: $30
 for i in range(1, 5): holder_ticket_values[i] = 30
@@ -185,108 +1268,465 @@ for i in range(47, 56): holder_ticket_values[i] = 2
 # Holder 56: $5
 holder_ticket_values[56] = 5
 
-@app.route('/', methods=['GET', 'POST'])
+# Default display order on the enter stock form
+holder_sequence = (
+    list(range(1, 15)) +         # 1–14
+    list(range(28, 14, -1)) +    # 28–15
+    list(range(29, 43)) +        # 29–42
+    list(range(56, 42, -1))      # 56–43
+)
+
+# Seconds between checks for layout versions saved by other workers
+LAYOUT_REFRESH_SECONDS = 5
+
+class HolderLayout:
+    """One compiled holder layout version."""
+    __slots__ = ('version', 'effective_date', 'values', 'sequence')
+
+    def __init__(self, version, effective_date, values, sequence):
+        self.version = version
+        self.effective_date = effective_date
+        self.values = tuple(int(values.get(h, 0)) for h in range(HOLDER_COUNT + 1))
+        self.sequence = tuple(sequence)
+
+    def value_for(self, holder_number):
+        return self.values[holder_number]
+
+    def to_dict(self):
+        return {
+            'version': self.version,
+            'effective_date': self.effective_date,
+            'values': {h: self.values[h] for h in range(1, HOLDER_COUNT + 1)},
+            'sequence': list(self.sequence),
+        }
+
+# Per-process layout cache for each database: compiled versions plus an effective-date index
+_layout_lock = threading.Lock()
+_layout_states = {}
+
+def _layout_state_for(db_path):
+    with _layout_lock:
+        if db_path not in _layout_states:
+            _layout_states[db_path] = {'checked_at': None, 'max_version': None,
+                                       'dates': [], 'layouts': [], 'compiled': {}}
+        return _layout_states[db_path]
+
+def validate_holder_layout(values, sequence=None):
+    """Validate a layout definition and return (values, sequence) normalized."""
+    try:
+        values = {int(h): int(v) for h, v in values.items()}
+    except (AttributeError, TypeError, ValueError):
+        raise ValueError("Layout values must map holder numbers to ticket values")
+    expected = set(range(1, HOLDER_COUNT + 1))
+    if set(values) != expected:
+        raise ValueError(f"Layout must give a ticket value for each holder 1-{HOLDER_COUNT}")
+    if any(v <= 0 for v in values.values()):
+        raise ValueError("Ticket values must be positive")
+    if sequence is None:
+        sequence = sorted(values)
+    try:
+        sequence = [int(h) for h in sequence]
+    except (TypeError, ValueError):
+        raise ValueError("Layout sequence must be a list of holder numbers")
+    if sorted(sequence) != sorted(expected):
+        raise ValueError(f"Layout sequence must list each holder 1-{HOLDER_COUNT} exactly once")
+    return values, sequence
+
+def invalidate_holder_layouts(db_path=None):
+    """Force the next layout lookup for a database (default: the current store's) to re-read holder_layouts."""
+    state = _layout_state_for(db_path or get_db_path())
+    with _layout_lock:
+        state['checked_at'] = None
+
+def _refresh_holder_layouts(state):
+    now = time.monotonic()
+    checked_at = state['checked_at']
+    if checked_at is not None and now - checked_at < LAYOUT_REFRESH_SECONDS:
+        return
+    conn = get_db_connection()
+    max_version = conn.execute('SELECT MAX(version) FROM holder_layouts').fetchone()[0]
+    with _layout_lock:
+        if max_version != state['max_version']:
+            compiled = state['compiled']
+            rows = conn.execute('''
+                SELECT version, effective_date, layout
+                FROM holder_layouts
+                ORDER BY effective_date
+            ''').fetchall()
+            for row in rows:
+                if row['version'] not in compiled:
+                    definition = json.loads(row['layout'])
+                    values = {int(h): v for h, v in definition['values'].items()}
+                    compiled[row['version']] = HolderLayout(
+                        row['version'], row['effective_date'], values, definition['sequence'])
+            state['dates'] = [row['effective_date'] for row in rows]
+            state['layouts'] = [compiled[row['version']] for row in rows]
+            state['max_version'] = max_version
+        state['checked_at'] = now
+
+def get_holder_layout(date=None):
+    """Return the compiled holder layout in effect on a date (default today)."""
+    state = _layout_state_for(get_db_path())
+    _refresh_holder_layouts(state)
+    date = date or datetime.now().strftime('%Y-%m-%d')
+    layouts = state['layouts']
+    if not layouts:
+        return HolderLayout(0, None, holder_ticket_values, holder_sequence)
+    index = bisect.bisect_right(state['dates'], date) - 1
+    return layouts[max(index, 0)]
+
+def get_holder_layout_version(version):
+    """Return the compiled holder layout with the given version number."""
+    state = _layout_state_for(get_db_path())
+    _refresh_holder_layouts(state)
+    if version not in state['compiled']:
+        # Saved by another worker since the last check
+        invalidate_holder_layouts()
+        _refresh_holder_layouts(state)
+    return state['compiled'][version]
+
+def save_holder_layout(conn, effective_date, values, sequence=None):
+    """Store a new layout version taking effect on effective_date; the caller commits."""
+    validate_stock_date(effective_date)
+    values, sequence = validate_holder_layout(values, sequence)
+    latest = conn.execute('''
+        SELECT MAX(effective_date) as effective_date FROM holder_layouts
+    ''').fetchone()['effective_date']
+    if latest and effective_date <= latest:
+        raise ValueError(f"New layouts must take effect after {latest}")
+    last_recorded = conn.execute('SELECT MAX(date) FROM stock_dates').fetchone()[0]
+    if last_recorded and effective_date <= last_recorded:
+        raise ValueError(f"New layouts must take effect after the last recorded stock date {last_recorded}")
+    cursor = conn.execute('''
+        INSERT INTO holder_layouts (effective_date, layout) VALUES (?, ?)
+    ''', (effective_date, json.dumps({'values': values, 'sequence': sequence})))
+    invalidate_holder_layouts()
+    return cursor.lastrowid
+
+@bp.cli.command('layout-list')
+def layout_list_command():
+    """List stored holder layout versions."""
+    conn = get_db_connection()
+    for row in conn.execute('''
+        SELECT version, effective_date, created_at FROM holder_layouts ORDER BY effective_date
+    '''):
+        click.echo(f"v{row['version']}  effective {row['effective_date']}  (saved {row['created_at']})")
+
+@bp.cli.command('layout-set')
+@click.argument('effective_date')
+@click.argument('layout_file', type=click.File('r'))
+def layout_set_command(effective_date, layout_file):
+    """Store a new holder layout from a JSON file, taking effect on EFFECTIVE_DATE."""
+    try:
+        definition = json.load(layout_file)
+        conn = get_db_connection()
+        version = save_holder_layout(conn, effective_date, definition.get('values'),
+                                     definition.get('sequence'))
+        conn.commit()
+    except (ValueError, AttributeError) as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Saved holder layout v{version} effective {effective_date}.')
+
+def validate_stock_date(date):
+    """Validate a YYYY-MM-DD stock date, raising ValueError with a user-facing message."""
+    if not date:
+        raise ValueError("Date is required")
+    try:
+        datetime.strptime(date, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        raise ValueError("Invalid date format. Use YYYY-MM-DD")
+    return date
+
+def parse_whole_number(value):
+    """Return ``value`` as an int, rejecting booleans and fractional numbers."""
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(f"{value!r} is not a whole number")
+    return int(value)
+
+def validate_holder_stock(holder_number, stock_number, layout):
+    """Validate one holder count and return (holder_number, stock_number, ticket_value)."""
+    try:
+        holder_number = parse_whole_number(holder_number)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid holder number {holder_number}")
+    if not 1 <= holder_number <= HOLDER_COUNT:
+        raise ValueError(f"Holder number {holder_number} must be between 1 and {HOLDER_COUNT}")
+    try:
+        stock_number = parse_whole_number(stock_number)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid stock number for holder {holder_number}")
+    if stock_number < 0:
+        raise ValueError(f"Stock number for holder {holder_number} cannot be negative")
+    return holder_number, stock_number, layout.value_for(holder_number)
+
+def validate_extra_ticket(price, stock):
+    """Validate one extra ticket entry and return (price, stock)."""
+    try:
+        price = parse_whole_number(price)
+    except (TypeError, ValueError):
+        raise ValueError("Extra ticket price must be a whole number")
+    try:
+        stock = parse_whole_number(stock)
+    except (TypeError, ValueError):
+        raise ValueError("Extra ticket stock number must be a whole number")
+    if price <= 0:
+        raise ValueError(f"Extra ticket price must be positive")
+    if stock < 0:
+        raise ValueError(f"Extra ticket stock number cannot be negative")
+    return price, stock
+
+# ---------------------------------------------------------------------------
+# Archived stock snapshots
+# ---------------------------------------------------------------------------
+
+# An archived day is one stock_snapshots row: the day's layout version plus
+# HOLDER_COUNT little-endian uint32 stock counts (index 0 is holder 1).
+# Holders with no count for the day hold SNAPSHOT_MISSING.
+SNAPSHOT_MISSING = 0xFFFFFFFF
+
+# Days newer than this are left in lottery_stock by default
+ARCHIVE_AFTER_DAYS = 90
+
+def encode_snapshot_counts(counts):
+    packed = array('I', counts)
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    return packed.tobytes()
+
+def decode_snapshot_counts(blob):
+    """Return the stock counts of a snapshot blob as a sequence of ints."""
+    if sys.byteorder == 'little':
+        return memoryview(blob).cast('I')  # zero-copy view over the blob
+    counts = array('I', blob)
+    counts.byteswap()
+    return counts
+
+def iter_snapshot_holders(snapshot):
+    """Yield (holder_number, stock_number, ticket_value) for a stock_snapshots row."""
+    layout = get_holder_layout_version(snapshot['layout_version'])
+    for index, stock_number in enumerate(decode_snapshot_counts(snapshot['counts'])):
+        if stock_number != SNAPSHOT_MISSING:
+            yield index + 1, stock_number, layout.values[index + 1]
+
+def load_snapshot_entries(conn, date):
+    """Return an archived day's holder rows in the shape of lottery_stock rows."""
+    snapshot = conn.execute('''
+        SELECT date, layout_version, counts FROM stock_snapshots WHERE date = ?
+    ''', (date,)).fetchone()
+    if snapshot is None:
+        return []
+    return [{'source': 'holder', 'id': None, 'date': date, 'holder_number': holder_number,
+             'stock_number': stock_number, 'ticket_value': ticket_value, 'ticket_price': None}
+            for holder_number, stock_number, ticket_value in iter_snapshot_holders(snapshot)]
+
+def archive_stock_days(conn, before):
+    """Pack lottery_stock days before a date into stock_snapshots and return (archived, skipped)."""
+    archived, skipped = [], []
+    rows = conn.execute('''
+        SELECT date, holder_number, stock_number, ticket_value
+        FROM lottery_stock
+        WHERE date < ?
+        ORDER BY date
+    ''', (before,)).fetchall()
+    by_date = {}
+    for row in rows:
+        by_date.setdefault(row['date'], []).append(row)
+    for date, day_rows in by_date.items():
+        layout = get_holder_layout(date)
+        counts = [SNAPSHOT_MISSING] * HOLDER_COUNT
+        for row in day_rows:
+            if row['ticket_value'] != layout.value_for(row['holder_number']) \
+                    or row['stock_number'] >= SNAPSHOT_MISSING:
+                skipped.append(date)
+                break
+            counts[row['holder_number'] - 1] = row['stock_number']
+        else:
+            conn.execute('''
+                INSERT INTO stock_snapshots (date, layout_version, counts) VALUES (?, ?, ?)
+            ''', (date, layout.version, encode_snapshot_counts(counts)))
+            conn.execute('DELETE FROM lottery_stock WHERE date = ?', (date,))
+            archived.append(date)
+    return archived, skipped
+
+def unarchive_stock_day(conn, date):
+    """Move an archived day back into lottery_stock; the caller commits."""
+    snapshot = conn.execute('''
+        SELECT date, layout_version, counts FROM stock_snapshots WHERE date = ?
+    ''', (date,)).fetchone()
+    if snapshot is None:
+        return False
+    # Inserted while the snapshot exists, so the totals triggers skip them
+    conn.executemany('''
+        INSERT INTO lottery_stock (date, holder_number, stock_number, ticket_value)
+        VALUES (?, ?, ?, ?)
+    ''', [(date, *holder) for holder in iter_snapshot_holders(snapshot)])
+    conn.execute('DELETE FROM stock_snapshots WHERE date = ?', (date,))
+    return True
+
+@bp.cli.command('archive-stock')
+@click.option('--before', 'before', help=f'Archive days before this date (default: {ARCHIVE_AFTER_DAYS} days ago).')
+def archive_stock_command(before):
+    """Pack finalized lottery_stock days into one snapshot row each."""
+    try:
+        before = validate_stock_date(before or (datetime.now() - timedelta(days=ARCHIVE_AFTER_DAYS)).strftime('%Y-%m-%d'))
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    conn = get_db_connection()
+    archived, skipped = archive_stock_days(conn, before)
+    conn.commit()
+    for date in skipped:
+        click.echo(f'Skipped {date}: ticket values differ from the holder layout')
+    click.echo(f'Archived {len(archived)} day(s) before {before}.')
+
+def save_stock_day(conn, date, entries, extra_ticket_entries):
+    """Write a day's holder and extra ticket rows, touching only what changed; the caller commits."""
+    unarchive_stock_day(conn, date)
+    stored_holders = {
+        row['holder_number']: (row['stock_number'], row['ticket_value'])
+        for row in conn.execute('''
+            SELECT holder_number, stock_number, ticket_value
+            FROM lottery_stock
+            WHERE date = ?
+        ''', (date,))
+    }
+    stored_extras = conn.execute('''
+        SELECT id, ticket_price, stock_number
+        FROM extra_tickets
+        WHERE date = ?
+        ORDER BY id
+    ''', (date,)).fetchall()
+
+    changed_entries = [entry for entry in entries
+                       if stored_holders.get(entry[1]) != (entry[2], entry[3])]
+    if changed_entries:
+        conn.executemany('''
+            INSERT INTO lottery_stock (date, holder_number, stock_number, ticket_value)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(date, holder_number) DO UPDATE SET
+                stock_number = excluded.stock_number,
+                ticket_value = excluded.ticket_value
+            WHERE stock_number != excluded.stock_number
+               OR ticket_value != excluded.ticket_value
+        ''', changed_entries)
+
+    # Keep stored extras that match exactly, then reuse same-price rows
+    unmatched = list(stored_extras)
+    pending = []
+    for entry in extra_ticket_entries:
+        match = next((row for row in unmatched
+                      if (row['ticket_price'], row['stock_number']) == entry[1:]), None)
+        if match is not None:
+            unmatched.remove(match)
+        else:
+            pending.append(entry)
+    updates, inserts = [], []
+    for entry in pending:
+        match = next((row for row in unmatched if row['ticket_price'] == entry[1]), None)
+        if match is not None:
+            unmatched.remove(match)
+            updates.append((entry[2], match['id']))
+        else:
+            inserts.append(entry)
+    deletes = [(row['id'],) for row in unmatched]
+    if updates:
+        conn.executemany('UPDATE extra_tickets SET stock_number = ? WHERE id = ?', updates)
+    if deletes:
+        conn.executemany('DELETE FROM extra_tickets WHERE id = ?', deletes)
+    if inserts:
+        conn.executemany('''
+            INSERT INTO extra_tickets (date, ticket_price, stock_number)
+            VALUES (?, ?, ?)
+        ''', inserts)
+
+    summary = {
+        'date': date,
+        'holders_changed': sorted(entry[1] for entry in changed_entries),
+        'extras_added': len(inserts),
+        'extras_updated': len(updates),
+        'extras_removed': len(deletes),
+    }
+    if not stored_holders and not stored_extras:
+        summary['status'] = 'created'
+    elif changed_entries or updates or deletes or inserts:
+        summary['status'] = 'updated'
+    else:
+        summary['status'] = 'unchanged'
+    return summary
+
+def describe_stock_changes(summary):
+    """Human-readable flash message for a save_stock_day summary."""
+    if summary['status'] == 'created':
+        return 'Stock numbers successfully recorded!'
+    if summary['status'] == 'unchanged':
+        return f"No changes: stock for {summary['date']} already matches what was submitted."
+    parts = []
+    if summary['holders_changed']:
+        parts.append(f"{len(summary['holders_changed'])} holder(s) changed "
+                     f"({', '.join(map(str, summary['holders_changed']))})")
+    for key, label in (('extras_added', 'added'), ('extras_updated', 'updated'),
+                       ('extras_removed', 'removed')):
+        if summary[key]:
+            parts.append(f"{summary[key]} extra ticket(s) {label}")
+    return f"Stock for {summary['date']} updated: {'; '.join(parts)}."
+
+@bp.route('/', methods=['GET', 'POST'])
 def enter_stock():
     REQUIRE_ALL_FIELDS = True
-    holder_sequence = (
-        list(range(1, 15)) +         # 1–14
-        list(range(28, 14, -1)) +    # 28–15
-        list(range(29, 43)) +        # 29–42
-        list(range(56, 42, -1))      # 56–43
-    )
 
     error_message = None
     previous_values = {}
     current_date = datetime.now().strftime('%Y-%m-%d')
+    layout = get_holder_layout(current_date)
 
     if request.method == 'POST':
         try:
-            date = request.form['date']
-            if not date:
-                raise ValueError("Date is required")
-            
-            # Validate date format
-            try:
-                datetime.strptime(date, '%Y-%m-%d')
-            except ValueError:
-                raise ValueError("Invalid date format. Use YYYY-MM-DD")
+            date = validate_stock_date(request.form['date'])
+            layout = get_holder_layout(date)
             
             entries = []
             missing = []
-            conn = get_db_connection()
             
-            try:
-                for i in holder_sequence:
-                    field_name = f'holder_{i}'
-                    stock_number = request.form.get(field_name)
-                    previous_values[i] = stock_number
-
-                    if not stock_number and REQUIRE_ALL_FIELDS:
-                        missing.append(i)
-                        continue
-
-                    if stock_number:
-                        try:
-                            stock_number = int(stock_number)
-                            if stock_number < 0:
-                                raise ValueError(f"Stock number for holder {i} cannot be negative")
-                        except ValueError:
-                            raise ValueError(f"Invalid stock number for holder {i}")
-                        
-                        ticket_value = holder_ticket_values.get(i, 0)
-                        entries.append((date, i, stock_number, ticket_value))
-
-                # Handle extra tickets
-                extra_ticket_entries = []
-                extra_index = 1
-                while True:
-                    price_field = f'extra_price_{extra_index}'
-                    stock_field = f'extra_stock_{extra_index}'
-                    
-                    price = request.form.get(price_field)
-                    stock = request.form.get(stock_field)
-                    
-                    if not price and not stock:
-                        break
-                    
-                    if price and stock:
-                        try:
-                            price = int(price)
-                            stock = int(stock)
-                            if price <= 0:
-                                raise ValueError(f"Extra ticket price must be positive")
-                            if stock < 0:
-                                raise ValueError(f"Extra ticket stock number cannot be negative")
-                            extra_ticket_entries.append((date, price, stock))
-                        except ValueError as e:
-                            raise ValueError(f"Invalid extra ticket entry {extra_index}: {str(e)}")
-                    elif price or stock:
-                        raise ValueError(f"Both price and stock number must be provided for extra ticket {extra_index}")
-                    
-                    extra_index += 1
+            for i in layout.sequence:
+                field_name = f'holder_{i}'
+                stock_number = request.form.get(field_name)
+                previous_values[i] = stock_number
 
-                if missing:
-                    error_message = f"Please fill in all holders. Missing: {missing}"
-                else:
-                    # Insert holder entries
-                    conn.executemany('''
-                        INSERT INTO lottery_stock (date, holder_number, stock_number, ticket_value)
-                        VALUES (?, ?, ?, ?)
-                    ''', entries)
-                    
-                    # Insert extra ticket entries
-                    if extra_ticket_entries:
-                        conn.executemany('''
-                            INSERT INTO extra_tickets (date, ticket_price, stock_number)
-                            VALUES (?, ?, ?)
-                        ''', extra_ticket_entries)
-                    
-                    conn.commit()
-                    flash('Stock numbers successfully recorded!', 'success')
-                    return redirect(url_for('enter_stock'))
-            
-            finally:
-                conn.close()
+                if not stock_number and REQUIRE_ALL_FIELDS:
+                    missing.append(i)
+                    continue
+
+                if stock_number:
+                    entries.append((date, *validate_holder_stock(i, stock_number, layout)))
+
+            # Handle extra tickets
+            extra_ticket_entries = []
+            extra_index = 1
+            while True:
+                price_field = f'extra_price_{extra_index}'
+                stock_field = f'extra_stock_{extra_index}'
+                
+                price = request.form.get(price_field)
+                stock = request.form.get(stock_field)
+                
+                if not price and not stock:
+                    break
+                
+                if price and stock:
+                    try:
+                        extra_ticket_entries.append((date, *validate_extra_ticket(price, stock)))
+                    except ValueError as e:
+                        raise ValueError(f"Invalid extra ticket entry {extra_index}: {str(e)}")
+                elif price or stock:
+                    raise ValueError(f"Both price and stock number must be provided for extra ticket {extra_index}")
+                
+                extra_index += 1
+
+            if missing:
+                error_message = f"Please fill in all holders. Missing: {missing}"
+            else:
+                summary = run_write(lambda conn: save_stock_day(conn, date, entries, extra_ticket_entries))
+                flash(describe_stock_changes(summary), 'success')
+                return redirect(url_for('lottery.enter_stock'))
                 
         except ValueError as e:
             error_message = str(e)
@@ -300,10 +1740,10 @@ def enter_stock():
     holder_data = [
         {
             "number": i,
-            "value": holder_ticket_values.get(i, 0),
+            "value": layout.value_for(i),
             "entered": previous_values.get(i, "")
         }
-        for i in holder_sequence
+        for i in layout.sequence
     ]
 
     return render_template(
@@ -313,7 +1753,80 @@ def enter_stock():
         current_date=current_date
     )
 
-@app.route('/reports', methods=['GET', 'POST'])
+# ---------------------------------------------------------------------------
+# Rendered page cache
+# ---------------------------------------------------------------------------
+
+# data_versions key bumped whenever the set of known dates changes
+ALL_DATES_VERSION_KEY = ''
+
+# Upper bound on rendered bytes kept per worker process
+PAGE_CACHE_MAX_BYTES = int(os.environ.get('PAGE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+class PageCache:
+    """Thread-safe LRU cache of rendered pages, bounded by total body size."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, body, etag):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[0])
+            self._entries[key] = (body, etag)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+page_cache = PageCache(PAGE_CACHE_MAX_BYTES)
+
+def get_data_versions(conn, dates):
+    """Return the current data version of each date (0 if never written)."""
+    placeholders = ', '.join('?' * len(dates))
+    versions = {row['date']: row['version'] for row in conn.execute(
+        f'SELECT date, version FROM data_versions WHERE date IN ({placeholders})', tuple(dates))}
+    return tuple(versions.get(date, 0) for date in dates)
+
+def render_cached(key, render, mimetype='text/html'):
+    """Serve a page from the rendered-page cache, rendering it on a miss."""
+    if request.method != 'GET' or session.get('_flashes'):
+        body = render()
+        return Response(body, mimetype=mimetype) if isinstance(body, str) else body
+    key = (get_db_path(), bool(check_admin_access())) + key
+    entry = page_cache.get(key)
+    if entry is None:
+        body = render()
+        if not isinstance(body, str):
+            return body
+        body = body.encode('utf-8')
+        entry = (body, hashlib.sha256(body).hexdigest()[:32])
+        page_cache.put(key, *entry)
+    body, etag = entry
+    response = Response(body, mimetype=mimetype)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+@bp.route('/reports', methods=['GET', 'POST'])
 def reports():
     conn = get_db_connection()
     try:
@@ -327,138 +1840,155 @@ def reports():
                 new_stock = int(request.form['new_stock'])
                 
                 # Update the stock number
-                conn.execute('''
-                    UPDATE lottery_stock 
-                    SET stock_number = ? 
-                    WHERE date = ? AND holder_number = ?
-                ''', (new_stock, date, holder_number))
-                conn.commit()
+                def update_stock(conn):
+                    unarchive_stock_day(conn, date)
+                    conn.execute('''
+                        UPDATE lottery_stock 
+                        SET stock_number = ? 
+                        WHERE date = ? AND holder_number = ?
+                    ''', (new_stock, date, holder_number))
+                
+                run_write(update_stock)
                 flash('Stock number updated successfully!', 'success')
-                return redirect(url_for('reports', date=date))
+                return redirect(url_for('lottery.reports', date=date))
             
             elif action == 'delete_entry':
                 # Delete individual stock entry
                 date = request.form['date']
                 holder_number = int(request.form['holder_number'])
                 
-                conn.execute('''
-                    DELETE FROM lottery_stock 
-                    WHERE date = ? AND holder_number = ?
-                ''', (date, holder_number))
-                conn.commit()
+                def delete_entry(conn):
+                    unarchive_stock_day(conn, date)
+                    conn.execute('''
+                        DELETE FROM lottery_stock 
+                        WHERE date = ? AND holder_number = ?
+                    ''', (date, holder_number))
+                
+                run_write(delete_entry)
                 flash('Stock entry deleted successfully!', 'success')
-                return redirect(url_for('reports', date=date))
+                return redirect(url_for('lottery.reports', date=date))
             
             elif action == 'delete_all_date':
                 # Delete all stock entries for a specific date
                 date = request.form['date']
                 
-                # Check how many entries will be deleted
-                count = conn.execute('''
-                    SELECT COUNT(*) as count 
-                    FROM lottery_stock 
-                    WHERE date = ?
-                ''', (date,)).fetchone()['count']
+                def delete_all(conn):
+                    unarchive_stock_day(conn, date)
+                    # Check how many entries will be deleted
+                    count = conn.execute('''
+                        SELECT COUNT(*) as count 
+                        FROM lottery_stock 
+                        WHERE date = ?
+                    ''', (date,)).fetchone()['count']
+                    
+                    if count > 0:
+                        conn.execute('''
+                            DELETE FROM lottery_stock 
+                            WHERE date = ?
+                        ''', (date,))
+                    return count
                 
+                count = run_write(delete_all)
                 if count > 0:
-                    conn.execute('''
-                        DELETE FROM lottery_stock 
-                        WHERE date = ?
-                    ''', (date,))
-                    conn.commit()
                     flash(f'All {count} stock entries for {date} deleted successfully!', 'success')
                 else:
                     flash('No stock entries found for this date.', 'error')
-                
-                return redirect(url_for('reports'))
-
-        # Get the selected date from query parameters or use today's date
-        selected_date = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
-        
-        # Get all unique dates for the date selector
-        dates = conn.execute('''
-            SELECT DISTINCT date 
-            FROM lottery_stock 
-            ORDER BY date DESC
-        ''').fetchall()
-        
-        # Get all stock entries for the selected date
-        entries = conn.execute('''
-            SELECT * 
-            FROM lottery_stock 
-            WHERE date = ? 
-            ORDER BY holder_number
-        ''', (selected_date,)).fetchall()
-        
-        # Calculate totals by ticket value from holders
-        totals = conn.execute('''
-            SELECT 
-                ticket_value,
-                SUM(stock_number) as total_tickets,
-                SUM(stock_number * ticket_value) as total_value
-            FROM lottery_stock 
-            WHERE date = ? 
-            GROUP BY ticket_value
-            ORDER BY ticket_value DESC
-        ''', (selected_date,)).fetchall()
-        
-        # Get extra tickets for the selected date
-        extra_tickets = conn.execute('''
-            SELECT * 
-            FROM extra_tickets 
-            WHERE date = ? 
-            ORDER BY ticket_price DESC, id
-        ''', (selected_date,)).fetchall()
-        
-        # Calculate totals by ticket price from extra tickets
-        extra_totals = conn.execute('''
-            SELECT 
-                ticket_price as ticket_value,
-                SUM(stock_number) as total_tickets,
-                SUM(stock_number * ticket_price) as total_value
-            FROM extra_tickets 
-            WHERE date = ? 
-            GROUP BY ticket_price
-            ORDER BY ticket_price DESC
-        ''', (selected_date,)).fetchall()
-        
-        # Calculate grand total (holders + extra tickets)
-        holder_total = conn.execute('''
-            SELECT SUM(stock_number * ticket_value) as total
-            FROM lottery_stock 
-            WHERE date = ?
-        ''', (selected_date,)).fetchone()['total'] or 0
+                
+                return redirect(url_for('lottery.reports'))
+
+        # Get the selected date from query parameters or use today's date
+        selected_date = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
         
-        extra_total = conn.execute('''
-            SELECT SUM(stock_number * ticket_price) as total
-            FROM extra_tickets 
-            WHERE date = ?
-        ''', (selected_date,)).fetchone()['total'] or 0
+        def render():
+            # Dates with holder or extra ticket data for the date selector
+            dates = conn.execute('''
+                SELECT date 
+                FROM stock_dates 
+                ORDER BY date DESC
+            ''').fetchall()
+            
+            # Entries, extra tickets and all totals for the selected date
+            summary = DailySummary.load(selected_date)
+            
+            return render_template(
+                'reports.html',
+                dates=dates,
+                selected_date=selected_date,
+                entries=summary.entries,
+                totals=summary.totals,
+                extra_tickets=summary.extra_tickets,
+                extra_totals=summary.extra_totals,
+                grand_total=summary.grand_total
+            )
         
-        grand_total = holder_total + extra_total
-
-        return render_template(
-            'reports.html',
-            dates=dates,
-            selected_date=selected_date,
-            entries=entries,
-            totals=totals,
-            extra_tickets=extra_tickets,
-            extra_totals=extra_totals,
-            grand_total=grand_total
-        )
+        # The page depends on the date's data and on the list of dates
+        versions = get_data_versions(conn, [selected_date, ALL_DATES_VERSION_KEY])
+        return render_cached(('reports', selected_date, versions), render)
     except Exception as e:
         logger.error(f"Error in reports: {str(e)}")
         flash('An error occurred while processing the report.', 'error')
-        return redirect(url_for('reports'))
-    finally:
-        conn.close()
+        return redirect(url_for('lottery.reports'))
+
+def calculate_report_totals(yesterday_closing, today_closing, books, machine_sold,
+                            tickets_cashed, online_cashed):
+    """Apply the daily report formula in the exact order specified."""
+    total_new_books = sum(books)
+    net_total_scratch = (yesterday_closing + total_new_books) - today_closing
+    total_lottery_sale = net_total_scratch + machine_sold
+    lottery_deposit_amount = total_lottery_sale - (tickets_cashed + online_cashed)
+    return total_new_books, net_total_scratch, total_lottery_sale, lottery_deposit_amount
+
+def refresh_stale_reports(conn, dates=None):
+    """Recompute stale daily_reports rows and return their dates; the caller commits."""
+    query = 'SELECT * FROM daily_reports WHERE stale = 1'
+    params = ()
+    if dates is not None:
+        dates = list(dates)
+        if not dates:
+            return []
+        query += f" AND date IN ({', '.join('?' * len(dates))})"
+        params = tuple(dates)
+    stale = conn.execute(query, params).fetchall()
+    if not stale:
+        return []
+
+    updates = []
+    for report in stale:
+        today_closing = report['today_closing']
+        yesterday_closing = report['yesterday_closing']
+        if not report['today_closing_overridden']:
+            today_closing = get_daily_grand_total(report['date'])
+        if not report['yesterday_closing_overridden']:
+            yesterday = (datetime.strptime(report['date'], '%Y-%m-%d') - timedelta(days=1)).strftime('%Y-%m-%d')
+            yesterday_closing = get_daily_grand_total(yesterday)
+        books = [report[f'books_{value}'] for value in BOOK_VALUES]
+        updates.append((yesterday_closing, today_closing,
+                        *calculate_report_totals(yesterday_closing, today_closing, books,
+                                                 report['machine_sold'], report['tickets_cashed'],
+                                                 report['online_cashed']),
+                        report['id']))
+    conn.executemany('''
+        UPDATE daily_reports SET
+            yesterday_closing = ?, today_closing = ?,
+            total_new_books = ?, net_total_scratch = ?,
+            total_lottery_sale = ?, lottery_deposit_amount = ?,
+            stale = 0
+        WHERE id = ?
+    ''', updates)
+    return [report['date'] for report in stale]
+
+@bp.cli.command('refresh-reports')
+def refresh_reports_command():
+    """Recompute every daily report whose stock data changed after it was saved."""
+    conn = get_db_connection()
+    dates = refresh_stale_reports(conn)
+    conn.commit()
+    click.echo(f"Refreshed {len(dates)} stale report(s){': ' + ', '.join(dates) if dates else '.'}")
 
-@app.route('/create-report', methods=['GET', 'POST'])
+@bp.route('/create-report', methods=['GET', 'POST'])
 @require_admin()
 def create_report():
     from datetime import timedelta
-    conn = get_db_connection()
     error_message = None
     
     try:
@@ -470,39 +2000,27 @@ def create_report():
             override_today = request.form.get('override_today_closing')
             override_yesterday = request.form.get('override_yesterday_closing')
             
-            # Get lottery totals including both holder tickets and extra tickets
-            if override_today and override_today.strip():
-                today_closing = float(override_today)
-            else:
-                today_closing = get_daily_grand_total(selected_date)
-            
             # Calculate yesterday's date
             selected_dt = datetime.strptime(selected_date, '%Y-%m-%d')
             yesterday = (selected_dt - timedelta(days=1)).strftime('%Y-%m-%d')
             
+            # Lottery totals including both holder tickets and extra tickets
+            today_summary = DailySummary.load(selected_date, with_entries=False)
+            yesterday_summary = DailySummary.load(yesterday, with_entries=False)
+            
+            if override_today and override_today.strip():
+                today_closing = float(override_today)
+            else:
+                today_closing = today_summary.grand_total
+            
             if override_yesterday and override_yesterday.strip():
                 yesterday_closing = float(override_yesterday)
             else:
-                yesterday_closing = get_daily_grand_total(yesterday)
+                yesterday_closing = yesterday_summary.grand_total
             
-            # Check if we have data for both dates
-            # Check if there's any lottery data for today (either holders or extra tickets)
-            today_has_data = conn.execute('''
-                SELECT COUNT(*) as count FROM (
-                    SELECT 1 FROM lottery_stock WHERE date = ?
-                    UNION
-                    SELECT 1 FROM extra_tickets WHERE date = ?
-                )
-            ''', (selected_date, selected_date)).fetchone()['count'] > 0
-            
-            # Check if there's any lottery data for yesterday
-            yesterday_has_data = conn.execute('''
-                SELECT COUNT(*) as count FROM (
-                    SELECT 1 FROM lottery_stock WHERE date = ?
-                    UNION
-                    SELECT 1 FROM extra_tickets WHERE date = ?
-                )
-            ''', (yesterday, yesterday)).fetchone()['count'] > 0
+            # Check if there's any lottery data for both dates (either holders or extra tickets)
+            today_has_data = today_summary.has_data
+            yesterday_has_data = yesterday_summary.has_data
             
             if not today_has_data:
                 error_message = f'No lottery stock data found for today ({selected_date}). Please enter stock data first.'
@@ -523,24 +2041,45 @@ def create_report():
                     online_cashed = float(request.form.get('online_cashed', 0) or 0)
                     
                     # Perform calculations in the exact order specified
-                    total_new_books = books_1 + books_2 + books_5 + books_10 + books_20 + books_30 + books_50
-                    net_total_scratch = (yesterday_closing + total_new_books) - today_closing
-                    total_lottery_sale = net_total_scratch + machine_sold
-                    lottery_deposit_amount = total_lottery_sale - (tickets_cashed + online_cashed)
+                    total_new_books, net_total_scratch, total_lottery_sale, lottery_deposit_amount = \
+                        calculate_report_totals(
+                            yesterday_closing, today_closing,
+                            (books_1, books_2, books_5, books_10, books_20, books_30, books_50),
+                            machine_sold, tickets_cashed, online_cashed)
                     
-                    # Save to database (replace if exists for same date)
-                    conn.execute('''
-                        INSERT OR REPLACE INTO daily_reports (
+                    # Save to database (update in place if one exists for the same
+                    # date, so the rollup triggers see the old values)
+                    run_write(lambda conn: conn.execute('''
+                        INSERT INTO daily_reports (
                             date, yesterday_closing, today_closing,
                             books_1, books_2, books_5, books_10, books_20, books_30, books_50,
                             machine_sold, tickets_cashed, online_cashed,
-                            total_new_books, net_total_scratch, total_lottery_sale, lottery_deposit_amount
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                            total_new_books, net_total_scratch, total_lottery_sale, lottery_deposit_amount,
+                            today_closing_overridden, yesterday_closing_overridden
+                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(date) DO UPDATE SET
+                            yesterday_closing = excluded.yesterday_closing,
+                            today_closing = excluded.today_closing,
+                            books_1 = excluded.books_1, books_2 = excluded.books_2,
+                            books_5 = excluded.books_5, books_10 = excluded.books_10,
+                            books_20 = excluded.books_20, books_30 = excluded.books_30,
+                            books_50 = excluded.books_50,
+                            machine_sold = excluded.machine_sold,
+                            tickets_cashed = excluded.tickets_cashed,
+                            online_cashed = excluded.online_cashed,
+                            total_new_books = excluded.total_new_books,
+                            net_total_scratch = excluded.net_total_scratch,
+                            total_lottery_sale = excluded.total_lottery_sale,
+                            lottery_deposit_amount = excluded.lottery_deposit_amount,
+                            today_closing_overridden = excluded.today_closing_overridden,
+                            yesterday_closing_overridden = excluded.yesterday_closing_overridden,
+                            stale = 0
                     ''', (selected_date, yesterday_closing, today_closing,
                           books_1, books_2, books_5, books_10, books_20, books_30, books_50,
                           machine_sold, tickets_cashed, online_cashed,
-                          total_new_books, net_total_scratch, total_lottery_sale, lottery_deposit_amount))
-                    conn.commit()
+                          total_new_books, net_total_scratch, total_lottery_sale, lottery_deposit_amount,
+                          bool(override_today and override_today.strip()),
+                          bool(override_yesterday and override_yesterday.strip()))))
                     
                     # Prepare data for template
                     report_data = {
@@ -583,32 +2122,12 @@ def create_report():
         selected_date = request.args.get('date', current_date)
         if selected_date:
             try:
-                # Calculate totals by ticket value from holders
-                totals = conn.execute('''
-                    SELECT 
-                        ticket_value,
-                        SUM(stock_number) as total_tickets,
-                        SUM(stock_number * ticket_value) as total_value
-                    FROM lottery_stock 
-                    WHERE date = ? 
-                    GROUP BY ticket_value
-                    ORDER BY ticket_value DESC
-                ''', (selected_date,)).fetchall()
-                
-                # Calculate totals by ticket price from extra tickets
-                extra_totals = conn.execute('''
-                    SELECT 
-                        ticket_price as ticket_value,
-                        SUM(stock_number) as total_tickets,
-                        SUM(stock_number * ticket_price) as total_value
-                    FROM extra_tickets 
-                    WHERE date = ? 
-                    GROUP BY ticket_price
-                    ORDER BY ticket_price DESC
-                ''', (selected_date,)).fetchall()
+                summary = DailySummary.load(selected_date, with_entries=False)
+                totals = summary.totals
+                extra_totals = summary.extra_totals
                 
                 # Get closing values
-                today_closing_value = get_daily_grand_total(selected_date)
+                today_closing_value = summary.grand_total
                 selected_dt = datetime.strptime(selected_date, '%Y-%m-%d')
                 yesterday = (selected_dt - timedelta(days=1)).strftime('%Y-%m-%d')
                 yesterday_closing_value = get_daily_grand_total(yesterday)
@@ -631,10 +2150,72 @@ def create_report():
         error_message = 'An error occurred while processing the report.'
         current_date = datetime.now().strftime('%Y-%m-%d')
         return render_template('create_report.html', current_date=current_date, show_report=False, error=error_message)
-    finally:
-        conn.close()
 
-@app.route('/lottery-reports', methods=['GET', 'POST'])
+# Page size for the lottery reports listing
+REPORTS_PAGE_SIZE = 50
+REPORTS_MAX_PAGE_SIZE = 200
+
+# Amount filters: query parameter -> (column, comparison)
+REPORT_AMOUNT_FILTERS = {
+    'min_deposit': ('lottery_deposit_amount', '>='),
+    'max_deposit': ('lottery_deposit_amount', '<='),
+    'min_sale': ('total_lottery_sale', '>='),
+    'max_sale': ('total_lottery_sale', '<='),
+}
+
+def parse_report_filters(args):
+    """Parse listing filters and the keyset cursor from query parameters."""
+    filters = {
+        'date_from': args.get('from') or None,
+        'date_to': args.get('to') or None,
+        'before': args.get('before') or None,
+    }
+    for key in ('date_from', 'date_to', 'before'):
+        if filters[key]:
+            validate_stock_date(filters[key])
+    for key in REPORT_AMOUNT_FILTERS:
+        value = args.get(key)
+        try:
+            filters[key] = float(value) if value not in (None, '') else None
+        except ValueError:
+            raise ValueError(f"Invalid amount for {key.replace('_', ' ')}")
+    try:
+        limit = int(args.get('limit') or REPORTS_PAGE_SIZE)
+    except ValueError:
+        limit = REPORTS_PAGE_SIZE
+    filters['limit'] = max(1, min(limit, REPORTS_MAX_PAGE_SIZE))
+    filters['active'] = any(filters[key] is not None
+                            for key in ('date_from', 'date_to', *REPORT_AMOUNT_FILTERS))
+    return filters
+
+def query_daily_reports(conn, filters):
+    """Return one page of daily_reports (newest first) and the cursor for the next page."""
+    clauses, params = [], []
+    if filters['before']:
+        clauses.append('date < ?')
+        params.append(filters['before'])
+    if filters['date_from']:
+        clauses.append('date >= ?')
+        params.append(filters['date_from'])
+    if filters['date_to']:
+        clauses.append('date <= ?')
+        params.append(filters['date_to'])
+    for key, (column, op) in REPORT_AMOUNT_FILTERS.items():
+        if filters[key] is not None:
+            clauses.append(f'{column} {op} ?')
+            params.append(filters[key])
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    limit = filters['limit']
+    rows = conn.execute(f'''
+        SELECT * FROM daily_reports
+        {where}
+        ORDER BY date DESC
+        LIMIT ?
+    ''', (*params, limit + 1)).fetchall()
+    next_before = rows[limit - 1]['date'] if len(rows) > limit else None
+    return rows[:limit], next_before
+
+@bp.route('/lottery-reports', methods=['GET', 'POST'])
 @require_admin()
 def lottery_reports():
     conn = get_db_connection()
@@ -663,14 +2244,23 @@ def lottery_reports():
                     override_today = request.form.get('override_today_closing')
                     override_yesterday = request.form.get('override_yesterday_closing')
                     
-                    # Get existing report data for date calculations
-                    existing_report = conn.execute('''
-                        SELECT date, yesterday_closing, today_closing 
-                        FROM daily_reports 
-                        WHERE id = ?
-                    ''', (report_id,)).fetchone()
-                    
-                    if existing_report:
+                    def apply_edit(conn):
+                        # Get existing report data for date calculations
+                        existing_report_sql = '''
+                            SELECT date, yesterday_closing, today_closing, stale 
+                            FROM daily_reports 
+                            WHERE id = ?
+                        '''
+                        existing_report = conn.execute(existing_report_sql, (report_id,)).fetchone()
+                        
+                        # Bring closings up to date if the stock changed since the report was saved
+                        if existing_report and existing_report['stale']:
+                            refresh_stale_reports(conn, [existing_report['date']])
+                            existing_report = conn.execute(existing_report_sql, (report_id,)).fetchone()
+                        
+                        if not existing_report:
+                            return False
+                        
                         # Use override values if provided, otherwise use existing values
                         if override_today and override_today.strip():
                             today_closing = float(override_today)
@@ -683,10 +2273,11 @@ def lottery_reports():
                             yesterday_closing = existing_report['yesterday_closing']
                         
                         # Recalculate all values
-                        total_new_books = books_1 + books_2 + books_5 + books_10 + books_20 + books_30 + books_50
-                        net_total_scratch = (yesterday_closing + total_new_books) - today_closing
-                        total_lottery_sale = net_total_scratch + machine_sold
-                        lottery_deposit_amount = total_lottery_sale - (tickets_cashed + online_cashed)
+                        total_new_books, net_total_scratch, total_lottery_sale, lottery_deposit_amount = \
+                            calculate_report_totals(
+                                yesterday_closing, today_closing,
+                                (books_1, books_2, books_5, books_10, books_20, books_30, books_50),
+                                machine_sold, tickets_cashed, online_cashed)
                         
                         # Update the report (including potentially overridden closing values)
                         conn.execute('''
@@ -696,14 +2287,21 @@ def lottery_reports():
                                 books_20 = ?, books_30 = ?, books_50 = ?,
                                 machine_sold = ?, tickets_cashed = ?, online_cashed = ?,
                                 total_new_books = ?, net_total_scratch = ?, 
-                                total_lottery_sale = ?, lottery_deposit_amount = ?
+                                total_lottery_sale = ?, lottery_deposit_amount = ?,
+                                today_closing_overridden = MAX(today_closing_overridden, ?),
+                                yesterday_closing_overridden = MAX(yesterday_closing_overridden, ?)
                             WHERE id = ?
                         ''', (yesterday_closing, today_closing,
                               books_1, books_2, books_5, books_10, books_20, books_30, books_50,
                               machine_sold, tickets_cashed, online_cashed,
                               total_new_books, net_total_scratch, total_lottery_sale, 
-                              lottery_deposit_amount, report_id))
-                        conn.commit()
+                              lottery_deposit_amount,
+                              bool(override_today and override_today.strip()),
+                              bool(override_yesterday and override_yesterday.strip()),
+                              report_id))
+                        return True
+                    
+                    if run_write(apply_edit):
                         flash('Report updated successfully!', 'success')
                     else:
                         flash('Report not found.', 'error')
@@ -713,26 +2311,156 @@ def lottery_reports():
             
             elif action == 'delete':
                 report_id = request.form['report_id']
-                conn.execute('DELETE FROM daily_reports WHERE id = ?', (report_id,))
-                conn.commit()
+                run_write(lambda conn: conn.execute('DELETE FROM daily_reports WHERE id = ?', (report_id,)))
                 flash('Report deleted successfully!', 'success')
         
-        # Get all saved daily reports
-        reports = conn.execute('''
-            SELECT * FROM daily_reports 
-            ORDER BY date DESC
-        ''').fetchall()
+        # Recompute reports whose stock changed since they were saved
+        if conn.execute('SELECT 1 FROM daily_reports WHERE stale = 1 LIMIT 1').fetchone():
+            run_write(refresh_stale_reports)
         
-        return render_template('lottery_reports.html', reports=reports)
+        # Get the first page of saved daily reports matching the filters
+        try:
+            filters = parse_report_filters(request.args)
+        except ValueError as e:
+            flash(str(e), 'error')
+            filters = parse_report_filters({})
+        reports, next_before = query_daily_reports(conn, filters)
+        
+        return render_template('lottery_reports.html', reports=reports,
+                               filters=filters, next_before=next_before)
         
     except Exception as e:
         logger.error(f"Error in lottery_reports: {str(e)}")
         flash('An error occurred while processing the request.', 'error')
-        return render_template('lottery_reports.html', reports=[])
-    finally:
-        conn.close()
+        return render_template('lottery_reports.html', reports=[],
+                               filters=parse_report_filters({}), next_before=None)
+
+@bp.route('/lottery-reports.json')
+@require_admin()
+def lottery_reports_json():
+    """Next page of the lottery reports listing for infinite scroll."""
+    try:
+        filters = parse_report_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    reports, next_before = query_daily_reports(get_db_connection(), filters)
+    return jsonify({
+        'reports': [dict(report) for report in reports],
+        'next_before': next_before,
+        'html': render_template('_lottery_report_rows.html', reports=reports),
+    })
+
+def rollup_row(row):
+    """A report_rollups (or range total) row as a dict with amounts rounded to cents."""
+    data = dict(row)
+    for field in ROLLUP_FIELDS:
+        data[field] = round(data[field] or 0, 2)
+    return data
+
+def query_report_rollups(conn, period, date_from, date_to):
+    """Rollups of one period overlapping [date_from, date_to], oldest first."""
+    if period not in ROLLUP_PERIODS:
+        raise ValueError(f"Unknown period {period}; expected one of: {', '.join(ROLLUP_PERIODS)}")
+    rows = conn.execute(f'''
+        SELECT period_start, report_count, {', '.join(ROLLUP_FIELDS)}
+        FROM report_rollups
+        WHERE period = ? AND period_start BETWEEN {ROLLUP_PERIODS[period].format(date='?')} AND ?
+        ORDER BY period_start
+    ''', (period, date_from, date_to))
+    return [rollup_row(row) for row in rows]
+
+def report_range_totals(conn, date_from, date_to):
+    """Return summed report fields for [date_from, date_to]."""
+    start = datetime.strptime(date_from, '%Y-%m-%d').date()
+    after_end = datetime.strptime(date_to, '%Y-%m-%d').date() + timedelta(days=1)
+    full_from = start if start.day == 1 else (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    full_to = after_end.replace(day=1)
+    if full_from >= full_to:
+        full_from = full_to = after_end
+    row = conn.execute(f'''
+        SELECT COALESCE(SUM(report_count), 0) as report_count,
+               {', '.join(f'SUM({field}) as {field}' for field in ROLLUP_FIELDS)}
+        FROM (
+            SELECT report_count, {', '.join(ROLLUP_FIELDS)}
+            FROM report_rollups
+            WHERE period = 'month' AND period_start >= :full_from AND period_start < :full_to
+            UNION ALL
+            SELECT 1, {', '.join(f'COALESCE({field}, 0)' for field in ROLLUP_FIELDS)}
+            FROM daily_reports
+            WHERE (date >= :date_from AND date < :full_from)
+               OR (date >= :full_to AND date <= :date_to)
+        )
+    ''', {'date_from': date_from, 'date_to': date_to,
+          'full_from': full_from.isoformat(), 'full_to': full_to.isoformat()}).fetchone()
+    return rollup_row(row)
+
+def same_day_last_year(day):
+    """``day`` one year earlier (Feb 29 becomes Feb 28)."""
+    try:
+        return day.replace(year=day.year - 1)
+    except ValueError:
+        return day.replace(year=day.year - 1, day=28)
+
+def report_summary_comparisons(conn, today):
+    """Month-to-date and year-to-date totals next to the same span last year."""
+    comparisons = []
+    for label, start in (('Month to date', today.replace(day=1)),
+                         ('Year to date', today.replace(month=1, day=1))):
+        current = report_range_totals(conn, start.isoformat(), today.isoformat())
+        previous = report_range_totals(conn, same_day_last_year(start).isoformat(),
+                                       same_day_last_year(today).isoformat())
+        changes = {}
+        for field in ROLLUP_FIELDS:
+            changes[field] = (round((current[field] - previous[field]) / abs(previous[field]) * 100, 1)
+                              if previous[field] else None)
+        comparisons.append({'label': label, 'from': start.isoformat(), 'to': today.isoformat(),
+                            'current': current, 'previous': previous, 'change_pct': changes})
+    return comparisons
+
+def parse_rollup_args(args):
+    """Period and range for the rollup views, defaulting to months since last January."""
+    today = datetime.now().date()
+    date_from, date_to = parse_analytics_range(
+        args.get('from') or today.replace(year=today.year - 1, month=1, day=1).isoformat(),
+        args.get('to'))
+    period = args.get('period', 'month')
+    if period not in ROLLUP_PERIODS:
+        raise ValueError(f"Unknown period {period}; expected one of: {', '.join(ROLLUP_PERIODS)}")
+    return period, date_from, date_to
+
+@bp.route('/lottery-reports/summary')
+@require_admin()
+def report_summary():
+    """Dashboard of month-to-date, year-to-date and per-period report totals."""
+    conn = get_db_connection()
+    try:
+        period, date_from, date_to = parse_rollup_args(request.args)
+    except ValueError as e:
+        flash(str(e), 'error')
+        period, date_from, date_to = parse_rollup_args({})
+    return render_template('report_summary.html', period=period, date_from=date_from, date_to=date_to,
+                           periods=ROLLUP_PERIODS, fields=ROLLUP_FIELDS,
+                           comparisons=report_summary_comparisons(conn, datetime.now().date()),
+                           rollups=query_report_rollups(conn, period, date_from, date_to))
 
-@app.route('/view-lottery-report/<int:report_id>')
+@bp.route('/lottery-reports/rollups.json')
+@require_admin()
+def report_rollups_json():
+    """Weekly, monthly or yearly report totals for a date range as JSON."""
+    try:
+        period, date_from, date_to = parse_rollup_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    conn = get_db_connection()
+    return jsonify({
+        'period': period,
+        'from': date_from,
+        'to': date_to,
+        'totals': report_range_totals(conn, date_from, date_to),
+        'rollups': query_report_rollups(conn, period, date_from, date_to),
+    })
+
+@bp.route('/view-lottery-report/<int:report_id>')
 @require_admin()
 def view_lottery_report(report_id):
     conn = get_db_connection()
@@ -745,7 +2473,14 @@ def view_lottery_report(report_id):
         
         if not report:
             flash('Report not found.', 'error')
-            return redirect(url_for('lottery_reports'))
+            return redirect(url_for('lottery.lottery_reports'))
+        
+        # Recompute lazily if the stock changed since the report was saved
+        if report['stale'] and run_write(lambda conn: refresh_stale_reports(conn, [report['date']])):
+            report = conn.execute('''
+                SELECT * FROM daily_reports 
+                WHERE id = ?
+            ''', (report_id,)).fetchone()
         
         # Calculate yesterday's date for display
         from datetime import datetime, timedelta
@@ -755,64 +2490,1347 @@ def view_lottery_report(report_id):
         # Get daily totals data for the report date (same as stock reports page)
         selected_date = report['date']
         
-        # Calculate totals by ticket value from holders
-        totals = conn.execute('''
-            SELECT 
-                ticket_value,
-                SUM(stock_number) as total_tickets,
-                SUM(stock_number * ticket_value) as total_value
-            FROM lottery_stock 
-            WHERE date = ? 
-            GROUP BY ticket_value
-            ORDER BY ticket_value DESC
-        ''', (selected_date,)).fetchall()
-        
-        # Calculate totals by ticket price from extra tickets
-        extra_totals = conn.execute('''
-            SELECT 
-                ticket_price as ticket_value,
-                SUM(stock_number) as total_tickets,
-                SUM(stock_number * ticket_price) as total_value
-            FROM extra_tickets 
-            WHERE date = ? 
-            GROUP BY ticket_price
-            ORDER BY ticket_price DESC
-        ''', (selected_date,)).fetchall()
-        
-        # Prepare data for template (same format as create_report)
-        report_data = {
-            'date': report['date'],
-            'yesterday': yesterday,
-            'yesterday_closing': report['yesterday_closing'],
-            'today_closing': report['today_closing'],
-            'books_1': report['books_1'],
-            'books_2': report['books_2'],
-            'books_5': report['books_5'],
-            'books_10': report['books_10'],
-            'books_20': report['books_20'],
-            'books_30': report['books_30'],
-            'books_50': report['books_50'],
-            'machine_sold': report['machine_sold'],
-            'tickets_cashed': report['tickets_cashed'],
-            'online_cashed': report['online_cashed'],
-            'total_new_books': report['total_new_books'],
-            'net_total_scratch': report['net_total_scratch'],
-            'total_lottery_sale': report['total_lottery_sale'],
-            'lottery_deposit_amount': report['lottery_deposit_amount']
-        }
+        def render():
+            summary = DailySummary.load(selected_date, with_entries=False)
+            
+            # Prepare data for template (same format as create_report)
+            report_data = {
+                'date': report['date'],
+                'yesterday': yesterday,
+                'yesterday_closing': report['yesterday_closing'],
+                'today_closing': report['today_closing'],
+                'books_1': report['books_1'],
+                'books_2': report['books_2'],
+                'books_5': report['books_5'],
+                'books_10': report['books_10'],
+                'books_20': report['books_20'],
+                'books_30': report['books_30'],
+                'books_50': report['books_50'],
+                'machine_sold': report['machine_sold'],
+                'tickets_cashed': report['tickets_cashed'],
+                'online_cashed': report['online_cashed'],
+                'total_new_books': report['total_new_books'],
+                'net_total_scratch': report['net_total_scratch'],
+                'total_lottery_sale': report['total_lottery_sale'],
+                'lottery_deposit_amount': report['lottery_deposit_amount']
+            }
+            
+            return render_template('view_lottery_report.html', 
+                                 report_data=report_data, 
+                                 totals=summary.totals,
+                                 extra_totals=summary.extra_totals,
+                                 show_report=True)
         
-        return render_template('view_lottery_report.html', 
-                             report_data=report_data, 
-                             totals=totals,
-                             extra_totals=extra_totals,
-                             show_report=True)
+        versions = get_data_versions(conn, [selected_date])
+        return render_cached(('view_lottery_report', report_id, versions), render)
         
     except Exception as e:
         logger.error(f"Error viewing lottery report: {str(e)}")
         flash('An error occurred while loading the report.', 'error')
-        return redirect(url_for('lottery_reports'))
+        return redirect(url_for('lottery.lottery_reports'))
+
+# ---------------------------------------------------------------------------
+# Bulk import of historical stock counts
+# ---------------------------------------------------------------------------
+
+IMPORT_HOLDER_SQL = '''
+    INSERT INTO lottery_stock (date, holder_number, stock_number, ticket_value)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(date, holder_number) DO UPDATE SET
+        stock_number = excluded.stock_number,
+        ticket_value = excluded.ticket_value
+    WHERE stock_number != excluded.stock_number
+       OR ticket_value != excluded.ticket_value
+'''
+
+IMPORT_EXTRA_SQL = '''
+    INSERT INTO extra_tickets (date, ticket_price, stock_number)
+    VALUES (?, ?, ?)
+'''
+
+def iter_import_records(path, file_format=None):
+    """Stream dict records from a CSV or NDJSON file one line at a time."""
+    if file_format is None:
+        file_format = 'csv' if path.lower().endswith('.csv') else 'ndjson'
+    with open(path, newline='', encoding='utf-8') as f:
+        if file_format == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+def parse_import_record(record):
+    """Validate one import record and return ('holder', row) or ('extra', row)."""
+    date = validate_stock_date((record.get('date') or '').strip())
+    holder_number = record.get('holder_number')
+    ticket_price = record.get('ticket_price')
+    if holder_number not in (None, ''):
+        return 'holder', (date, *validate_holder_stock(holder_number, record.get('stock_number'),
+                                                   get_holder_layout(date)))
+    if ticket_price not in (None, ''):
+        return 'extra', (date, *validate_extra_ticket(ticket_price, record.get('stock_number')))
+    raise ValueError("Row needs either holder_number or ticket_price")
+
+def import_stock_file(conn, path, file_format=None, batch_size=10000, resume=False, echo=click.echo,
+                      replaced_dates=None):
+    """Import one file in batches of ``batch_size`` rows and return the rows imported."""
+    key = os.path.abspath(path)
+    skip = 0
+    if resume:
+        state = conn.execute('SELECT rows_done FROM import_progress WHERE path = ?', (key,)).fetchone()
+        if state:
+            skip = state['rows_done']
+            echo(f'{path}: resuming after row {skip}')
+
+    holders, extras = [], []
+    replaced_dates = set() if replaced_dates is None else replaced_dates
+    rows_done = skip
+    started = time.perf_counter()
+
+    def flush():
+        if holders:
+            for date in {row[0] for row in holders}:
+                unarchive_stock_day(conn, date)
+            conn.executemany(IMPORT_HOLDER_SQL, holders)
+        if extras:
+            new_dates = {row[0] for row in extras} - replaced_dates
+            conn.executemany('DELETE FROM extra_tickets WHERE date = ?', [(date,) for date in new_dates])
+            conn.executemany(IMPORT_EXTRA_SQL, extras)
+        conn.execute('''
+            INSERT INTO import_progress (path, rows_done) VALUES (?, ?)
+            ON CONFLICT(path) DO UPDATE SET rows_done = excluded.rows_done
+        ''', (key, rows_done))
+        conn.commit()
+        replaced_dates.update(row[0] for row in extras)
+        holders.clear()
+        extras.clear()
+        elapsed = time.perf_counter() - started
+        echo(f'{path}: {rows_done} rows committed ({(rows_done - skip) / max(elapsed, 1e-9):,.0f} rows/s)')
+
+    for row_number, record in enumerate(iter_import_records(path, file_format), start=1):
+        if row_number <= skip:
+            if record.get('holder_number') in (None, '') and record.get('ticket_price') not in (None, ''):
+                replaced_dates.add((record.get('date') or '').strip())
+            continue
+        try:
+            kind, row = parse_import_record(record)
+        except (ValueError, TypeError, AttributeError) as e:
+            conn.rollback()
+            raise click.ClickException(f'{path} row {row_number}: {e}')
+        (holders if kind == 'holder' else extras).append(row)
+        rows_done = row_number
+        if len(holders) + len(extras) >= batch_size:
+            flush()
+
+    if holders or extras:
+        flush()
+    return rows_done - skip
+
+def import_stock_files(conn, paths, file_format=None, batch_size=10000, resume=False, echo=click.echo):
+    """Import files as one request, replacing each date's extra tickets once, and return the rows imported."""
+    replaced_dates = set()
+    total = sum(import_stock_file(conn, path, file_format, batch_size, resume, echo, replaced_dates)
+                for path in paths)
+    # Kept until every file is done so a resumed request skips the finished files
+    conn.executemany('DELETE FROM import_progress WHERE path = ?', [(os.path.abspath(path),) for path in paths])
+    conn.commit()
+    return total
+
+@bp.cli.command('import-stock')
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'ndjson']),
+              help='Input format (default: guessed from the file extension).')
+@click.option('--batch-size', default=10000, show_default=True,
+              help='Rows written per transaction.')
+@click.option('--resume', is_flag=True, help='Skip rows committed by a previous failed run.')
+def import_stock_command(paths, file_format, batch_size, resume):
+    """Import historical stock counts and extra tickets from CSV or NDJSON files."""
+    conn = get_db_connection()
+    started = time.perf_counter()
+    total = import_stock_files(conn, paths, file_format, batch_size, resume)
+    elapsed = time.perf_counter() - started
+    click.echo(f'Imported {total} rows in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} rows/s).')
+
+# ---------------------------------------------------------------------------
+# Streaming CSV/NDJSON export
+# ---------------------------------------------------------------------------
+
+# Exportable tables and the order rows are streamed in
+EXPORT_TABLES = {
+    'lottery_stock': 'date, holder_number',
+    'extra_tickets': 'date, id',
+    'daily_reports': 'date',
+}
+
+# Rows buffered before a chunk is handed to the response
+EXPORT_CHUNK_ROWS = 500
+
+def iter_export_rows(conn, table, date_from=None, date_to=None):
+    """Return (columns, rows) for a table, lazily stepping through matching rows."""
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Unknown export table {table}")
+    clauses, params = [], []
+    if date_from:
+        clauses.append('date >= ?')
+        params.append(validate_stock_date(date_from))
+    if date_to:
+        clauses.append('date <= ?')
+        params.append(validate_stock_date(date_to))
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    cursor = conn.execute(
+        f'SELECT * FROM {table} {where} ORDER BY {EXPORT_TABLES[table]}', params)
+    columns = [col[0] for col in cursor.description]
+    if table != 'lottery_stock':
+        return columns, cursor
+
+    def archived_rows():
+        for snapshot in conn.execute(
+                f'SELECT date, layout_version, counts FROM stock_snapshots {where} ORDER BY date', params):
+            for holder_number, stock_number, ticket_value in iter_snapshot_holders(snapshot):
+                values = {'date': snapshot['date'], 'holder_number': holder_number,
+                          'stock_number': stock_number, 'ticket_value': ticket_value}
+                yield tuple(values.get(column) for column in columns)
+
+    date_index, holder_index = columns.index('date'), columns.index('holder_number')
+    return columns, heapq.merge(cursor, archived_rows(),
+                                key=lambda row: (row[date_index], row[holder_index]))
+
+def iter_export_chunks(columns, rows, file_format='csv', compress=False):
+    """Encode rows as CSV or NDJSON, yielding bytes in bounded chunks."""
+    compressor = zlib.compressobj(wbits=31) if compress else None  # gzip container
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if file_format == 'csv' else None
+    if writer:
+        writer.writerow(columns)
+
+    def drain():
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(data) if compressor else data
+
+    pending = 0
+    for row in rows:
+        if writer:
+            writer.writerow(tuple(row))
+        else:
+            buffer.write(json.dumps(dict(zip(columns, row))))
+            buffer.write('\n')
+        pending += 1
+        if pending >= EXPORT_CHUNK_ROWS:
+            chunk = drain()
+            if chunk:
+                yield chunk
+            pending = 0
+    chunk = drain()
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
+
+@bp.route('/export/<table>')
+@require_admin()
+def export_table(table):
+    """Stream a table as CSV or NDJSON, optionally gzip-compressed."""
+    if table not in EXPORT_TABLES:
+        flash('Unknown export table.', 'error')
+        return redirect(url_for('lottery.lottery_reports'))
+    file_format = request.args.get('format', 'csv')
+    if file_format not in ('csv', 'ndjson'):
+        file_format = 'csv'
+    compress = request.args.get('gzip') in ('1', 'true', 'yes')
+
+    conn = get_db_connection()
+    try:
+        columns, rows = iter_export_rows(conn, table,
+                                         request.args.get('from'), request.args.get('to'))
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('lottery.lottery_reports'))
+
+    filename = f'{table}.{file_format}' + ('.gz' if compress else '')
+    if compress:
+        mimetype = 'application/gzip'
+    elif file_format == 'csv':
+        mimetype = 'text/csv'
+    else:
+        mimetype = 'application/x-ndjson'
+    return Response(
+        stream_with_context(iter_export_chunks(columns, rows, file_format, compress)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+@bp.cli.command('export')
+@click.argument('table', type=click.Choice(list(EXPORT_TABLES)))
+@click.option('--from', 'date_from', help='First date to include (YYYY-MM-DD).')
+@click.option('--to', 'date_to', help='Last date to include (YYYY-MM-DD).')
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'ndjson']), default='csv', show_default=True)
+@click.option('--gzip', 'compress', is_flag=True, help='Gzip-compress the output.')
+@click.option('--output', '-o', type=click.File('wb'), default='-', help='Output file (default: stdout).')
+def export_command(table, date_from, date_to, file_format, compress, output):
+    """Stream a table as CSV or NDJSON without loading it into memory."""
+    conn = get_db_connection()
+    try:
+        columns, rows = iter_export_rows(conn, table, date_from, date_to)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    for chunk in iter_export_chunks(columns, rows, file_format, compress):
+        output.write(chunk)
+
+# ---------------------------------------------------------------------------
+# Batch JSON API for stock counts
+# ---------------------------------------------------------------------------
+
+# Largest number of days accepted in one batch request
+STOCK_BATCH_MAX_DAYS = 62
+
+def parse_stock_day_payload(day):
+    """Validate one day of a batch request and return (date, entries, extra_ticket_entries)."""
+    if not isinstance(day, dict):
+        raise ValueError("Each day must be an object")
+    date = validate_stock_date(day.get('date'))
+    holders = day.get('holders') or {}
+    if not isinstance(holders, dict):
+        raise ValueError("holders must map holder numbers to stock numbers")
+
+    layout = get_holder_layout(date)
+    entries = []
+    seen = set()
+    for holder_number, stock_number in holders.items():
+        entry = (date, *validate_holder_stock(holder_number, stock_number, layout))
+        if entry[1] in seen:
+            raise ValueError(f"Holder {entry[1]} is listed more than once")
+        seen.add(entry[1])
+        entries.append(entry)
+    missing = sorted(set(layout.sequence) - seen)
+    if missing:
+        raise ValueError(f"Please fill in all holders. Missing: {missing}")
+
+    extra_tickets = day.get('extra_tickets') or []
+    if not isinstance(extra_tickets, list):
+        raise ValueError("extra_tickets must be a list of {ticket_price, stock_number} objects")
+    extra_ticket_entries = []
+    for index, extra in enumerate(extra_tickets, start=1):
+        if not isinstance(extra, dict) or 'ticket_price' not in extra or 'stock_number' not in extra:
+            raise ValueError(f"Extra ticket entry {index} must be an object with ticket_price and stock_number")
+        try:
+            extra_ticket_entries.append(
+                (date, *validate_extra_ticket(extra['ticket_price'], extra['stock_number'])))
+        except ValueError as e:
+            raise ValueError(f"Invalid extra ticket entry {index}: {str(e)}")
+    return date, entries, extra_ticket_entries
+
+@bp.route('/api/stock-batch', methods=['POST'])
+def stock_batch_api():
+    """Record several days of stock counts in one transaction."""
+    payload = request.get_json(silent=True)
+    days = payload.get('days') if isinstance(payload, dict) else payload
+    if not isinstance(days, list) or not days:
+        return jsonify({'error': 'Expected a non-empty JSON array of days'}), 400
+    if len(days) > STOCK_BATCH_MAX_DAYS:
+        return jsonify({'error': f'At most {STOCK_BATCH_MAX_DAYS} days per request'}), 400
+
+    parsed, errors = [], []
+    seen_dates = set()
+    for index, day in enumerate(days):
+        try:
+            date, entries, extra_ticket_entries = parse_stock_day_payload(day)
+            if date in seen_dates:
+                raise ValueError(f"Date {date} appears more than once in the batch")
+            seen_dates.add(date)
+            parsed.append((date, entries, extra_ticket_entries))
+        except ValueError as e:
+            errors.append({'index': index, 'date': day.get('date') if isinstance(day, dict) else None,
+                           'error': str(e)})
+    if errors:
+        return jsonify({'errors': errors}), 400
+
+    try:
+        results = run_write(lambda conn: [save_stock_day(conn, date, entries, extra_ticket_entries)
+                                          for date, entries, extra_ticket_entries in parsed])
+    except sqlite3.Error as e:
+        logger.error(f"Database error in stock batch: {str(e)}")
+        return jsonify({'error': 'Database error occurred. Please try again.'}), 500
+
+    return jsonify({'results': results})
+
+# ---------------------------------------------------------------------------
+# Cross-store rollup
+# ---------------------------------------------------------------------------
+
+# Upper bound on threads used to read store shards in parallel
+ROLLUP_MAX_WORKERS = 8
+
+def _store_day_rollup(store, date):
+    """Read one store's closing total and saved report figures for a date."""
+    conn = _acquire_db_connection(store)
+    try:
+        closing = conn.execute('''
+            SELECT SUM(total_value) as total FROM daily_totals WHERE date = ?
+        ''', (date,)).fetchone()['total'] or 0
+        report = conn.execute('''
+            SELECT total_lottery_sale, lottery_deposit_amount
+            FROM daily_reports
+            WHERE date = ?
+        ''', (date,)).fetchone()
     finally:
-        conn.close()
+        _release_db_connection(conn)
+    return {
+        'store': store,
+        'closing': closing,
+        'total_lottery_sale': report['total_lottery_sale'] if report else None,
+        'lottery_deposit_amount': report['lottery_deposit_amount'] if report else None,
+    }
+
+def store_rollup(date):
+    """Collect a date's figures from every store shard in parallel."""
+    stores = get_stores()
+    app = current_app._get_current_object()
+
+    def read_store(store):
+        with app.app_context():
+            return _store_day_rollup(store, date)
+
+    with ThreadPoolExecutor(max_workers=min(ROLLUP_MAX_WORKERS, len(stores))) as executor:
+        rows = list(executor.map(read_store, stores))
+    return {
+        'date': date,
+        'stores': rows,
+        'closing': sum(row['closing'] for row in rows),
+        'total_lottery_sale': sum(row['total_lottery_sale'] or 0 for row in rows),
+        'lottery_deposit_amount': sum(row['lottery_deposit_amount'] or 0 for row in rows),
+    }
+
+@bp.route('/stores/rollup')
+@require_admin()
+def store_rollup_view():
+    """JSON rollup of one date across all stores."""
+    try:
+        date = validate_stock_date(request.args.get('date') or datetime.now().strftime('%Y-%m-%d'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(store_rollup(date))
+
+@bp.cli.command('store-rollup')
+@click.option('--date', default=lambda: datetime.now().strftime('%Y-%m-%d'), help='Date to roll up (YYYY-MM-DD).')
+def store_rollup_command(date):
+    """Print a date's closing, sales and deposits for every store."""
+    try:
+        validate_stock_date(date)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    rollup = store_rollup(date)
+    for row in rollup['stores']:
+        click.echo(f"{row['store']:<20} closing ${row['closing']:>10,.2f}  "
+                   f"sale ${row['total_lottery_sale'] or 0:>10,.2f}  "
+                   f"deposit ${row['lottery_deposit_amount'] or 0:>10,.2f}")
+    click.echo(f"{'ALL STORES':<20} closing ${rollup['closing']:>10,.2f}  "
+               f"sale ${rollup['total_lottery_sale']:>10,.2f}  "
+               f"deposit ${rollup['lottery_deposit_amount']:>10,.2f}")
+
+# ---------------------------------------------------------------------------
+# Date-range sales analytics
+# ---------------------------------------------------------------------------
+
+# Ticket values that have a new-books column on daily_reports
+BOOK_VALUES = (1, 2, 5, 10, 20, 30, 50)
+
+SALES_ANALYTICS_SQL = '''
+    WITH days AS (
+        SELECT date FROM stock_dates
+        WHERE date BETWEEN COALESCE((SELECT MAX(date) FROM stock_dates WHERE date < :date_from),
+                                    :date_from)
+                       AND :date_to
+    ),
+    ticket_values AS (
+        SELECT DISTINCT ticket_value FROM daily_totals
+        WHERE date IN (SELECT date FROM days)
+    ),
+    grid AS (
+        SELECT d.date, v.ticket_value, COALESCE(SUM(t.total_value), 0) as value_total
+        FROM days d
+        CROSS JOIN ticket_values v
+        LEFT JOIN daily_totals t ON t.date = d.date AND t.ticket_value = v.ticket_value
+        GROUP BY d.date, v.ticket_value
+    )
+    SELECT
+        grid.date,
+        grid.ticket_value,
+        grid.value_total,
+        LAG(grid.date) OVER w as previous_date,
+        LAG(grid.value_total) OVER w as previous_value_total,
+        CASE grid.ticket_value
+            {book_cases}
+            ELSE 0
+        END as new_books
+    FROM grid
+    LEFT JOIN daily_reports r ON r.date = grid.date
+    WINDOW w AS (PARTITION BY grid.ticket_value ORDER BY grid.date)
+    ORDER BY grid.date, grid.ticket_value DESC
+'''.format(book_cases='\n            '.join(
+    f'WHEN {value} THEN COALESCE(r.books_{value}, 0)' for value in BOOK_VALUES))
+
+def sales_analytics(date_from, date_to):
+    """Daily closing, day-over-day change and per-value scratch sales for a range."""
+    conn = get_db_connection()
+    days = {}
+    for row in conn.execute(SALES_ANALYTICS_SQL, {'date_from': date_from, 'date_to': date_to}):
+        if row['date'] < date_from:
+            continue
+        day = days.setdefault(row['date'], {
+            'date': row['date'],
+            'previous_date': row['previous_date'],
+            'closing': 0,
+            'previous_closing': None if row['previous_date'] is None else 0,
+            'new_books': 0,
+            'by_value': {},
+        })
+        value = {'closing': row['value_total'], 'new_books': row['new_books'], 'sales': None}
+        day['closing'] += row['value_total']
+        day['new_books'] += row['new_books']
+        if row['previous_date'] is not None:
+            day['previous_closing'] += row['previous_value_total']
+            value['sales'] = row['previous_value_total'] + row['new_books'] - row['value_total']
+        day['by_value'][row['ticket_value']] = value
+    for day in days.values():
+        if day['previous_closing'] is None:
+            day['change'] = day['net_scratch'] = None
+        else:
+            day['change'] = day['closing'] - day['previous_closing']
+            day['net_scratch'] = day['previous_closing'] + day['new_books'] - day['closing']
+    return list(days.values())
+
+def iter_sales_csv(days):
+    """Render sales analytics as CSV lines, one row per day."""
+    ticket_values = sorted({value for day in days for value in day['by_value']}, reverse=True)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['date', 'previous_date', 'closing', 'previous_closing', 'change',
+                     'new_books', 'net_scratch'] + [f'sales_{value}' for value in ticket_values])
+    for day in days:
+        writer.writerow([day['date'], day['previous_date'], day['closing'], day['previous_closing'],
+                         day['change'], day['new_books'], day['net_scratch']] +
+                        [day['by_value'].get(value, {}).get('sales') for value in ticket_values])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+def parse_analytics_range(date_from, date_to):
+    """Validate an analytics range, defaulting to the last 30 days."""
+    today = datetime.now()
+    date_to = validate_stock_date(date_to or today.strftime('%Y-%m-%d'))
+    date_from = validate_stock_date(date_from or (today - timedelta(days=30)).strftime('%Y-%m-%d'))
+    if date_from > date_to:
+        raise ValueError("The start date must not be after the end date")
+    return date_from, date_to
+
+@bp.route('/analytics/sales')
+@require_admin()
+def sales_analytics_view():
+    """Sales analytics for a date range as JSON or CSV."""
+    try:
+        date_from, date_to = parse_analytics_range(request.args.get('from'), request.args.get('to'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    days = sales_analytics(date_from, date_to)
+    if request.args.get('format') == 'csv':
+        return Response(iter_sales_csv(days), mimetype='text/csv',
+                        headers={'Content-Disposition':
+                                 f'attachment; filename=sales_{date_from}_{date_to}.csv'})
+    return jsonify({'from': date_from, 'to': date_to, 'days': days})
+
+@bp.cli.command('sales-analytics')
+@click.option('--from', 'date_from', help='First date (YYYY-MM-DD, default: 30 days ago).')
+@click.option('--to', 'date_to', help='Last date (YYYY-MM-DD, default: today).')
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'json']), default='csv', show_default=True)
+def sales_analytics_command(date_from, date_to, file_format):
+    """Print daily closing, change and per-value sales for a date range."""
+    try:
+        date_from, date_to = parse_analytics_range(date_from, date_to)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    days = sales_analytics(date_from, date_to)
+    if file_format == 'json':
+        click.echo(json.dumps({'from': date_from, 'to': date_to, 'days': days}, indent=2))
+    else:
+        for line in iter_sales_csv(days):
+            click.echo(line, nl=False)
+
+# ---------------------------------------------------------------------------
+# Chart time series
+# ---------------------------------------------------------------------------
+
+# Chart series read from daily_reports; closing, net_scratch and
+# sales_<ticket value> come from the stock totals
+REPORT_SERIES = ('total_lottery_sale', 'lottery_deposit_amount')
+
+# Default and largest number of points a chart request returns
+SERIES_DEFAULT_POINTS = 500
+SERIES_MAX_POINTS = 5000
+
+def validate_series(series):
+    """Return ``series`` if it names a chart series, else raise ValueError."""
+    if series in ('closing', 'net_scratch') + REPORT_SERIES or re.fullmatch(r'sales_\d+', series):
+        return series
+    raise ValueError(f"Unknown series {series}; expected closing, net_scratch, "
+                     f"sales_<ticket value>, {' or '.join(REPORT_SERIES)}")
+
+def load_series(conn, series, date_from, date_to):
+    """Raw values of a chart series as parallel arrays of day ordinals and values."""
+    xs, ys = array('l'), array('d')
+    if series == 'closing':
+        rows = conn.execute('''
+            SELECT date, SUM(total_value) FROM daily_totals
+            WHERE date BETWEEN ? AND ?
+            GROUP BY date ORDER BY date
+        ''', (date_from, date_to))
+    elif series in REPORT_SERIES:
+        rows = conn.execute(f'''
+            SELECT date, {series} FROM daily_reports
+            WHERE date BETWEEN ? AND ? AND {series} IS NOT NULL
+            ORDER BY date
+        ''', (date_from, date_to))
+    elif series == 'net_scratch':
+        rows = [(day['date'], day['net_scratch']) for day in sales_analytics(date_from, date_to)]
+    else:
+        value = int(validate_series(series)[len('sales_'):])
+        rows = [(day['date'], day['by_value'].get(value, {}).get('sales'))
+                for day in sales_analytics(date_from, date_to)]
+    for date, value in rows:
+        if value is not None:
+            xs.append(datetime.strptime(date, '%Y-%m-%d').toordinal())
+            ys.append(value)
+    return xs, ys
+
+def downsample_minmax(xs, ys, buckets):
+    """Return (first x, min, max, mean) for each of ``buckets`` equal runs of points."""
+    n = len(xs)
+    buckets = min(buckets, n)
+    result = []
+    for bucket in range(buckets):
+        start, end = bucket * n // buckets, (bucket + 1) * n // buckets
+        chunk = ys[start:end]
+        result.append((xs[start], min(chunk), max(chunk), sum(chunk) / len(chunk)))
+    return result
+
+def downsample_lttb(xs, ys, threshold):
+    """Keep ``threshold`` points with Largest-Triangle-Three-Buckets."""
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(zip(xs, ys))
+    result = [(xs[0], ys[0])]
+    every = (n - 2) / (threshold - 2)
+    selected = 0
+    for bucket in range(threshold - 2):
+        # Average of the next bucket is the triangle's third corner
+        next_start = int((bucket + 1) * every) + 1
+        next_end = min(int((bucket + 2) * every) + 1, n)
+        avg_x = sum(xs[next_start:next_end]) / (next_end - next_start)
+        avg_y = sum(ys[next_start:next_end]) / (next_end - next_start)
+        ax, ay = xs[selected], ys[selected]
+        best_area = -1
+        for i in range(int(bucket * every) + 1, next_start):
+            area = abs((ax - avg_x) * (ys[i] - ay) - (ax - xs[i]) * (avg_y - ay))
+            if area > best_area:
+                best_area, best = area, i
+        result.append((xs[best], ys[best]))
+        selected = best
+    result.append((xs[-1], ys[-1]))
+    return result
+
+def build_series(conn, series, date_from, date_to, points, method):
+    """A chart series for a date range, downsampled to at most ``points`` points."""
+    xs, ys = load_series(conn, series, date_from, date_to)
+    day = lambda x: datetime.fromordinal(x).strftime('%Y-%m-%d')
+    if method == 'minmax':
+        columns = ['date', 'min', 'max', 'avg']
+        data = [[day(x), low, high, round(mean, 2)]
+                for x, low, high, mean in downsample_minmax(xs, ys, points)]
+    else:
+        columns = ['date', 'value']
+        data = [[day(x), y] for x, y in downsample_lttb(xs, ys, points)]
+    return {'series': series, 'from': date_from, 'to': date_to, 'method': method,
+            'raw_points': len(xs), 'columns': columns, 'data': data}
+
+@bp.route('/analytics/series')
+@require_admin()
+def series_view():
+    """Downsampled chart series as JSON."""
+    method = request.args.get('method', 'lttb')
+    try:
+        series = validate_series(request.args.get('series', 'closing'))
+        date_from, date_to = parse_analytics_range(request.args.get('from'), request.args.get('to'))
+        points = int(request.args.get('points', SERIES_DEFAULT_POINTS))
+        if not 3 <= points <= SERIES_MAX_POINTS:
+            raise ValueError(f'points must be between 3 and {SERIES_MAX_POINTS}')
+        if method not in ('lttb', 'minmax'):
+            raise ValueError('method must be lttb or minmax')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    conn = get_db_connection()
+    # Versions only grow, so their sum moves whenever a date in the range is
+    # written; the date list key covers a day added or removed in a gap.
+    # Sales and net scratch also read the last recorded day before the range.
+    versions = tuple(conn.execute('''
+        SELECT COUNT(*), COALESCE(SUM(version), 0) FROM data_versions
+        WHERE date BETWEEN COALESCE((SELECT MAX(date) FROM stock_dates WHERE date < :date_from), :date_from)
+                       AND :date_to
+           OR date = :all_dates
+    ''', {'date_from': date_from, 'date_to': date_to, 'all_dates': ALL_DATES_VERSION_KEY}).fetchone())
+    return render_cached(
+        ('series', series, date_from, date_to, points, method, versions),
+        lambda: json.dumps(build_series(conn, series, date_from, date_to, points, method)),
+        mimetype='application/json')
+
+# ---------------------------------------------------------------------------
+# Batch report generation
+# ---------------------------------------------------------------------------
+
+# Report inputs that can be supplied per date
+REPORT_INPUT_FIELDS = tuple(f'books_{value}' for value in BOOK_VALUES) + (
+    'machine_sold', 'tickets_cashed', 'online_cashed')
+
+def parse_report_inputs_csv(lines):
+    """Read per-date report inputs from CSV lines into {date: {field: amount}}."""
+    inputs = {}
+    for row_number, row in enumerate(csv.DictReader(lines), start=1):
+        try:
+            date = validate_stock_date((row.get('date') or '').strip())
+            inputs[date] = {field: float(row.get(field) or 0) for field in REPORT_INPUT_FIELDS}
+        except ValueError as e:
+            raise ValueError(f"Inputs row {row_number}: {e}")
+    return inputs
+
+def generate_reports(conn, date_from, date_to, inputs=None):
+    """Create or refresh daily reports for a range and return (generated, skipped); the caller commits."""
+    inputs = inputs or {}
+    start = datetime.strptime(date_from, '%Y-%m-%d')
+    end = datetime.strptime(date_to, '%Y-%m-%d')
+    day_before = (start - timedelta(days=1)).strftime('%Y-%m-%d')
+
+    closings = {row['date']: row['total'] for row in conn.execute('''
+        SELECT date, SUM(total_value) as total
+        FROM daily_totals
+        WHERE date BETWEEN ? AND ?
+        GROUP BY date
+    ''', (day_before, date_to))}
+    existing = {row['date']: row for row in conn.execute('''
+        SELECT * FROM daily_reports WHERE date BETWEEN ? AND ?
+    ''', (date_from, date_to))}
+
+    rows, generated, skipped = [], [], []
+    day = start
+    while day <= end:
+        date = day.strftime('%Y-%m-%d')
+        yesterday = (day - timedelta(days=1)).strftime('%Y-%m-%d')
+        day += timedelta(days=1)
+        report = existing.get(date)
+        if date not in closings:
+            skipped.append((date, 'no lottery stock data'))
+            continue
+        if yesterday not in closings:
+            skipped.append((date, f'no lottery stock data for {yesterday}'))
+            continue
+
+        today_closing = closings[date]
+        yesterday_closing = closings[yesterday]
+        if report is not None and report['today_closing_overridden']:
+            today_closing = report['today_closing']
+        if report is not None and report['yesterday_closing_overridden']:
+            yesterday_closing = report['yesterday_closing']
+
+        if date in inputs:
+            values = inputs[date]
+        elif report is not None:
+            values = {field: report[field] for field in REPORT_INPUT_FIELDS}
+        else:
+            values = dict.fromkeys(REPORT_INPUT_FIELDS, 0.0)
+        books = [values[f'books_{value}'] for value in BOOK_VALUES]
+        rows.append((date, yesterday_closing, today_closing,
+                     *(values[field] for field in REPORT_INPUT_FIELDS),
+                     *calculate_report_totals(yesterday_closing, today_closing, books,
+                                              values['machine_sold'], values['tickets_cashed'],
+                                              values['online_cashed'])))
+        generated.append(date)
+
+    conn.executemany(f'''
+        INSERT INTO daily_reports (
+            date, yesterday_closing, today_closing, {', '.join(REPORT_INPUT_FIELDS)},
+            total_new_books, net_total_scratch, total_lottery_sale, lottery_deposit_amount
+        ) VALUES ({', '.join('?' * (7 + len(REPORT_INPUT_FIELDS)))})
+        ON CONFLICT(date) DO UPDATE SET
+            yesterday_closing = excluded.yesterday_closing,
+            today_closing = excluded.today_closing,
+            {', '.join(f'{field} = excluded.{field}' for field in REPORT_INPUT_FIELDS)},
+            total_new_books = excluded.total_new_books,
+            net_total_scratch = excluded.net_total_scratch,
+            total_lottery_sale = excluded.total_lottery_sale,
+            lottery_deposit_amount = excluded.lottery_deposit_amount,
+            stale = 0
+    ''', rows)
+    return generated, skipped
+
+@bp.route('/create-report/batch', methods=['POST'])
+@require_admin()
+def generate_reports_view():
+    """Admin action: generate reports for a date range from an uploaded CSV."""
+    try:
+        date_from, date_to = parse_analytics_range(request.form.get('from'), request.form.get('to'))
+        upload = request.files.get('inputs')
+        inputs = {}
+        if upload and upload.filename:
+            inputs = parse_report_inputs_csv(io.TextIOWrapper(upload.stream, encoding='utf-8-sig'))
+        generated, skipped = run_write(lambda conn: generate_reports(conn, date_from, date_to, inputs))
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('lottery.create_report'))
+    except sqlite3.Error as e:
+        logger.error(f"Database error generating reports: {str(e)}")
+        flash('Database error occurred. Please try again.', 'error')
+        return redirect(url_for('lottery.create_report'))
+
+    flash(f'Generated {len(generated)} report(s) from {date_from} to {date_to}.', 'success')
+    if skipped:
+        flash('Skipped: ' + '; '.join(f'{date} ({reason})' for date, reason in skipped), 'info')
+    return redirect(url_for('lottery.lottery_reports', **{'from': date_from, 'to': date_to}))
+
+@bp.cli.command('generate-reports')
+@click.option('--from', 'date_from', required=True, help='First report date (YYYY-MM-DD).')
+@click.option('--to', 'date_to', required=True, help='Last report date (YYYY-MM-DD).')
+@click.option('--inputs', 'inputs_file', type=click.File('r', encoding='utf-8-sig'),
+              help='CSV of per-date books, machine and cashed amounts.')
+def generate_reports_command(date_from, date_to, inputs_file):
+    """Generate daily reports for a whole date range in one transaction."""
+    try:
+        date_from, date_to = parse_analytics_range(date_from, date_to)
+        inputs = parse_report_inputs_csv(inputs_file) if inputs_file else {}
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    conn = get_db_connection()
+    generated, skipped = generate_reports(conn, date_from, date_to, inputs)
+    conn.commit()
+    for date, reason in skipped:
+        click.echo(f'Skipped {date}: {reason}')
+    click.echo(f'Generated {len(generated)} report(s) from {date_from} to {date_to}.')
+
+# Tables read in full on purpose (a handful of rows, or the whole table is the result)
+AUDIT_ALLOWED_SCANS = {'holder_layouts', 'stock_dates', 'schema_migrations'}
+
+# Pages the audit never requests
+AUDIT_SKIPPED_ENDPOINTS = {'static', 'lottery.metrics', 'lottery.admin_logout'}
+
+def iter_audit_urls(conn):
+    """Yield a URL for every GET page, plus variants exercising the listing filters."""
+    latest = conn.execute('SELECT MAX(date) FROM stock_dates').fetchone()[0] or datetime.now().strftime('%Y-%m-%d')
+    first = (datetime.strptime(latest, '%Y-%m-%d') - timedelta(days=30)).strftime('%Y-%m-%d')
+    report_id = conn.execute('SELECT MAX(id) FROM daily_reports').fetchone()[0]
+    ranged = {'date': latest, 'from': first, 'to': latest}
+    for rule in current_app.url_map.iter_rules():
+        if 'GET' not in rule.methods or rule.endpoint in AUDIT_SKIPPED_ENDPOINTS:
+            continue
+        if rule.arguments == {'report_id'}:
+            if report_id is not None:
+                yield url_for(rule.endpoint, report_id=report_id)
+        elif rule.arguments == {'table'}:
+            for table in EXPORT_TABLES:
+                yield url_for(rule.endpoint, table=table, **ranged)
+        elif not rule.arguments:
+            yield url_for(rule.endpoint)
+            yield url_for(rule.endpoint, **ranged)
+    yield url_for('lottery.lottery_reports', min_deposit=0, max_sale=1e9, before=latest)
+
+def explain_query(conn, sql, params, tables):
+    """Return the EXPLAIN QUERY PLAN detail lines and the tables read by full scan."""
+    plan = [row['detail'] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+    scans = []
+    for detail in plan:
+        match = re.match(r'SCAN (\w+)$', detail)
+        if match and match.group(1) in tables:
+            scans.append(match.group(1))
+    return plan, scans
+
+@bp.cli.command('audit-queries')
+@click.option('--verbose', is_flag=True, help='Print the plan of every query, not just the flagged ones.')
+def audit_queries_command(verbose):
+    """Explain every query the pages run and flag full table scans."""
+    global _sql_capture
+    conn = get_db_connection()
+    store = get_current_store()
+    with current_app.test_request_context():
+        urls = list(iter_audit_urls(conn))
+
+    _sql_capture = {}
+    try:
+        client = current_app.test_client()
+        with client.session_transaction() as client_session:
+            client_session['admin_authenticated'] = True
+            client_session['store'] = store
+        for url in urls:
+            response = client.get(url)
+            response.get_data()
+            if response.status_code >= 500:
+                click.echo(f'{url} returned {response.status_code}', err=True)
+        captured = _sql_capture
+    finally:
+        _sql_capture = None
+
+    tables = {row['name'] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    flagged = 0
+    for sql, params in captured.items():
+        if not re.match(r'\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b', sql, re.IGNORECASE):
+            continue
+        plan, scans = explain_query(conn, sql, params, tables)
+        problems = [table for table in scans if table not in AUDIT_ALLOWED_SCANS]
+        if problems:
+            flagged += 1
+        if problems or verbose:
+            label = f"FULL SCAN of {', '.join(problems)}" if problems else 'ok'
+            click.echo(f"[{label}] {' '.join(sql.split())}")
+            for detail in plan:
+                click.echo(f'    {detail}')
+    click.echo(f'Audited {len(captured)} distinct statements from {len(urls)} pages; {flagged} flagged.')
+    if flagged:
+        raise SystemExit(1)
+
+# ---------------------------------------------------------------------------
+# Online backups
+# ---------------------------------------------------------------------------
+
+# Backups kept per store; older ones are deleted after each new backup
+BACKUP_KEEP = int(os.environ.get('BACKUP_KEEP', 14))
+
+# Minutes between automatic backups taken by the app itself (0 disables)
+BACKUP_INTERVAL_MINUTES = float(os.environ.get('BACKUP_INTERVAL_MINUTES', 0))
+
+# Pages copied per backup step, and the pause between steps
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_PAUSE = 0.005
+
+# Backup names are UTC times ending in Z; older names without the Z are local times
+BACKUP_TIME_FORMAT = '%Y%m%d-%H%M%S'
+
+def utc_now():
+    """Return the current UTC time as a naive datetime."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def local_to_utc(value):
+    """Convert a naive local datetime to naive UTC."""
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def utc_to_local(value):
+    """Convert a naive UTC datetime to naive local time for display."""
+    return value.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+
+def format_journal_time(value):
+    """Format a datetime like the journal's changed_at/taken_at columns."""
+    return f'{value:%Y-%m-%d %H:%M:%S}.{value.microsecond // 1000:03d}'
+
+def get_backup_dir(store=None):
+    """Return the directory holding a store's backups."""
+    store = store or get_current_store()
+    database = current_app.config['DATABASE']
+    root = current_app.instance_path if database == ':memory:' else os.path.dirname(os.path.abspath(database))
+    return os.path.join(os.environ.get('BACKUP_DIR') or os.path.join(root, 'backups'), store)
+
+def list_backups(store=None):
+    """Return (taken_at in UTC, path) for each of a store's backups, oldest first."""
+    backup_dir = get_backup_dir(store)
+    backups = []
+    for name in os.listdir(backup_dir) if os.path.isdir(backup_dir) else ():
+        match = re.fullmatch(r'(\d{8}-\d{6})(Z?)\.db', name)
+        if match:
+            taken_at = datetime.strptime(match.group(1), BACKUP_TIME_FORMAT)
+            if not match.group(2):
+                taken_at = local_to_utc(taken_at)
+            backups.append((taken_at, os.path.join(backup_dir, name)))
+    return sorted(backups)
+
+def backup_database(store=None, keep=BACKUP_KEEP):
+    """Copy a store's database into a new timestamped backup and rotate old ones."""
+    store = store or get_current_store()
+    backup_dir = get_backup_dir(store)
+    os.makedirs(backup_dir, exist_ok=True)
+    path = os.path.join(backup_dir, f'{utc_now().strftime(BACKUP_TIME_FORMAT)}Z.db')
+    partial = f'{path}.partial'
+    source = open_db_connection(store, readonly=True)
+    target = sqlite3.connect(partial)
+    try:
+        source.execute('BEGIN')
+        source.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()  # pins the snapshot
+        source.backup(target, pages=BACKUP_PAGES_PER_STEP,
+                      progress=lambda status, remaining, total: time.sleep(BACKUP_STEP_PAUSE))
+        target.execute('PRAGMA journal_mode=DELETE')
+        result = target.execute('PRAGMA quick_check').fetchone()[0]
+        if result != 'ok':
+            raise sqlite3.DatabaseError(f'Backup failed quick_check: {result}')
+    except Exception:
+        target.close()
+        _remove_backup_file(partial)
+        raise
+    finally:
+        source.close()
+    target.close()
+    os.replace(partial, path)
+    for _, old_path in list_backups(store)[:-keep] if keep > 0 else ():
+        _remove_backup_file(old_path)
+    return path
+
+def _remove_backup_file(path):
+    for file_path in (path, f'{path}-wal', f'{path}-shm', f'{path}-journal'):
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+def find_backup(at, store=None):
+    """Return (taken_at, path) of the newest backup taken at or before UTC ``at``, or None."""
+    candidates = [backup for backup in list_backups(store) if backup[0] <= at]
+    return candidates[-1] if candidates else None
+
+def restore_database(backup_path, store=None):
+    """Replace a store's live database with a backup, in place."""
+    store = store or get_current_store()
+    source = sqlite3.connect(f'file:{quote(backup_path)}?mode=ro', uri=True)
+    target = open_db_connection(store)
+    try:
+        previous = dict(target.execute('SELECT date, version FROM data_versions').fetchall())
+        source.backup(target)
+        offset = max(previous.values(), default=0) + 1
+        restored = dict(target.execute('SELECT date, version FROM data_versions').fetchall())
+        target.executemany('''
+            INSERT INTO data_versions (date, version) VALUES (?, ?)
+            ON CONFLICT(date) DO UPDATE SET version = excluded.version
+        ''', [(date, offset + restored.get(date, 0)) for date in set(previous) | set(restored)])
+        target.commit()
+    finally:
+        source.close()
+        target.close()
+
+def parse_point_in_time(value):
+    """Parse a local ``--at`` time into UTC; a bare date means the end of that day."""
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M'):
+        try:
+            return local_to_utc(datetime.strptime(value, fmt))
+        except ValueError:
+            pass
+    try:
+        return local_to_utc(datetime.strptime(value, '%Y-%m-%d') + timedelta(days=1, seconds=-1))
+    except ValueError:
+        raise ValueError("Invalid time. Use YYYY-MM-DD or YYYY-MM-DD HH:MM[:SS]")
+
+_backup_scheduler_pid = None
+_backup_scheduler_lock = threading.Lock()
+_backup_scheduler_lock_file = None
+
+def _run_backup_scheduler(app):
+    while True:
+        time.sleep(BACKUP_INTERVAL_MINUTES * 60)
+        with app.app_context():
+            for store in get_stores():
+                try:
+                    path = backup_database(store)
+                    logger.info(f"Backed up store {store} to {path}")
+                except Exception as e:
+                    logger.error(f"Scheduled backup of store {store} failed: {str(e)}")
+
+@bp.before_app_request
+def start_backup_scheduler():
+    """Start automatic backups in one worker process when BACKUP_INTERVAL_MINUTES is set."""
+    global _backup_scheduler_pid, _backup_scheduler_lock_file
+    if not BACKUP_INTERVAL_MINUTES or _backup_scheduler_pid == os.getpid():
+        return
+    with _backup_scheduler_lock:
+        if _backup_scheduler_pid == os.getpid():
+            return
+        _backup_scheduler_pid = os.getpid()
+        # Only the worker holding the lock file takes backups
+        lock_path = os.path.join(current_app.instance_path, 'backup-scheduler.lock')
+        os.makedirs(current_app.instance_path, exist_ok=True)
+        try:
+            import fcntl
+        except ImportError:
+            logger.warning("BACKUP_INTERVAL_MINUTES needs file locking (fcntl), which this platform lacks; "
+                           "scheduled backups are off. Run `flask backup` from a scheduled task instead.")
+            return
+        lock_file = open(lock_path, 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return
+        _backup_scheduler_lock_file = lock_file
+        threading.Thread(target=_run_backup_scheduler, args=(current_app._get_current_object(),),
+                         name='backup-scheduler', daemon=True).start()
+
+@bp.cli.command('backup')
+@click.option('--store', 'stores', multiple=True,
+              help='Store shard to back up (repeatable; default: every configured store).')
+@click.option('--keep', type=int, default=BACKUP_KEEP, show_default=True,
+              help='Backups to keep per store (0 keeps all).')
+@click.option('--list', 'list_only', is_flag=True, help='List existing backups instead of taking one.')
+def backup_command(stores, keep, list_only):
+    """Take an online backup of each store's database."""
+    for store in stores or get_stores():
+        if store not in get_stores():
+            raise click.ClickException(f'Unknown store {store}')
+        if list_only:
+            for taken_at, path in list_backups(store):
+                click.echo(f'[{store}] {utc_to_local(taken_at):%Y-%m-%d %H:%M:%S}  {path}')
+            continue
+        started = time.perf_counter()
+        path = backup_database(store, keep)
+        click.echo(f'[{store}] Backed up to {path} in {time.perf_counter() - started:.1f}s')
+
+@bp.cli.command('restore')
+@click.option('--at', 'at', required=True,
+              help='Restore the newest backup taken at or before this time (YYYY-MM-DD[ HH:MM[:SS]]).')
+@click.option('--store', help='Store shard to restore (required when several stores are configured).')
+@click.option('--yes', is_flag=True, help='Do not ask for confirmation.')
+def restore_command(at, store, yes):
+    """Restore a store's database from a backup, backing up the current data first."""
+    try:
+        at = parse_point_in_time(at)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    if store is None:
+        if len(get_stores()) > 1:
+            raise click.ClickException('--store is required when several stores are configured')
+        store = get_stores()[0]
+    if store not in get_stores():
+        raise click.ClickException(f'Unknown store {store}')
+    backup = find_backup(at, store)
+    if backup is None:
+        raise click.ClickException(f'No backup of store {store} taken at or before '
+                                   f'{utc_to_local(at):%Y-%m-%d %H:%M:%S}')
+    taken_at, path = backup
+    if not yes:
+        click.confirm(f'Replace store {store} with the backup taken {utc_to_local(taken_at):%Y-%m-%d %H:%M:%S}?',
+                      abort=True)
+    safety = backup_database(store, keep=0)
+    restore_database(path, store)
+    invalidate_holder_layouts()
+    click.echo(f'Restored store {store} from {path} (previous data saved to {safety}).')
+
+# ---------------------------------------------------------------------------
+# Change journal
+# ---------------------------------------------------------------------------
+
+# Journaled tables: (table, source label, item column, JSON of a row's values).
+# Holders are keyed by holder number, extras by id and reports by date alone.
+JOURNAL_SOURCES = (
+    ('lottery_stock', 'holder', 'holder_number', 'json_array({row}.stock_number, {row}.ticket_value)'),
+    ('extra_tickets', 'extra', 'id', 'json_array({row}.ticket_price, {row}.stock_number)'),
+    ('daily_reports', 'report', None, None),
+)
+
+# Journal entries for a date after which `flask journal-checkpoint` saves a new checkpoint
+JOURNAL_CHECKPOINT_EVERY = 50
+
+def journal_trigger_sql(conn):
+    """Build the triggers that append every change of a journaled table to change_journal."""
+    report_columns = [row['name'] for row in conn.execute('PRAGMA table_info(daily_reports)')
+                      if row['name'] != 'stale']
+    statements = []
+    for table, source, item_col, data_sql in JOURNAL_SOURCES:
+        if data_sql is None:
+            pairs = ', '.join(f"'{col}', {{row}}.{col}" for col in report_columns)
+            data_sql = f'json_object({pairs})'
+        item = (lambda row: f'CAST({row}.{item_col} AS TEXT)') if item_col else (lambda row: 'NULL')
+        insert_when = delete_when = ''
+        if table == 'lottery_stock':
+            # Rows moved in or out of an archive snapshot are not changes
+            insert_when = 'WHEN NOT EXISTS (SELECT 1 FROM stock_snapshots WHERE date = NEW.date)'
+            delete_when = 'WHEN NOT EXISTS (SELECT 1 FROM stock_snapshots WHERE date = OLD.date)'
+        set_new = f'''
+            INSERT INTO change_journal (date, source, op, item, data)
+            VALUES (NEW.date, '{source}', 'set', {item('NEW')}, {data_sql.format(row='NEW')});
+        '''
+        # Only stale flag changes are left out of the report journal
+        update_of = f" OF {', '.join(report_columns)}" if source == 'report' else ''
+        statements.append(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_journal_insert
+            AFTER INSERT ON {table} {insert_when}
+            BEGIN {set_new} END
+        ''')
+        statements.append(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_journal_update
+            AFTER UPDATE{update_of} ON {table}
+            BEGIN
+                INSERT INTO change_journal (date, source, op, item)
+                SELECT OLD.date, '{source}', 'delete', {item('OLD')}
+                WHERE OLD.date IS NOT NEW.date OR {item('OLD')} IS NOT {item('NEW')};
+                {set_new}
+            END
+        ''')
+        statements.append(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_journal_delete
+            AFTER DELETE ON {table} {delete_when}
+            BEGIN
+                INSERT INTO change_journal (date, source, op, item)
+                VALUES (OLD.date, '{source}', 'delete', {item('OLD')});
+            END
+        ''')
+    return statements
+
+def capture_day_state(conn, date):
+    """Return a date's current holders, extras and report in journal form."""
+    holders = {str(row['holder_number']): [row['stock_number'], row['ticket_value']]
+               for row in conn.execute('''
+                   SELECT holder_number, stock_number, ticket_value FROM lottery_stock WHERE date = ?
+               ''', (date,))}
+    if not holders:
+        holders = {str(entry['holder_number']): [entry['stock_number'], entry['ticket_value']]
+                   for entry in load_snapshot_entries(conn, date)}
+    extras = {str(row['id']): [row['ticket_price'], row['stock_number']]
+              for row in conn.execute('''
+                  SELECT id, ticket_price, stock_number FROM extra_tickets WHERE date = ?
+              ''', (date,))}
+    report = conn.execute('SELECT * FROM daily_reports WHERE date = ?', (date,)).fetchone()
+    if report is not None:
+        report = {key: report[key] for key in report.keys() if key != 'stale'}
+    return {'holders': holders, 'extras': extras, 'report': report}
+
+def reconstruct_day(conn, date, at):
+    """Return a date's holders, extras and report as they stood at UTC time ``at``."""
+    at_text = f'{at:%Y-%m-%d %H:%M:%S}.999'
+    target_id = conn.execute('''
+        SELECT COALESCE(MAX(id), 0) FROM change_journal WHERE date = ? AND changed_at <= ?
+    ''', (date, at_text)).fetchone()[0]
+    checkpoint = conn.execute('''
+        SELECT journal_id, taken_at, state FROM journal_checkpoints
+        WHERE date = ? AND journal_id <= ?
+        ORDER BY journal_id DESC LIMIT 1
+    ''', (date, target_id)).fetchone()
+    if checkpoint is None:
+        state, start_id = {'holders': {}, 'extras': {}, 'report': None}, 0
+    else:
+        if checkpoint['journal_id'] == 0 and at_text < checkpoint['taken_at']:
+            started = utc_to_local(datetime.strptime(checkpoint['taken_at'], '%Y-%m-%d %H:%M:%S.%f'))
+            raise ValueError(f"History for {date} starts at {started:%Y-%m-%d %H:%M:%S}")
+        state, start_id = json.loads(checkpoint['state']), checkpoint['journal_id']
+
+    for entry in conn.execute('''
+        SELECT source, op, item, data FROM change_journal
+        WHERE date = ? AND id > ? AND id <= ?
+        ORDER BY id
+    ''', (date, start_id, target_id)):
+        value = json.loads(entry['data']) if entry['op'] == 'set' else None
+        if entry['source'] == 'report':
+            state['report'] = value
+        else:
+            items = state['holders' if entry['source'] == 'holder' else 'extras']
+            if value is None:
+                items.pop(entry['item'], None)
+            else:
+                items[entry['item']] = value
+    return state
+
+def checkpoint_journal(conn, min_entries=JOURNAL_CHECKPOINT_EVERY, since_id=0):
+    """Checkpoint busy dates changed after journal entry ``since_id``; the caller commits."""
+    dates = conn.execute('''
+        SELECT j.date, MAX(j.id) as journal_id
+        FROM change_journal j
+        WHERE j.date IN (SELECT date FROM change_journal WHERE id > ?)
+          AND j.id > COALESCE((SELECT MAX(c.journal_id) FROM journal_checkpoints c WHERE c.date = j.date), 0)
+        GROUP BY j.date
+        HAVING COUNT(*) >= ?
+    ''', (since_id, min_entries)).fetchall()
+    conn.executemany('''
+        INSERT OR IGNORE INTO journal_checkpoints (date, journal_id, state) VALUES (?, ?, ?)
+    ''', [(row['date'], row['journal_id'], json.dumps(capture_day_state(conn, row['date'])))
+          for row in dates])
+    return [row['date'] for row in dates]
+
+# Newest journal entry each database was last swept for checkpoints in this process
+_journal_sweeps = {}
+_journal_sweeps_lock = threading.Lock()
+
+def checkpoint_journal_if_due(conn):
+    """Checkpoint busy dates once JOURNAL_CHECKPOINT_EVERY entries have arrived since the last sweep."""
+    try:
+        latest = conn.execute('SELECT MAX(id) FROM change_journal').fetchone()[0] or 0
+    except sqlite3.OperationalError:
+        return []  # database not migrated to the change journal yet
+    with _journal_sweeps_lock:
+        swept = _journal_sweeps.get(conn.db_path, 0)
+        if latest - swept < JOURNAL_CHECKPOINT_EVERY:
+            return []
+        _journal_sweeps[conn.db_path] = latest
+    return checkpoint_journal(conn, JOURNAL_CHECKPOINT_EVERY, swept)
+
+@bp.route('/history/<date>')
+@require_admin()
+def day_history_view(date):
+    """Admin JSON: a date's holders, extras and report as of ``?at=`` (default now)."""
+    try:
+        date = validate_stock_date(date)
+        at = parse_point_in_time(request.args['at']) if request.args.get('at') else utc_now()
+        state = reconstruct_day(get_db_connection(), date, at)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'date': date, 'at': f'{utc_to_local(at):%Y-%m-%d %H:%M:%S}', **state})
+
+@bp.cli.command('history')
+@click.argument('date')
+@click.option('--at', 'at', help='Local time to reconstruct (YYYY-MM-DD[ HH:MM[:SS]]; default: now).')
+def history_command(date, at):
+    """Print a date's holders, extras and report as they stood at a point in time."""
+    try:
+        date = validate_stock_date(date)
+        at = parse_point_in_time(at) if at else utc_now()
+        state = reconstruct_day(get_db_connection(), date, at)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(json.dumps({'date': date, 'at': f'{utc_to_local(at):%Y-%m-%d %H:%M:%S}', **state}, indent=2))
+
+@bp.cli.command('journal-checkpoint')
+@click.option('--min-entries', type=int, default=JOURNAL_CHECKPOINT_EVERY, show_default=True,
+              help='Checkpoint dates with at least this many journal entries since their last checkpoint.')
+def journal_checkpoint_command(min_entries):
+    """Save per-day checkpoints so history lookups replay short journal chains."""
+    conn = get_db_connection()
+    conn.execute('BEGIN IMMEDIATE')
+    dates = checkpoint_journal(conn, min_entries)
+    conn.commit()
+    click.echo(f'Checkpointed {len(dates)} date(s).')
+
+# ---------------------------------------------------------------------------
+# Application factory
+# ---------------------------------------------------------------------------
+
+def create_app(config=None):
+    """Build the app, with ``config`` overriding the settings read from the environment."""
+    app = Flask(__name__)
+    app.config.update(
+        SECRET_KEY=os.environ.get('SECRET_KEY', 'dev-key-please-change-in-production'),
+        DATABASE=os.environ.get('DATABASE') or os.path.join(app.instance_path, 'stock_data.db'),
+        STORES=[store.strip() for store in os.environ.get('STORES', DEFAULT_STORE).split(',') if store.strip()],
+        # With WRITE_QUEUE requests read through read-only connections and
+        # every write goes through the store's single writer thread (see run_write)
+        WRITE_QUEUE=os.environ.get('WRITE_QUEUE', '').lower() in ('1', 'true', 'yes'),
+        # Apply pending migrations on a database's first connection instead of warning
+        AUTO_MIGRATE=os.environ.get('AUTO_MIGRATE', '').lower() in ('1', 'true', 'yes'),
+    )
+    app.config.update(config or {})
+    for store in app.config['STORES']:
+        if not STORE_ID_PATTERN.match(store):
+            raise RuntimeError(f"Invalid store id {store!r} in STORES")
+    app.extensions['lottery_memory_id'] = os.urandom(6).hex()
+
+    app.register_blueprint(bp)
+    app.teardown_appcontext(release_request_db)
+    before_render_template.connect(start_template_timer, app)
+    template_rendered.connect(stop_template_timer, app)
+    return app
+
+def __getattr__(name):
+    # ``app`` is built on first use, so importing this module stays cheap
+    # while `gunicorn app:app`, `flask` and `from app import app` keep working
+    if name == 'app':
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    create_app().run(debug=True, host='0.0.0.0', port=5000)
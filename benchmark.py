@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Performance benchmark for Lottery Stock Tracker
+
+Builds a throwaway database of configurable size, drives every page through
+the Flask test client (plus get_daily_grand_total directly) and reports
+latency percentiles, SQL queries per request and peak Python memory.
+
+    python benchmark.py --years 3 --save-baseline benchmark_baseline.json
+    python benchmark.py --years 3 --compare benchmark_baseline.json
+    python benchmark.py --startup
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import app as lottery_app
+
+# Extra ticket prices used for generated data
+EXTRA_PRICES = (3, 5, 10)
+
+# Requests run under tracemalloc for the peak memory figure
+MEMORY_ITERATIONS = 5
+
+# p95 differences below this are treated as timer noise
+NOISE_FLOOR_MS = 2.0
+
+# Cold-start target: importing the app module, create_app() and the first
+# request against a fresh in-memory database, on top of importing Flask
+STARTUP_TARGET_MS = 100
+STARTUP_RUNS = 5
+
+STARTUP_SCRIPT = """
+import time
+started = time.perf_counter()
+import flask
+imported_flask = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app({'DATABASE': ':memory:'})
+created = time.perf_counter()
+application.test_client().get('/')
+served = time.perf_counter()
+print(imported_flask - started, imported - imported_flask, created - imported, served - created)
+"""
+
+
+def measure_startup(runs):
+    """Time cold starts in fresh interpreters; returns the median of each phase in ms."""
+    phases = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], capture_output=True, text=True,
+                                check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        phases.append([float(value) * 1000 for value in output.split()])
+    flask_ms, import_ms, create_ms, first_request_ms = (statistics.median(phase) for phase in zip(*phases))
+    return {'flask_import_ms': round(flask_ms, 1), 'app_import_ms': round(import_ms, 1),
+            'create_app_ms': round(create_ms, 1), 'first_request_ms': round(first_request_ms, 1),
+            'total_ms': round(import_ms + create_ms + first_request_ms, 1)}
+
+
+def build_database(app, years, seed):
+    """Populate a fresh database with `years` of stock, extra tickets and reports."""
+    rng = random.Random(seed)
+    start = date.today() - timedelta(days=int(years * 365))
+    days = [(start + timedelta(days=i)).isoformat() for i in range(int(years * 365))]
+
+    with app.app_context():
+        lottery_app.init_database()
+        conn = lottery_app.get_db_connection()
+        for day in days:
+            layout = lottery_app.get_holder_layout(day)
+            conn.executemany('''
+                INSERT INTO lottery_stock (date, holder_number, stock_number, ticket_value)
+                VALUES (?, ?, ?, ?)
+            ''', [(day, h, rng.randint(0, 150), layout.value_for(h)) for h in layout.sequence])
+            conn.executemany('''
+                INSERT INTO extra_tickets (date, ticket_price, stock_number)
+                VALUES (?, ?, ?)
+            ''', [(day, price, rng.randint(0, 40)) for price in rng.sample(EXTRA_PRICES, 2)])
+        lottery_app.generate_reports(conn, days[1], days[-1])
+        conn.commit()
+    return days
+
+
+def count_queries():
+    """Count statements run on every connection opened from now on."""
+    counter = {'queries': 0}
+    open_db_connection = lottery_app.open_db_connection
+
+    def trace(sql):
+        # SQLite reports every executemany row and trigger step separately,
+        # so write-heavy routes count higher than their Python-level calls
+        counter['queries'] += 1
+
+    def traced_open(*args, **kwargs):
+        conn = open_db_connection(*args, **kwargs)
+        conn.set_trace_callback(trace)
+        return conn
+
+    lottery_app.open_db_connection = traced_open
+    return counter
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(name, action, iterations, counter, warm_cache):
+    """Run `action(i)` repeatedly and summarize its latency, queries and memory."""
+    # Warm up template compilation and connection pools outside the timings
+    action(-1)
+    gc.collect()
+    latencies, queries = [], []
+    for i in range(iterations):
+        if not warm_cache:
+            lottery_app.page_cache.clear()
+        before = counter['queries']
+        started = time.perf_counter()
+        action(i)
+        latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(counter['queries'] - before)
+
+    # Memory is traced in a separate pass so tracemalloc doesn't skew latency
+    tracemalloc.start()
+    for i in range(iterations, iterations + MEMORY_ITERATIONS):
+        if not warm_cache:
+            lottery_app.page_cache.clear()
+        action(i)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'name': name,
+        'iterations': iterations,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(statistics.mean(latencies), 3),
+        'queries_per_request': round(statistics.mean(queries), 2),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(app, days, iterations, seed, counter, warm_cache):
+    rng = random.Random(seed)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['admin_authenticated'] = True
+
+    with app.app_context():
+        report_ids = [row['id'] for row in lottery_app.get_db_connection().execute(
+            'SELECT id FROM daily_reports')]
+    layout_sequence = range(1, lottery_app.HOLDER_COUNT + 1)
+    first_new_day = date.fromisoformat(days[-1]) + timedelta(days=1)
+
+    def stock_form(day):
+        form = {'date': day, 'extra_price_1': '3', 'extra_stock_1': str(rng.randint(0, 40))}
+        form.update({f'holder_{h}': str(rng.randint(0, 150)) for h in layout_sequence})
+        return form
+
+    def check(response):
+        if response.status_code >= 400:
+            raise RuntimeError(f'{response.request.path} returned {response.status_code}')
+        return response
+
+    def grand_total(i):
+        with app.app_context():
+            lottery_app.get_daily_grand_total(rng.choice(days))
+
+    scenarios = [
+        ('GET enter_stock', lambda i: check(client.get('/'))),
+        ('POST enter_stock (new day)', lambda i: check(client.post(
+            '/', data=stock_form((first_new_day + timedelta(days=i + 1)).isoformat())))),
+        ('POST enter_stock (resubmit)', lambda i: check(client.post(
+            '/', data=stock_form(rng.choice(days))))),
+        ('GET reports', lambda i: check(client.get('/reports', query_string={'date': rng.choice(days)}))),
+        ('GET create_report', lambda i: check(client.get(
+            '/create-report', query_string={'date': rng.choice(days)}))),
+        ('POST create_report', lambda i: check(client.post(
+            '/create-report', data={'date': rng.choice(days[1:]), 'books_10': '100', 'machine_sold': '50'}))),
+        ('GET lottery_reports', lambda i: check(client.get('/lottery-reports'))),
+        ('GET view_lottery_report', lambda i: check(client.get(
+            f'/view-lottery-report/{rng.choice(report_ids)}'))),
+        ('get_daily_grand_total', grand_total),
+    ]
+    return [measure(name, action, iterations, counter, warm_cache) for name, action in scenarios]
+
+
+def compare(results, baseline, threshold):
+    """Return the list of regressions against a saved baseline."""
+    previous = {row['name']: row for row in baseline['results']}
+    regressions = []
+    for row in results:
+        old = previous.get(row['name'])
+        if old is None:
+            continue
+        if row['p95_ms'] > max(old['p95_ms'] * (1 + threshold), old['p95_ms'] + NOISE_FLOOR_MS):
+            regressions.append(f"{row['name']}: p95 {old['p95_ms']}ms -> {row['p95_ms']}ms")
+        if row['queries_per_request'] > old['queries_per_request']:
+            regressions.append(f"{row['name']}: queries {old['queries_per_request']} -> "
+                               f"{row['queries_per_request']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--years', type=float, default=1, help='Years of history to generate (default: 1)')
+    parser.add_argument('--iterations', type=int, default=50, help='Requests per scenario (default: 50)')
+    parser.add_argument('--seed', type=int, default=1234, help='Random seed (default: 1234)')
+    parser.add_argument('--warm-cache', action='store_true', help='Keep the rendered page cache between requests')
+    parser.add_argument('--memory', action='store_true', help='Use an in-memory database instead of a temp file')
+    parser.add_argument('--startup', action='store_true',
+                        help=f'Only measure cold start against the {STARTUP_TARGET_MS}ms target')
+    parser.add_argument('--save-baseline', metavar='FILE', help='Write results to a baseline JSON file')
+    parser.add_argument('--compare', metavar='FILE', help='Compare results with a baseline JSON file')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Allowed p95 slowdown against the baseline (default: 0.25 = 25%%)')
+    args = parser.parse_args()
+
+    if args.startup:
+        startup = measure_startup(STARTUP_RUNS)
+        print(f"flask import {startup['flask_import_ms']}ms, app import {startup['app_import_ms']}ms, "
+              f"create_app {startup['create_app_ms']}ms, first request {startup['first_request_ms']}ms")
+        print(f"Cold start {startup['total_ms']}ms (target {STARTUP_TARGET_MS}ms)")
+        sys.exit(0 if startup['total_ms'] <= STARTUP_TARGET_MS else 1)
+
+    instance_path = tempfile.mkdtemp(prefix='lottery-bench-')
+    database = ':memory:' if args.memory else os.path.join(instance_path, 'stock_data.db')
+    app = lottery_app.create_app({'DATABASE': database})
+    lottery_app.logger.disabled = True
+    try:
+        counter = count_queries()
+        print(f"Building {args.years:g} year(s) of data in {'memory' if args.memory else instance_path} ...")
+        started = time.perf_counter()
+        days = build_database(app, args.years, args.seed)
+        print(f'Built {len(days)} days in {time.perf_counter() - started:.1f}s\n')
+
+        results = run_benchmarks(app, days, args.iterations, args.seed, counter, args.warm_cache)
+    finally:
+        shutil.rmtree(instance_path, ignore_errors=True)
+
+    print(f"{'scenario':<30} {'p50':>9} {'p95':>9} {'p99':>9} {'queries':>8} {'peak KB':>9}")
+    for row in results:
+        print(f"{row['name']:<30} {row['p50_ms']:>7.2f}ms {row['p95_ms']:>7.2f}ms {row['p99_ms']:>7.2f}ms "
+              f"{row['queries_per_request']:>8} {row['peak_memory_kb']:>9}")
+
+    report = {'years': args.years, 'iterations': args.iterations, 'seed': args.seed,
+              'warm_cache': args.warm_cache, 'memory': args.memory, 'results': results}
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'\nBaseline saved to {args.save_baseline}')
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print('\nRegressions:')
+            for line in regressions:
+                print(f'  {line}')
+            sys.exit(1)
+        print('\nNo regressions against baseline.')
+
+
+if __name__ == '__main__':
+    main()
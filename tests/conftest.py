@@ -0,0 +1,49 @@
+import pytest
+
+from app import create_app, get_holder_layout, open_db_connection, upgrade_database
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.delenv('BACKUP_DIR', raising=False)
+    monkeypatch.delenv('STORE', raising=False)
+    app = create_app({'DATABASE': str(tmp_path / 'stock_data.db'), 'SECRET_KEY': 'test'})
+    with app.app_context():
+        conn = open_db_connection()
+        upgrade_database(conn)
+        conn.close()
+        yield app
+
+
+@pytest.fixture
+def conn(app):
+    conn = open_db_connection()
+    yield conn
+    conn.close()
+
+
+def admin_client(app):
+    """Return a test client that is already signed in as admin."""
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['admin_authenticated'] = True
+    return client
+
+
+def add_stock_day(conn, date, stock=lambda holder: holder, extras=((5, 3), (10, 1))):
+    """Insert a full day of holder counts and a few extra tickets."""
+    layout = get_holder_layout(date)
+    conn.executemany('''
+        INSERT INTO lottery_stock (date, holder_number, stock_number, ticket_value) VALUES (?, ?, ?, ?)
+    ''', [(date, holder, stock(holder), layout.value_for(holder)) for holder in range(1, 57)])
+    conn.executemany('''
+        INSERT INTO extra_tickets (date, ticket_price, stock_number) VALUES (?, ?, ?)
+    ''', [(date, price, count) for price, count in extras])
+
+
+def add_report(conn, date, sale, deposit=0.0):
+    conn.execute('''
+        INSERT INTO daily_reports (date, yesterday_closing, today_closing, total_lottery_sale,
+                                   lottery_deposit_amount, machine_sold, tickets_cashed, online_cashed)
+        VALUES (?, 0, 0, ?, ?, 1.5, 2.25, 0.75)
+    ''', (date, sale, deposit))
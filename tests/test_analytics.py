@@ -0,0 +1,76 @@
+import csv
+import io
+
+from app import sales_analytics
+
+from conftest import add_report, add_stock_day, admin_client
+
+
+def value_closings(conn, date):
+    """Per ticket value closing computed straight from the stock tables."""
+    closings = {}
+    for value, total in conn.execute('''
+        SELECT ticket_value, stock_number * ticket_value FROM lottery_stock WHERE date = ?
+        UNION ALL
+        SELECT ticket_price, stock_number * ticket_price FROM extra_tickets WHERE date = ?
+    ''', (date, date)):
+        closings[value] = closings.get(value, 0) + total
+    return closings
+
+
+def record_days(conn):
+    add_stock_day(conn, '2024-03-01', stock=lambda holder: 40, extras=((100, 2), (5, 4)))
+    add_stock_day(conn, '2024-03-02', stock=lambda holder: 35 if holder % 2 else 40, extras=((5, 1),))
+    add_stock_day(conn, '2024-03-04', stock=lambda holder: 30, extras=((5, 1),))
+    add_report(conn, '2024-03-04', 0.0)
+    conn.execute("UPDATE daily_reports SET books_10 = 300, books_1 = 25 WHERE date = '2024-03-04'")
+    conn.commit()
+
+
+def test_sales_match_a_direct_day_over_day_calculation(app, conn):
+    record_days(conn)
+    days = sales_analytics('2024-03-02', '2024-03-31')
+    assert [(day['date'], day['previous_date']) for day in days] == \
+        [('2024-03-02', '2024-03-01'), ('2024-03-04', '2024-03-02')]
+
+    for day in days:
+        closing, previous = value_closings(conn, day['date']), value_closings(conn, day['previous_date'])
+        books = {1: 25, 10: 300} if day['date'] == '2024-03-04' else {}
+        assert day['closing'] == sum(closing.values())
+        assert day['previous_closing'] == sum(previous.values())
+        assert day['change'] == day['closing'] - day['previous_closing']
+        assert day['new_books'] == sum(books.values())
+        assert day['net_scratch'] == day['previous_closing'] + day['new_books'] - day['closing']
+        for value in set(closing) | set(previous):
+            expected = previous.get(value, 0) + books.get(value, 0) - closing.get(value, 0)
+            assert day['by_value'][value]['sales'] == expected
+    # A value sold out since the previous day still shows its sales
+    assert days[0]['by_value'][100] == {'closing': 0, 'new_books': 0, 'sales': 200}
+
+
+def test_first_recorded_day_has_no_change(app, conn):
+    record_days(conn)
+    first = sales_analytics('2024-02-01', '2024-03-01')
+    assert len(first) == 1
+    assert first[0]['previous_date'] is None
+    assert first[0]['change'] is None and first[0]['net_scratch'] is None
+    assert all(value['sales'] is None for value in first[0]['by_value'].values())
+
+
+def test_analytics_route_serves_json_and_csv(app, conn):
+    record_days(conn)
+    client = admin_client(app)
+    data = client.get('/analytics/sales', query_string={'from': '2024-03-02', 'to': '2024-03-04'}).get_json()
+    assert data['from'] == '2024-03-02'
+    assert [day['date'] for day in data['days']] == ['2024-03-02', '2024-03-04']
+
+    response = client.get('/analytics/sales',
+                          query_string={'from': '2024-03-02', 'to': '2024-03-04', 'format': 'csv'})
+    assert response.mimetype == 'text/csv'
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [row['date'] for row in rows] == ['2024-03-02', '2024-03-04']
+    assert float(rows[1]['net_scratch']) == data['days'][1]['net_scratch']
+    assert float(rows[0]['sales_50']) == data['days'][0]['by_value']['50']['sales']
+
+    response = client.get('/analytics/sales', query_string={'from': '2024-03-05', 'to': '2024-03-01'})
+    assert response.status_code == 400
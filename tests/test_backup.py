@@ -0,0 +1,69 @@
+import os
+import sys
+
+import app as app_module
+
+from app import (backup_database, create_app, find_backup, get_backup_dir, list_backups,
+                 restore_database, utc_now)
+
+from conftest import add_stock_day
+
+
+def store_rows(conn):
+    return {table: sorted(tuple(row) for row in conn.execute(f'SELECT * FROM {table}'))
+            for table in ('lottery_stock', 'extra_tickets', 'daily_totals', 'stock_dates')}
+
+
+def test_backup_restore_round_trip(conn):
+    add_stock_day(conn, '2024-05-01')
+    add_stock_day(conn, '2024-05-02')
+    conn.commit()
+    before = store_rows(conn)
+    path = backup_database('default')
+    assert find_backup(utc_now(), 'default')[1] == path
+
+    conn.execute("DELETE FROM extra_tickets WHERE date = '2024-05-01'")
+    conn.execute("UPDATE lottery_stock SET stock_number = 0 WHERE date = '2024-05-02'")
+    conn.commit()
+    versions = dict(conn.execute('SELECT date, version FROM data_versions').fetchall())
+
+    restore_database(path, 'default')
+    assert store_rows(conn) == before
+    restored = dict(conn.execute('SELECT date, version FROM data_versions').fetchall())
+    assert all(restored[date] > version for date, version in versions.items())
+    assert sorted(os.listdir(os.path.dirname(path))) == [os.path.basename(path)]
+
+
+def test_rotation_removes_old_backups_and_sidecars(app):
+    backup_dir = get_backup_dir('default')
+    os.makedirs(backup_dir)
+    for name in ('20200101-000000Z.db', '20200101-000000Z.db-wal', '20200101-000000Z.db-shm',
+                 '20200102-000000.db'):
+        open(os.path.join(backup_dir, name), 'w').close()
+    assert len(list_backups('default')) == 2
+
+    path = backup_database('default', keep=1)
+    assert os.listdir(backup_dir) == [os.path.basename(path)]
+
+
+def test_restore_requires_store_when_several_are_configured(tmp_path):
+    app = create_app({'DATABASE': str(tmp_path / 'stock_data.db'), 'STORES': ['default', 'east']})
+    runner = app.test_cli_runner()
+    runner.invoke(args=['init-db'])
+
+    result = runner.invoke(args=['restore', '--at', '2099-01-01', '--yes'])
+    assert result.exit_code != 0 and '--store is required' in result.output
+    result = runner.invoke(args=['restore', '--store', 'west', '--at', '2099-01-01', '--yes'])
+    assert 'Unknown store west' in result.output
+
+
+def test_scheduler_stays_off_without_file_locking(app, monkeypatch, caplog):
+    monkeypatch.setattr(app_module, 'BACKUP_INTERVAL_MINUTES', 60)
+    monkeypatch.setattr(app_module, '_backup_scheduler_pid', None)
+    monkeypatch.setitem(sys.modules, 'fcntl', None)
+    started = []
+    monkeypatch.setattr(app_module.threading.Thread, 'start', lambda thread: started.append(thread.name))
+
+    app_module.start_backup_scheduler()
+    assert started == []
+    assert 'scheduled backups are off' in caplog.text
@@ -0,0 +1,62 @@
+import pytest
+
+
+def day(date, stock=1, extra_tickets=None):
+    payload = {'date': date, 'holders': {str(holder): stock for holder in range(1, 57)}}
+    if extra_tickets is not None:
+        payload['extra_tickets'] = extra_tickets
+    return payload
+
+
+def test_batch_creates_and_updates_days(app, conn):
+    client = app.test_client()
+    response = client.post('/api/stock-batch', json=[
+        day('2024-04-01', extra_tickets=[{'ticket_price': 5, 'stock_number': 3}]),
+        day('2024-04-02'),
+    ])
+    assert response.status_code == 200
+    assert [result['status'] for result in response.get_json()['results']] == ['created', 'created']
+    assert conn.execute('SELECT COUNT(*) FROM lottery_stock').fetchone()[0] == 112
+
+    changed = day('2024-04-01', extra_tickets=[{'ticket_price': 5, 'stock_number': 4}])
+    changed['holders']['7'] = 9
+    response = client.post('/api/stock-batch', json={'days': [changed, day('2024-04-02')]})
+    results = response.get_json()['results']
+    assert results[0]['status'] == 'updated' and results[0]['holders_changed'] == [7]
+    assert results[0]['extras_updated'] == 1
+    assert results[1]['status'] == 'unchanged'
+
+
+@pytest.mark.parametrize('extra_tickets', [
+    5, {'ticket_price': 5}, ['five'], [{'ticket_price': 5}], [{'ticket_price': 'x', 'stock_number': 1}],
+    [{'ticket_price': 5.5, 'stock_number': 1}], [{'ticket_price': None, 'stock_number': 1}],
+])
+def test_invalid_extra_tickets_are_reported_per_day(app, conn, extra_tickets):
+    response = app.test_client().post('/api/stock-batch', json=[
+        day('2024-04-01'), day('2024-04-02', extra_tickets=extra_tickets),
+    ])
+    assert response.status_code == 400
+    errors = response.get_json()['errors']
+    assert [(error['index'], error['date']) for error in errors] == [(1, '2024-04-02')]
+    assert errors[0]['error'].startswith(('extra_tickets must', 'Extra ticket entry 1 must',
+                                          'Invalid extra ticket entry 1: Extra ticket'))
+    assert conn.execute('SELECT COUNT(*) FROM lottery_stock').fetchone()[0] == 0
+
+
+@pytest.mark.parametrize('payload', [
+    [day('2024-04-01'), day('2024-04-01')],
+    [{**day('2024-04-01'), 'holders': {'1': True}}],
+    [{**day('2024-04-01'), 'holders': [1, 2]}],
+    [day('2024-02-30')],
+    ['2024-04-01'],
+])
+def test_invalid_days_reject_the_batch(app, conn, payload):
+    response = app.test_client().post('/api/stock-batch', json=payload)
+    assert response.status_code == 400 and response.get_json()['errors']
+    assert conn.execute('SELECT COUNT(*) FROM lottery_stock').fetchone()[0] == 0
+
+
+@pytest.mark.parametrize('payload', [[], {'days': 'x'}, 'x'])
+def test_malformed_payload(app, payload):
+    response = app.test_client().post('/api/stock-batch', json=payload)
+    assert response.status_code == 400 and 'error' in response.get_json()
@@ -0,0 +1,30 @@
+import threading
+from datetime import date, timedelta
+
+from app import create_app, open_db_connection
+
+
+def test_concurrent_first_requests_wait_for_migrations(tmp_path):
+    app = create_app({'DATABASE': str(tmp_path / 'stock_data.db'), 'WRITE_QUEUE': True, 'AUTO_MIGRATE': True})
+    form = {f'holder_{holder}': '1' for holder in range(1, 57)}
+    barrier = threading.Barrier(20)
+    statuses = []
+
+    def post_days(first_day):
+        client = app.test_client()
+        barrier.wait()
+        for day in range(first_day, first_day + 3):
+            response = client.post('/', data={**form, 'date': (date(2024, 3, 1) + timedelta(days=day)).isoformat()})
+            statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=post_days, args=(day,)) for day in range(0, 60, 3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses == [302] * 60
+    with app.app_context():
+        conn = open_db_connection()
+        assert conn.execute('SELECT COUNT(*) FROM stock_dates').fetchone()[0] == 60
+        conn.close()
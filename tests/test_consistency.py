@@ -0,0 +1,69 @@
+from datetime import date, timedelta
+
+from app import (archive_stock_days, create_app, open_db_connection, rebuild_daily_totals,
+                 rebuild_report_rollups, unarchive_stock_day, upgrade_database)
+
+from conftest import add_report, add_stock_day
+
+
+def table_rows(conn, table):
+    return sorted(tuple(round(value, 6) if isinstance(value, float) else value for value in row)
+                  for row in conn.execute(f'SELECT * FROM {table}'))
+
+
+def test_daily_totals_and_stock_dates_match_rebuild(conn):
+    for day in range(1, 8):
+        add_stock_day(conn, f'2024-03-{day:02d}', stock=lambda holder, day=day: holder * day % 17)
+    conn.commit()
+    conn.execute("UPDATE lottery_stock SET stock_number = 99 WHERE date = '2024-03-02' AND holder_number = 4")
+    conn.execute("DELETE FROM lottery_stock WHERE date = '2024-03-03' AND holder_number > 50")
+    conn.execute("DELETE FROM lottery_stock WHERE date = '2024-03-04'")
+    conn.execute("DELETE FROM extra_tickets WHERE date = '2024-03-04'")
+    conn.execute("UPDATE extra_tickets SET ticket_price = 20 WHERE date = '2024-03-05' AND ticket_price = 5")
+    conn.execute("UPDATE extra_tickets SET date = '2024-03-09' WHERE date = '2024-03-06'")
+    archive_stock_days(conn, '2024-03-03')
+    unarchive_stock_day(conn, '2024-03-01')
+    conn.execute("UPDATE lottery_stock SET stock_number = 0 WHERE date = '2024-03-01' AND holder_number = 1")
+    conn.commit()
+
+    totals, dates = table_rows(conn, 'daily_totals'), table_rows(conn, 'stock_dates')
+    assert ('2024-03-04',) not in dates and ('2024-03-09',) in dates
+    rebuild_daily_totals(conn)
+    assert table_rows(conn, 'daily_totals') == totals
+    assert table_rows(conn, 'stock_dates') == dates
+
+
+def test_report_rollups_match_rebuild(conn):
+    start = date(2023, 12, 1)
+    for day in range(0, 70, 3):
+        add_report(conn, (start + timedelta(days=day)).isoformat(), sale=day * 10.1)
+    conn.commit()
+    conn.execute("UPDATE daily_reports SET total_lottery_sale = 5.5 WHERE date = '2023-12-04'")
+    conn.execute("UPDATE daily_reports SET date = '2024-03-01' WHERE date = '2023-12-31'")
+    conn.execute("DELETE FROM daily_reports WHERE date = '2024-01-06'")
+    conn.execute("UPDATE daily_reports SET stale = 1 WHERE date = '2023-12-07'")
+    conn.commit()
+
+    rollups = table_rows(conn, 'report_rollups')
+    assert ('month', '2024-03-01') in {row[:2] for row in rollups}
+    rebuild_report_rollups(conn)
+    assert table_rows(conn, 'report_rollups') == rollups
+
+
+def test_migration_1_does_not_depend_on_later_tables(tmp_path):
+    app = create_app({'DATABASE': str(tmp_path / 'stock_data.db')})
+    with app.app_context():
+        conn = open_db_connection()
+        upgrade_database(conn, 1)
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert not tables & {'stock_snapshots', 'change_journal', 'report_rollups'}
+        for (sql,) in conn.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger'"):
+            assert 'stock_snapshots' not in sql and 'change_journal' not in sql
+        add_stock_day(conn, '2024-03-01')
+        conn.commit()
+        assert conn.execute('SELECT COUNT(*) FROM stock_dates').fetchone()[0] == 1
+        upgrade_database(conn)
+        totals = table_rows(conn, 'daily_totals')
+        rebuild_daily_totals(conn)
+        assert table_rows(conn, 'daily_totals') == totals
+        conn.close()
@@ -0,0 +1,62 @@
+import csv
+import gzip
+import io
+import json
+
+import app as app_module
+
+from app import archive_stock_days, iter_export_chunks, iter_export_rows
+
+from conftest import add_report, add_stock_day, admin_client
+
+
+def test_export_streams_csv_in_bounded_chunks(app, conn, monkeypatch):
+    monkeypatch.setattr(app_module, 'EXPORT_CHUNK_ROWS', 10)
+    add_stock_day(conn, '2024-01-01')
+    conn.commit()
+    columns, rows = iter_export_rows(conn, 'lottery_stock')
+    chunks = list(iter_export_chunks(columns, rows))
+    assert len(chunks) > 1
+
+    lines = list(csv.reader(io.StringIO(b''.join(chunks).decode('utf-8'))))
+    assert lines[0] == columns
+    assert [int(line[columns.index('holder_number')]) for line in lines[1:]] == list(range(1, 57))
+
+
+def test_export_route_filters_dates_and_gzips_ndjson(app, conn):
+    for day, sale in (('2024-01-01', 10.0), ('2024-01-02', 20.0), ('2024-01-03', 30.0)):
+        add_report(conn, day, sale)
+    conn.commit()
+    response = admin_client(app).get('/export/daily_reports', query_string={
+        'format': 'ndjson', 'gzip': '1', 'from': '2024-01-02', 'to': '2024-01-03'})
+    assert response.status_code == 200
+    assert response.mimetype == 'application/gzip'
+    assert 'daily_reports.ndjson.gz' in response.headers['Content-Disposition']
+
+    records = [json.loads(line) for line in gzip.decompress(response.data).decode('utf-8').splitlines()]
+    assert [(record['date'], record['total_lottery_sale']) for record in records] == \
+        [('2024-01-02', 20.0), ('2024-01-03', 30.0)]
+
+
+def stock_counts(columns, rows):
+    picks = [columns.index(name) for name in ('date', 'holder_number', 'stock_number', 'ticket_value')]
+    return [tuple(row[index] for index in picks) for row in rows]
+
+
+def test_export_includes_archived_days_in_order(app, conn):
+    for day in ('2024-01-01', '2024-01-02', '2024-01-03'):
+        add_stock_day(conn, day)
+    conn.commit()
+    before = stock_counts(*iter_export_rows(conn, 'lottery_stock'))
+
+    assert archive_stock_days(conn, '2024-01-03') == (['2024-01-01', '2024-01-02'], [])
+    conn.commit()
+    assert stock_counts(*iter_export_rows(conn, 'lottery_stock')) == before
+
+
+def test_export_rejects_unknown_tables(app):
+    client = admin_client(app)
+    response = client.get('/export/users')
+    assert response.status_code == 302
+    response = client.get('/export/daily_reports', query_string={'from': 'yesterday'})
+    assert response.status_code == 302
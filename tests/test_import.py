@@ -0,0 +1,58 @@
+import json
+
+import click
+import pytest
+
+from app import import_stock_files
+
+
+def extra_counts(conn):
+    return conn.execute('SELECT date, COUNT(*) FROM extra_tickets GROUP BY date ORDER BY date').fetchall()
+
+
+def write_ndjson(path, records):
+    path.write_text('\n'.join(json.dumps(record) for record in records))
+    return str(path)
+
+
+def test_reimport_replaces_extras(conn, tmp_path):
+    path = write_ndjson(tmp_path / 'stock.ndjson',
+                        [{'date': f'2024-01-0{i % 3 + 1}', 'ticket_price': 5, 'stock_number': i} for i in range(7)])
+    conn.execute("INSERT INTO extra_tickets (date, ticket_price, stock_number) VALUES ('2024-01-01', 10, 1)")
+    conn.commit()
+    for _ in range(2):
+        import_stock_files(conn, [path], batch_size=2, echo=lambda message: None)
+        assert [tuple(row) for row in extra_counts(conn)] == [('2024-01-01', 3), ('2024-01-02', 2), ('2024-01-03', 2)]
+
+
+def test_resume_continues_after_last_committed_row(conn, tmp_path):
+    records = [{'date': '2024-01-01', 'ticket_price': 5, 'stock_number': i} for i in range(5)]
+    path = write_ndjson(tmp_path / 'stock.ndjson', records + [{'date': 'bad', 'ticket_price': 5, 'stock_number': 1}])
+    with pytest.raises(click.ClickException):
+        import_stock_files(conn, [path], batch_size=2, echo=lambda message: None)
+
+    write_ndjson(tmp_path / 'stock.ndjson', records + [{'date': '2024-01-01', 'ticket_price': 5, 'stock_number': 9}])
+    assert import_stock_files(conn, [path], batch_size=2, resume=True, echo=lambda message: None) == 2
+    assert [tuple(row) for row in extra_counts(conn)] == [('2024-01-01', 6)]
+    assert conn.execute('SELECT COUNT(*) FROM import_progress').fetchone()[0] == 0
+
+
+def test_files_in_one_request_add_to_each_others_extras(conn, tmp_path):
+    first = write_ndjson(tmp_path / 'first.ndjson', [{'date': '2024-01-01', 'ticket_price': 5, 'stock_number': 1}])
+    second = write_ndjson(tmp_path / 'second.ndjson', [{'date': '2024-01-01', 'ticket_price': 10, 'stock_number': 2}])
+    for _ in range(2):
+        import_stock_files(conn, [first, second], echo=lambda message: None)
+        assert [tuple(row) for row in extra_counts(conn)] == [('2024-01-01', 2)]
+
+
+def test_resume_skips_finished_files_of_the_request(conn, tmp_path):
+    first = write_ndjson(tmp_path / 'first.ndjson', [{'date': '2024-01-01', 'ticket_price': 5, 'stock_number': 1}])
+    second = write_ndjson(tmp_path / 'second.ndjson', [{'date': '2024-01-01', 'ticket_price': 10, 'stock_number': 2},
+                                                       {'date': 'bad', 'ticket_price': 10, 'stock_number': 2}])
+    with pytest.raises(click.ClickException):
+        import_stock_files(conn, [first, second], batch_size=1, echo=lambda message: None)
+
+    write_ndjson(tmp_path / 'second.ndjson', [{'date': '2024-01-01', 'ticket_price': 10, 'stock_number': 2},
+                                              {'date': '2024-01-02', 'ticket_price': 10, 'stock_number': 2}])
+    assert import_stock_files(conn, [first, second], batch_size=1, resume=True, echo=lambda message: None) == 1
+    assert [tuple(row) for row in extra_counts(conn)] == [('2024-01-01', 2), ('2024-01-02', 1)]
@@ -0,0 +1,89 @@
+import time
+from datetime import datetime
+
+import pytest
+
+from app import (JOURNAL_CHECKPOINT_EVERY, capture_day_state, checkpoint_journal, create_app,
+                 open_db_connection, parse_point_in_time, reconstruct_day, run_write, upgrade_database,
+                 utc_now)
+
+from conftest import add_report, add_stock_day
+
+
+def set_journal_time(conn, changed_at):
+    conn.execute("UPDATE change_journal SET changed_at = ? WHERE changed_at > '2025'", (changed_at,))
+
+
+def test_reconstruct_day_replays_journal(conn):
+    add_stock_day(conn, '2024-02-01')
+    add_report(conn, '2024-02-01', sale=100.0)
+    set_journal_time(conn, '2024-02-01 10:00:00.000')
+    conn.commit()
+    morning = capture_day_state(conn, '2024-02-01')
+
+    conn.execute("UPDATE lottery_stock SET stock_number = 77 WHERE date = '2024-02-01' AND holder_number = 3")
+    conn.execute("DELETE FROM lottery_stock WHERE date = '2024-02-01' AND holder_number = 4")
+    conn.execute("DELETE FROM extra_tickets WHERE date = '2024-02-01' AND ticket_price = 5")
+    conn.execute("UPDATE daily_reports SET total_lottery_sale = 120.0 WHERE date = '2024-02-01'")
+    set_journal_time(conn, '2024-02-01 12:00:00.000')
+    conn.commit()
+    noon = capture_day_state(conn, '2024-02-01')
+    assert noon != morning
+
+    for checkpointed in (False, True):
+        assert reconstruct_day(conn, '2024-02-01', datetime(2024, 2, 1, 11)) == morning
+        assert reconstruct_day(conn, '2024-02-01', datetime(2024, 2, 1, 12, 0, 0)) == noon
+        assert reconstruct_day(conn, '2024-02-01', datetime(2024, 2, 1, 9))['holders'] == {}
+        checkpoint_journal(conn, min_entries=1)
+        conn.commit()
+
+
+@pytest.fixture
+def new_york(monkeypatch):
+    monkeypatch.setenv('TZ', 'America/New_York')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_journal_times_are_utc(app, new_york):
+    assert parse_point_in_time('2024-01-15 08:30') == datetime(2024, 1, 15, 13, 30)
+    assert parse_point_in_time('2024-07-15') == datetime(2024, 7, 16, 3, 59, 59)
+
+    conn = open_db_connection()
+    conn.execute("INSERT INTO extra_tickets (date, ticket_price, stock_number) VALUES ('2024-01-15', 5, 1)")
+    conn.commit()
+    changed_at = conn.execute('SELECT changed_at FROM change_journal').fetchone()[0]
+    assert abs(datetime.strptime(changed_at, '%Y-%m-%d %H:%M:%S.%f') - utc_now()).total_seconds() < 60
+    conn.close()
+
+
+def test_utc_migration_converts_local_times(tmp_path, new_york):
+    app = create_app({'DATABASE': str(tmp_path / 'stock_data.db')})
+    with app.app_context():
+        conn = open_db_connection()
+        upgrade_database(conn, 7)
+        conn.execute("INSERT INTO extra_tickets (date, ticket_price, stock_number) VALUES ('2024-01-15', 5, 1)")
+        conn.execute("UPDATE change_journal SET changed_at = '2024-01-15 08:30:00.250'")
+        conn.commit()
+        upgrade_database(conn)
+        assert conn.execute('SELECT changed_at FROM change_journal').fetchone()[0] == '2024-01-15 13:30:00.250'
+        conn.close()
+
+
+def test_writes_checkpoint_busy_dates(app, conn):
+    add_stock_day(conn, '2024-02-01')
+    conn.commit()
+    with app.test_request_context():
+        for stock in range(JOURNAL_CHECKPOINT_EVERY):
+            run_write(lambda write_conn: write_conn.execute('''
+                UPDATE lottery_stock SET stock_number = ? WHERE date = '2024-02-01' AND holder_number = 1
+            ''', (stock,)))
+    latest = conn.execute('''
+        SELECT MAX(journal_id) FROM journal_checkpoints WHERE date = '2024-02-01'
+    ''').fetchone()[0]
+    assert latest > 0
+    pending = conn.execute('SELECT COUNT(*) FROM change_journal WHERE id > ?', (latest,)).fetchone()[0]
+    assert pending < JOURNAL_CHECKPOINT_EVERY
+    assert reconstruct_day(conn, '2024-02-01', utc_now()) == capture_day_state(conn, '2024-02-01')
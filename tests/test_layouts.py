@@ -0,0 +1,22 @@
+import pytest
+
+from app import get_holder_layout, save_holder_layout
+
+from conftest import add_stock_day
+
+
+def test_layout_cannot_take_effect_on_recorded_days(conn):
+    add_stock_day(conn, '2024-05-01')
+    add_stock_day(conn, '2024-05-10')
+    conn.commit()
+    values = {holder: 40 for holder in range(1, 57)}
+    for effective_date in ('2024-05-01', '2024-05-05', '2024-05-10'):
+        with pytest.raises(ValueError, match='2024-05-10'):
+            save_holder_layout(conn, effective_date, values)
+
+    save_holder_layout(conn, '2024-05-11', values)
+    conn.commit()
+    assert get_holder_layout('2024-05-11').value_for(1) == 40
+    assert get_holder_layout('2024-05-10').value_for(1) != 40
+    with pytest.raises(ValueError, match='after 2024-05-11'):
+        save_holder_layout(conn, '2024-05-11', values)
@@ -0,0 +1,88 @@
+from app import (PageCache, create_app, get_holder_layout, open_db_connection, save_holder_layout,
+                 upgrade_database)
+
+from conftest import add_stock_day
+
+
+def make_app(path, stock):
+    app = create_app({'DATABASE': str(path / 'stock_data.db'), 'SECRET_KEY': 'test'})
+    with app.app_context():
+        conn = open_db_connection()
+        upgrade_database(conn)
+        add_stock_day(conn, '2024-05-01', stock=lambda holder: stock, extras=())
+        conn.commit()
+        total = conn.execute('SELECT SUM(total_value) FROM daily_totals').fetchone()[0]
+        conn.close()
+    return app, total
+
+
+def test_apps_do_not_share_cached_pages(tmp_path):
+    first, first_total = make_app(tmp_path / 'first', 1)
+    second, second_total = make_app(tmp_path / 'second', 7)
+    assert first_total != second_total
+
+    for app, total in ((first, first_total), (second, second_total), (first, first_total)):
+        body = app.test_client().get('/reports', query_string={'date': '2024-05-01'}).get_data(as_text=True)
+        assert f'Grand Total: ${total}' in body
+
+
+def test_apps_do_not_share_holder_layouts(tmp_path):
+    first, _ = make_app(tmp_path / 'first', 1)
+    second, _ = make_app(tmp_path / 'second', 1)
+    with first.app_context():
+        default_value = get_holder_layout('2024-06-01').value_for(1)
+    with second.app_context():
+        conn = open_db_connection()
+        save_holder_layout(conn, '2024-05-15', {holder: default_value + 6 for holder in range(1, 57)})
+        conn.commit()
+        conn.close()
+        assert get_holder_layout('2024-06-01').value_for(1) == default_value + 6
+    with first.app_context():
+        assert get_holder_layout('2024-06-01').value_for(1) == default_value
+
+
+def test_pages_revalidate_with_etags_until_the_day_changes(app, conn):
+    add_stock_day(conn, '2024-05-01', stock=lambda holder: 2, extras=())
+    conn.commit()
+    client = app.test_client()
+    first = client.get('/reports', query_string={'date': '2024-05-01'})
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+
+    again = client.get('/reports', query_string={'date': '2024-05-01'}, headers={'If-None-Match': etag})
+    assert again.status_code == 304 and again.data == b''
+
+    conn.execute("UPDATE lottery_stock SET stock_number = 9 WHERE date = '2024-05-01' AND holder_number = 1")
+    conn.commit()
+    total = conn.execute("SELECT SUM(total_value) FROM daily_totals WHERE date = '2024-05-01'").fetchone()[0]
+    changed = client.get('/reports', query_string={'date': '2024-05-01'}, headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+    assert f'Grand Total: ${total}' in changed.get_data(as_text=True)
+
+
+def test_pages_with_pending_flashes_are_not_cached(app, conn):
+    add_stock_day(conn, '2024-05-01', extras=())
+    conn.commit()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_flashes'] = [('success', 'Stock saved for 2024-05-01')]
+    flashed = client.get('/reports', query_string={'date': '2024-05-01'})
+    assert 'Stock saved for 2024-05-01' in flashed.get_data(as_text=True)
+    assert 'ETag' not in flashed.headers
+
+    plain = client.get('/reports', query_string={'date': '2024-05-01'})
+    assert 'Stock saved for 2024-05-01' not in plain.get_data(as_text=True)
+    assert 'ETag' in plain.headers
+
+
+def test_page_cache_evicts_least_recently_used_pages():
+    cache = PageCache(max_bytes=10)
+    cache.put('a', b'1234', 'etag-a')
+    cache.put('b', b'1234', 'etag-b')
+    assert cache.get('a') == (b'1234', 'etag-a')
+    cache.put('c', b'1234', 'etag-c')
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert cache.size == 8
+    cache.put('huge', b'x' * 11, 'etag-huge')
+    assert cache.get('huge') is None and cache.size == 8
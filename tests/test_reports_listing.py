@@ -0,0 +1,73 @@
+from datetime import date, timedelta
+
+import pytest
+
+from app import parse_report_filters, query_daily_reports
+
+from conftest import add_report, admin_client
+
+
+def add_reports(conn, days):
+    dates = [(date(2024, 1, 1) + timedelta(days=day)).isoformat() for day in range(days)]
+    for index, day in enumerate(dates):
+        add_report(conn, day, sale=float(index), deposit=float(index % 7))
+    conn.commit()
+    return dates
+
+
+def walk_pages(conn, args):
+    pages, before = [], None
+    while True:
+        filters = parse_report_filters({**args, 'before': before} if before else args)
+        rows, before = query_daily_reports(conn, filters)
+        pages.append([row['date'] for row in rows])
+        if before is None:
+            return pages
+
+
+def test_keyset_pages_cover_every_report_once(app, conn):
+    dates = add_reports(conn, 23)
+    pages = walk_pages(conn, {'limit': '5'})
+    assert [len(page) for page in pages] == [5, 5, 5, 5, 3]
+    assert [day for page in pages for day in page] == sorted(dates, reverse=True)
+
+
+def test_exact_page_multiple_has_no_empty_trailing_page(app, conn):
+    add_reports(conn, 10)
+    assert [len(page) for page in walk_pages(conn, {'limit': '5'})] == [5, 5]
+
+
+def test_filters_combine_with_the_cursor(app, conn):
+    dates = add_reports(conn, 40)
+    args = {'limit': '4', 'from': dates[5], 'to': dates[30], 'min_deposit': '3', 'max_sale': '25'}
+    listed = [day for page in walk_pages(conn, args) for day in page]
+    expected = [day for index, day in enumerate(dates)
+                if 5 <= index <= 25 and index % 7 >= 3]
+    assert listed == sorted(expected, reverse=True)
+
+
+def test_limit_is_clamped_and_bad_amounts_rejected():
+    assert parse_report_filters({'limit': '0'})['limit'] == 1
+    assert parse_report_filters({'limit': '100000'})['limit'] == 200
+    assert parse_report_filters({'limit': 'many'})['limit'] == 50
+    assert parse_report_filters({})['active'] is False
+    assert parse_report_filters({'min_sale': '0'})['active'] is True
+    with pytest.raises(ValueError, match='min sale'):
+        parse_report_filters({'min_sale': 'lots'})
+
+
+def test_json_endpoint_follows_next_before(app, conn):
+    dates = add_reports(conn, 7)
+    client = admin_client(app)
+    first = client.get('/lottery-reports.json', query_string={'limit': 4}).get_json()
+    assert [report['date'] for report in first['reports']] == dates[:2:-1]
+    assert first['next_before'] == dates[3]
+    assert dates[6] in first['html']
+
+    second = client.get('/lottery-reports.json',
+                        query_string={'limit': 4, 'before': first['next_before']}).get_json()
+    assert [report['date'] for report in second['reports']] == dates[2::-1]
+    assert second['next_before'] is None
+
+    response = client.get('/lottery-reports.json', query_string={'max_deposit': 'x'})
+    assert response.status_code == 400
@@ -0,0 +1,45 @@
+from datetime import date, timedelta
+
+import pytest
+
+from app import ROLLUP_FIELDS, report_range_totals
+
+from conftest import add_report, admin_client
+
+
+@pytest.fixture
+def reports(conn):
+    start = date(2023, 11, 20)
+    for day in range(0, 120, 2):
+        add_report(conn, (start + timedelta(days=day)).isoformat(), sale=day * 3.35, deposit=day * 1.1)
+    conn.commit()
+
+
+def direct_totals(conn, date_from, date_to):
+    row = conn.execute(f'''
+        SELECT COUNT(*), {', '.join(f'ROUND(COALESCE(SUM({field}), 0), 2)' for field in ROLLUP_FIELDS)}
+        FROM daily_reports WHERE date BETWEEN ? AND ?
+    ''', (date_from, date_to)).fetchone()
+    return dict(zip(('report_count',) + ROLLUP_FIELDS, row))
+
+
+@pytest.mark.parametrize('date_from, date_to', [
+    ('2023-12-01', '2024-02-29'),  # whole months only
+    ('2023-11-25', '2024-03-10'),  # partial months on both ends
+    ('2024-01-05', '2024-01-20'),  # inside one month
+    ('2024-01-01', '2024-01-31'),  # exactly one month
+    ('2024-02-29', '2024-03-01'),  # across a month boundary
+    ('2025-01-01', '2025-02-01'),  # no reports
+])
+def test_range_totals_match_a_direct_sum(app, conn, reports, date_from, date_to):
+    totals = report_range_totals(conn, date_from, date_to)
+    assert {key: round(value, 2) for key, value in totals.items()} == direct_totals(conn, date_from, date_to)
+
+
+def test_rollups_json(app, conn, reports):
+    response = admin_client(app).get('/lottery-reports/rollups.json', query_string={
+        'period': 'month', 'from': '2023-12-01', 'to': '2024-01-31'})
+    data = response.get_json()
+    assert [rollup['period_start'] for rollup in data['rollups']] == ['2023-12-01', '2024-01-01']
+    assert sum(rollup['report_count'] for rollup in data['rollups']) == data['totals']['report_count']
+    assert data['totals'] == direct_totals(conn, '2023-12-01', '2024-01-31')
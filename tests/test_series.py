@@ -0,0 +1,100 @@
+import math
+from array import array
+from datetime import date, timedelta
+
+import pytest
+
+from app import downsample_lttb, downsample_minmax
+
+from conftest import add_report, add_stock_day, admin_client
+
+
+def get_series(client, **params):
+    response = client.get('/analytics/series', query_string=params)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_sales_series_follows_edits_to_the_day_before_the_range(app, conn):
+    add_stock_day(conn, '2024-01-01', stock=lambda holder: 10, extras=())
+    add_stock_day(conn, '2024-01-10', stock=lambda holder: 5, extras=())
+    conn.commit()
+    client = admin_client(app)
+    before = get_series(client, series='net_scratch', **{'from': '2024-01-05', 'to': '2024-01-31'})
+
+    conn.execute("UPDATE lottery_stock SET stock_number = 20 WHERE date = '2024-01-01'")
+    conn.commit()
+    after = get_series(client, series='net_scratch', **{'from': '2024-01-05', 'to': '2024-01-31'})
+    assert [point[0] for point in after['data']] == ['2024-01-10']
+    assert after['data'][0][1] > before['data'][0][1]
+
+
+def wave(n, spike_at=None):
+    xs = array('l', range(700000, 700000 + n))
+    ys = array('d', (math.sin(i / 10) * 50 for i in range(n)))
+    if spike_at is not None:
+        ys[spike_at] = 1000
+    return xs, ys
+
+
+def test_lttb_keeps_endpoints_spikes_and_the_point_budget():
+    xs, ys = wave(1000, spike_at=437)
+    sampled = downsample_lttb(xs, ys, 50)
+    assert len(sampled) == 50
+    assert sampled[0] == (xs[0], ys[0]) and sampled[-1] == (xs[-1], ys[-1])
+    assert [x for x, _ in sampled] == sorted({x for x, _ in sampled})
+    assert (xs[437], 1000) in sampled
+
+    assert downsample_lttb(*wave(20), 50) == list(zip(*wave(20)))
+
+
+def test_minmax_buckets_cover_every_point():
+    xs, ys = wave(103, spike_at=50)
+    buckets = downsample_minmax(xs, ys, 10)
+    assert len(buckets) == 10
+    assert buckets[0][0] == xs[0]
+    assert max(high for _, _, high, _ in buckets) == 1000
+    assert min(low for _, low, _, _ in buckets) == min(ys)
+    assert len(downsample_minmax(xs[:4], ys[:4], 10)) == 4
+
+
+@pytest.mark.parametrize('params', [
+    {'series': 'profit'},
+    {'points': '2'},
+    {'points': '5001'},
+    {'points': 'many'},
+    {'method': 'average'},
+    {'from': '2024-02-01', 'to': '2024-01-01'},
+    {'from': '2024-13-01'},
+])
+def test_series_rejects_bad_parameters(app, params):
+    response = admin_client(app).get('/analytics/series', query_string=params)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_series_is_cached_until_a_day_in_range_changes(app, conn):
+    start = date(2024, 1, 1)
+    for day in range(0, 40, 2):
+        add_report(conn, (start + timedelta(days=day)).isoformat(), sale=float(day))
+    conn.commit()
+    client = admin_client(app)
+    params = {'series': 'total_lottery_sale', 'from': '2024-01-01', 'to': '2024-02-29', 'points': 10}
+    first = client.get('/analytics/series', query_string=params)
+    body = first.get_json()
+    assert body['raw_points'] == 20 and len(body['data']) == 10
+    assert body['data'][0] == ['2024-01-01', 0.0] and body['data'][-1] == ['2024-02-08', 38.0]
+
+    etag = first.headers['ETag']
+    cached = client.get('/analytics/series', query_string=params, headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+
+    add_report(conn, '2024-02-20', sale=500.0)
+    conn.commit()
+    changed = client.get('/analytics/series', query_string=params, headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.get_json()['data'][-1] == ['2024-02-20', 500.0]
+
+    minmax = get_series(client, **{**params, 'method': 'minmax', 'points': 3})
+    assert minmax['columns'] == ['date', 'min', 'max', 'avg']
+    assert len(minmax['data']) == 3 and minmax['data'][-1][2] == 500.0
@@ -0,0 +1,82 @@
+from app import (HOLDER_COUNT, archive_stock_days, get_holder_layout, save_stock_day,
+                 unarchive_stock_day)
+
+from conftest import add_stock_day
+
+
+def stock_rows(conn, date):
+    return conn.execute('''
+        SELECT holder_number, stock_number, ticket_value FROM lottery_stock WHERE date = ? ORDER BY holder_number
+    ''', (date,)).fetchall()
+
+
+def day_totals(conn, date):
+    return conn.execute('''
+        SELECT source, ticket_value, entry_count, total_tickets, total_value
+        FROM daily_totals WHERE date = ? ORDER BY source, ticket_value
+    ''', (date,)).fetchall()
+
+
+def reports_page(app, date):
+    return app.test_client().get('/reports', query_string={'date': date}).get_data(as_text=True)
+
+
+def test_archive_round_trip_keeps_rows_totals_and_pages(app, conn):
+    add_stock_day(conn, '2024-04-01', stock=lambda holder: holder * 3)
+    add_stock_day(conn, '2024-04-02')
+    conn.execute("DELETE FROM lottery_stock WHERE date = '2024-04-01' AND holder_number IN (7, 56)")
+    conn.commit()
+    rows = [tuple(row) for row in stock_rows(conn, '2024-04-01')]
+    totals = [tuple(row) for row in day_totals(conn, '2024-04-01')]
+    page = reports_page(app, '2024-04-01')
+
+    assert archive_stock_days(conn, '2024-04-02') == (['2024-04-01'], [])
+    conn.commit()
+    assert stock_rows(conn, '2024-04-01') == []
+    blob = conn.execute("SELECT counts FROM stock_snapshots WHERE date = '2024-04-01'").fetchone()[0]
+    assert len(blob) == HOLDER_COUNT * 4
+    assert [tuple(row) for row in day_totals(conn, '2024-04-01')] == totals
+    assert reports_page(app, '2024-04-01') == page
+
+    assert unarchive_stock_day(conn, '2024-04-01')
+    conn.commit()
+    assert [tuple(row) for row in stock_rows(conn, '2024-04-01')] == rows
+    assert [tuple(row) for row in day_totals(conn, '2024-04-01')] == totals
+    assert conn.execute('SELECT COUNT(*) FROM stock_snapshots').fetchone()[0] == 0
+    assert not unarchive_stock_day(conn, '2024-04-01')
+
+
+def test_days_that_disagree_with_the_layout_are_not_archived(app, conn):
+    add_stock_day(conn, '2024-04-01')
+    add_stock_day(conn, '2024-04-02')
+    conn.execute("UPDATE lottery_stock SET ticket_value = 3 WHERE date = '2024-04-01' AND holder_number = 1")
+    conn.commit()
+    assert archive_stock_days(conn, '2024-04-03') == (['2024-04-02'], ['2024-04-01'])
+    assert len(stock_rows(conn, '2024-04-01')) == HOLDER_COUNT
+
+
+def test_saving_an_archived_day_unarchives_it(app, conn):
+    add_stock_day(conn, '2024-04-01', extras=())
+    archive_stock_days(conn, '2024-04-02')
+    conn.commit()
+
+    layout = get_holder_layout('2024-04-01')
+    entries = [('2024-04-01', holder, 5 if holder == 2 else holder, layout.value_for(holder))
+               for holder in range(1, HOLDER_COUNT + 1)]
+    summary = save_stock_day(conn, '2024-04-01', entries, [])
+    conn.commit()
+    assert summary['status'] == 'updated' and summary['holders_changed'] == [2]
+    assert conn.execute('SELECT COUNT(*) FROM stock_snapshots').fetchone()[0] == 0
+    assert stock_rows(conn, '2024-04-01')[1]['stock_number'] == 5
+    assert conn.execute("SELECT SUM(total_value) FROM daily_totals WHERE date = '2024-04-01'").fetchone()[0] == \
+        sum(stock * value for _, _, stock, value in entries)
+
+
+def test_archive_command_reports_skipped_days(app, conn):
+    add_stock_day(conn, '2024-04-01')
+    add_stock_day(conn, '2024-04-02')
+    conn.execute("UPDATE lottery_stock SET ticket_value = 3 WHERE date = '2024-04-02' AND holder_number = 1")
+    conn.commit()
+    result = app.test_cli_runner().invoke(args=['archive-stock', '--before', '2024-04-05'])
+    assert 'Skipped 2024-04-02' in result.output
+    assert 'Archived 1 day(s) before 2024-04-05.' in result.output
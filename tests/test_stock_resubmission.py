@@ -0,0 +1,60 @@
+from app import describe_stock_changes, get_holder_layout, save_stock_day
+
+
+def day_entries(date, stock=lambda holder: holder):
+    layout = get_holder_layout(date)
+    return [(date, holder, stock(holder), layout.value_for(holder)) for holder in range(1, 57)]
+
+
+def journal_size(conn):
+    return conn.execute('SELECT COUNT(*) FROM change_journal').fetchone()[0]
+
+
+def extras(conn, date):
+    return conn.execute('''
+        SELECT id, ticket_price, stock_number FROM extra_tickets WHERE date = ? ORDER BY id
+    ''', (date,)).fetchall()
+
+
+def test_identical_resubmission_writes_nothing(app, conn):
+    date = '2024-02-01'
+    extra_entries = [(date, 5, 3), (date, 5, 3), (date, 10, 1)]
+    assert save_stock_day(conn, date, day_entries(date), extra_entries)['status'] == 'created'
+    conn.commit()
+    version = conn.execute('SELECT version FROM data_versions WHERE date = ?', (date,)).fetchone()[0]
+    before_journal, before_extras = journal_size(conn), [tuple(row) for row in extras(conn, date)]
+
+    summary = save_stock_day(conn, date, day_entries(date), list(reversed(extra_entries)))
+    conn.commit()
+    assert summary['status'] == 'unchanged'
+    assert 'No changes' in describe_stock_changes(summary)
+    assert journal_size(conn) == before_journal
+    assert [tuple(row) for row in extras(conn, date)] == before_extras
+    assert conn.execute('SELECT version FROM data_versions WHERE date = ?', (date,)).fetchone()[0] == version
+
+
+def test_resubmission_touches_only_changed_rows(app, conn):
+    date = '2024-02-01'
+    save_stock_day(conn, date, day_entries(date), [(date, 5, 3), (date, 10, 1), (date, 20, 2)])
+    conn.commit()
+    ids = {row['ticket_price']: row['id'] for row in extras(conn, date)}
+    before_journal = journal_size(conn)
+
+    entries = day_entries(date, stock=lambda holder: holder + 100 if holder in (4, 9) else holder)
+    summary = save_stock_day(conn, date, entries, [(date, 5, 3), (date, 10, 7), (date, 50, 1)])
+    conn.commit()
+    assert summary == {'date': date, 'holders_changed': [4, 9], 'extras_added': 1,
+                       'extras_updated': 1, 'extras_removed': 1, 'status': 'updated'}
+    # The changed $10 count reuses its row; the $20 row gives way to a new $50 one
+    stored = {row['id']: (row['ticket_price'], row['stock_number']) for row in extras(conn, date)}
+    assert stored[ids[5]] == (5, 3) and stored[ids[10]] == (10, 7)
+    assert sorted(stored.values()) == [(5, 3), (10, 7), (50, 1)]
+    assert journal_size(conn) - before_journal == 5
+
+    assert ids[20] not in stored
+
+    summary = save_stock_day(conn, date, entries, [(date, 10, 7)])
+    conn.commit()
+    assert summary['extras_removed'] == 2
+    assert 'removed' in describe_stock_changes(summary)
+    assert [(row['ticket_price'], row['stock_number']) for row in extras(conn, date)] == [(10, 7)]
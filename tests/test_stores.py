@@ -0,0 +1,29 @@
+import click
+import pytest
+from flask import session
+
+from app import create_app, get_current_store
+
+
+@pytest.fixture
+def sharded_app(tmp_path, monkeypatch):
+    monkeypatch.delenv('STORE', raising=False)
+    return create_app({'DATABASE': str(tmp_path / 'stock_data.db'), 'STORES': ['default', 'east']})
+
+
+def test_cli_store_from_environment(sharded_app, monkeypatch):
+    with sharded_app.app_context():
+        assert get_current_store() == 'default'
+    monkeypatch.setenv('STORE', 'east')
+    with sharded_app.app_context():
+        assert get_current_store() == 'east'
+    monkeypatch.setenv('STORE', 'eest')
+    with sharded_app.app_context(), pytest.raises(click.ClickException, match='Unknown store eest'):
+        get_current_store()
+
+
+def test_stale_session_store_is_dropped(sharded_app):
+    with sharded_app.test_request_context():
+        session['store'] = 'closed'
+        assert get_current_store() == 'default'
+        assert 'store' not in session
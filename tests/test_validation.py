@@ -0,0 +1,27 @@
+import pytest
+
+from app import HOLDER_COUNT, validate_extra_ticket, validate_holder_stock
+
+
+class Layout:
+    def value_for(self, holder_number):
+        return 30
+
+
+def test_holder_stock_accepts_whole_numbers():
+    assert validate_holder_stock('3', '4', Layout()) == (3, 4, 30)
+    assert validate_holder_stock(HOLDER_COUNT, 5.0, Layout()) == (HOLDER_COUNT, 5, 30)
+
+
+@pytest.mark.parametrize('holder_number, stock_number', [
+    (HOLDER_COUNT + 1, 1), (0, 1), (True, 1), (2.5, 1), (2, 5.9), (2, False), (2, -1), (2, '5.9'),
+])
+def test_holder_stock_rejects_invalid_values(holder_number, stock_number):
+    with pytest.raises(ValueError):
+        validate_holder_stock(holder_number, stock_number, Layout())
+
+
+@pytest.mark.parametrize('price, stock', [(5.5, 1), (True, 1), (5, 1.2), (0, 1), (5, -1)])
+def test_extra_ticket_rejects_invalid_values(price, stock):
+    with pytest.raises(ValueError):
+        validate_extra_ticket(price, stock)